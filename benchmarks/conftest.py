@@ -0,0 +1,44 @@
+"""
+pytest-benchmark suite for partner ingestion and the read endpoints.
+
+Run it apart from the tests, once per database to compare them::
+
+    python -m pytest benchmarks --partner-sizes 1000 10000
+    TEST_DATABASE_URL=postgres://... python -m pytest benchmarks
+
+The test settings make ``query_budget`` raise, so a scenario that goes over
+a view's query budget fails instead of reporting a time.
+"""
+import pytest
+from django.core.cache import caches
+
+from partners.benchmark import build_workbook, generate_rows
+from partners.cache import CACHE_ALIAS
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--partner-sizes', type=int, nargs='+', default=[1000],
+        help='Synthetic partner dataset sizes in rows (default: 1000).',
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' in metafunc.fixturenames:
+        metafunc.parametrize('size', metafunc.config.getoption('partner_sizes'), scope='session')
+
+
+@pytest.fixture(scope='session')
+def rows(size):
+    return list(generate_rows(size))
+
+
+@pytest.fixture(scope='session')
+def workbook(rows):
+    return build_workbook(rows)
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    # Responses cached by earlier, rolled-back tests
+    caches[CACHE_ALIAS].clear()
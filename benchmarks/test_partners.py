@@ -0,0 +1,90 @@
+import itertools
+
+import pytest
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from tablib import Dataset
+
+from partners.benchmark import COUNTRIES, LIST_QUERIES, RESOURCE_HEADERS, build_workbook, generate_rows
+from partners.cache import CACHE_ALIAS
+from partners.resources import PartnerResource
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def api():
+    return APIClient()
+
+
+def upload(api, payload):
+    response = api.post(
+        '/api/upload-excel/',
+        {'file': SimpleUploadedFile('benchmark.xlsx', payload)},
+        format='multipart',
+    )
+    assert response.status_code < 300, response.content
+    return response.json()
+
+
+@pytest.fixture
+def loaded(api, workbook, size):
+    assert upload(api, workbook)['created'] == size
+
+
+def test_upload_insert(benchmark, api, size):
+    rounds = itertools.count()
+
+    def new_firms():
+        # Every round imports firms the table does not have yet
+        payload = build_workbook(generate_rows(size, prefix=f'Benchmark Round {next(rounds)}'))
+        return (api, payload), {}
+
+    result = benchmark.pedantic(upload, setup=new_firms, rounds=3)
+    assert result['created'] == size
+
+
+def test_upload_unchanged(benchmark, api, workbook, size, loaded):
+    result = benchmark.pedantic(upload, args=(api, workbook), rounds=3)
+    assert result['unchanged'] == size
+
+
+def test_resource_import_update(benchmark, rows, loaded):
+    rounds = itertools.count(1)
+
+    def changed_rows():
+        # Move every firm to another headquarters than in the round before
+        shift = next(rounds)
+        dataset = Dataset(headers=list(RESOURCE_HEADERS))
+        for i, row in enumerate(rows):
+            dataset.append((row[0], f'{COUNTRIES[(i + shift) % len(COUNTRIES)]} {shift}', *row[2:]))
+        return (dataset,), {}
+
+    def import_dataset(dataset):
+        return PartnerResource().import_data(dataset, dry_run=False, raise_errors=True)
+
+    result = benchmark.pedantic(import_dataset, setup=changed_rows, rounds=3)
+    assert result.totals['update'] == len(rows)
+
+
+def cold_get(api, path, params):
+    caches[CACHE_ALIAS].clear()
+    response = api.get(path, params)
+    assert response.status_code == 200, response.content
+    return response
+
+
+@pytest.mark.parametrize('params', LIST_QUERIES.values(), ids=LIST_QUERIES.keys())
+def test_partner_list(benchmark, api, params, loaded):
+    benchmark.pedantic(cold_get, args=(api, '/api/partners/', params), rounds=20)
+
+
+def test_partner_list_cached(benchmark, api, loaded):
+    api.get('/api/partners/')
+    response = benchmark(api.get, '/api/partners/')
+    assert response.status_code == 200
+
+
+def test_hq_list(benchmark, api, loaded):
+    benchmark.pedantic(cold_get, args=(api, '/api/hqs/', {}), rounds=20)
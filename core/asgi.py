@@ -2,6 +2,9 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Async views such as the streaming recommend endpoint only free their worker
+while waiting on upstream calls when served from here, e.g.
+``gunicorn core.asgi:application -k uvicorn.workers.UvicornWorker``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -11,6 +14,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from core.db import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+warm_up()
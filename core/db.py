@@ -0,0 +1,38 @@
+# db.py
+"""
+Database connection warm-up.
+
+A cold connection to Neon pays DNS, the TLS handshake and, when the compute
+was suspended, its wake-up. ``warm_up`` pays that while the server process
+starts instead of on its first request. With the psycopg pool it opens the
+pool, which then fills to ``min_size`` in the background; otherwise the
+connection stays open for the thread that opened it, which serves requests
+in sync workers.
+
+Warm-up runs when ``core.wsgi``/``core.asgi`` is imported, so do not load the
+app before forking workers (gunicorn ``--preload``): the children would share
+the connection.
+"""
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(using='default'):
+    """Open (and check) a connection to ``using``. Returns False if the database is unreachable."""
+    if not getattr(settings, 'DB_WARM_UP', True):
+        return False
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        # The first request retries; a slow database should not stop the server from starting
+        logger.warning("Database warm-up failed", exc_info=True)
+        return False
+    if getattr(connection, 'pool', None) is not None:
+        connection.close()  # back to the pool, for whichever thread asks first
+    return True
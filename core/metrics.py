@@ -0,0 +1,400 @@
+# metrics.py
+"""
+Per-request instrumentation: SQL query count and time, serializer time and
+total latency.
+
+``RequestMetricsMiddleware`` is a no-op unless ``PERF_METRICS_ENABLED`` is
+set. When on, it adds a ``Server-Timing`` header to every response, logs one
+JSON line per request on the ``core.metrics`` logger and feeds an in-process
+registry that ``/api/_metrics`` exposes in the Prometheus text format. The
+registry is per process, like the partner list cache.
+
+``query_budget`` is independent of the middleware: it counts the queries of
+one view call against a fixed budget and logs or raises when they go over,
+so an N+1 regression shows up in the logs or fails a test.
+"""
+import functools
+import json
+import re
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'PERF_METRICS_ENABLED', False)
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled."""
+
+    __slots__ = ('queries', 'db_seconds', 'timings')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.timings = defaultdict(float)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name`` timing."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        with timed('serializer'):
+            return super().to_representation(data)
+
+
+class TimedSerializerMixin:
+    """
+    Count the time spent turning instances into primitives as the request's
+    ``serializer`` timing. Set ``Meta.list_serializer_class`` to
+    ``TimedListSerializer`` so that lists are timed once as a whole.
+    """
+
+    def to_representation(self, instance):
+        if isinstance(self.parent, serializers.ListSerializer):
+            return super().to_representation(instance)
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+class MetricsRegistry:
+    """
+    Process-wide request metrics per (method, route). Counters and histogram
+    buckets are cumulative; quantiles are computed over the last ``window``
+    requests of each route.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _new_series(self):
+        return {
+            'count': 0,
+            'seconds': 0.0,
+            'buckets': [0] * len(LATENCY_BUCKETS),
+            'queries': 0,
+            'db_seconds': 0.0,
+            'timings': defaultdict(float),
+            'recent': deque(maxlen=self.window),
+        }
+
+    def observe(self, method, route, seconds, metrics):
+        with self._lock:
+            series = self._series.get((method, route))
+            if series is None:
+                series = self._series[(method, route)] = self._new_series()
+            series['count'] += 1
+            series['seconds'] += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    series['buckets'][i] += 1
+            series['recent'].append(seconds)
+            if metrics is not None:
+                series['queries'] += metrics.queries
+                series['db_seconds'] += metrics.db_seconds
+                for name, value in metrics.timings.items():
+                    series['timings'][name] += value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """The registry in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            series = sorted(
+                (key, {**value, 'recent': sorted(value['recent']), 'timings': dict(value['timings'])})
+                for key, value in self._series.items()
+            )
+
+        lines = [
+            '# HELP http_request_duration_seconds Request latency.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (method, route), data in series:
+            labels = _labels(method=method, route=route)
+            for bound, count in zip(LATENCY_BUCKETS, data['buckets']):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {data["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {data["seconds"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {data["count"]}')
+
+        lines += [
+            '# HELP http_request_duration_window_seconds Latency quantiles over the most recent requests.',
+            '# TYPE http_request_duration_window_seconds gauge',
+        ]
+        for (method, route), data in series:
+            recent = data['recent']
+            for quantile in QUANTILES:
+                index = min(int(quantile * len(recent)), len(recent) - 1)
+                labels = _labels(method=method, route=route, quantile=quantile)
+                lines.append(f'http_request_duration_window_seconds{{{labels}}} {recent[index]:.6f}')
+
+        lines += [
+            '# HELP http_request_db_queries_total SQL queries run while handling requests.',
+            '# TYPE http_request_db_queries_total counter',
+        ]
+        for (method, route), data in series:
+            lines.append(f'http_request_db_queries_total{{{_labels(method=method, route=route)}}} {data["queries"]}')
+
+        lines += [
+            '# HELP http_request_db_seconds_total Time spent in SQL queries.',
+            '# TYPE http_request_db_seconds_total counter',
+        ]
+        for (method, route), data in series:
+            lines.append(f'http_request_db_seconds_total{{{_labels(method=method, route=route)}}} {data["db_seconds"]:.6f}')
+
+        lines += [
+            '# HELP http_request_stage_seconds_total Time spent in instrumented stages (e.g. serializer).',
+            '# TYPE http_request_stage_seconds_total counter',
+        ]
+        for (method, route), data in series:
+            for stage, value in sorted(data['timings'].items()):
+                labels = _labels(method=method, route=route, stage=stage)
+                lines.append(f'http_request_stage_seconds_total{{{labels}}} {value:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+registry = MetricsRegistry(getattr(settings, 'PERF_METRICS_WINDOW', 1000))
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    # Router patterns look like 'api/^partners/(?P<pk>[^/.]+)/$'
+    return re.sub(r'(^|/)\^', r'\1', match.route).rstrip('$') or '/'
+
+
+def server_timing(seconds, metrics):
+    entries = [f'total;dur={seconds * 1000:.1f}']
+    if metrics is not None:
+        entries.append(f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries"')
+        for name, value in sorted(metrics.timings.items()):
+            entries.append(f'{name};dur={value * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count/time, stage timings and latency of every request.
+
+    For streaming responses the numbers cover the view up to the first byte.
+    Async views run their queries in worker threads, so only their latency
+    is recorded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, metrics)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self.finish(request, response, time.perf_counter() - started, None)
+
+    def finish(self, request, response, seconds, metrics):
+        route = _route(request)
+        registry.observe(request.method, route, seconds, metrics)
+        response['Server-Timing'] = server_timing(seconds, metrics)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'status': response.status_code,
+            'duration_ms': round(seconds * 1000, 2),
+        }
+        if metrics is not None:
+            record['db_queries'] = metrics.queries
+            record['db_ms'] = round(metrics.db_seconds * 1000, 2)
+            record.update(
+                (f'{name}_ms', round(value * 1000, 2)) for name, value in metrics.timings.items()
+            )
+        logger.info(json.dumps(record))
+        return response
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more SQL queries than its ``query_budget`` (QUERY_BUDGET_ACTION = 'raise')."""
+
+
+_budgets = ContextVar('query_budgets', default=())
+
+
+class QueryBudget:
+    """
+    The queries run during one budgeted call; an ``execute_wrapper``. A query
+    run inside a nested budget counts against that budget only.
+    """
+
+    __slots__ = ('name', 'limit', 'queries')
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if _budgets.get()[-1:] == (self,):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def check(self, action):
+        if len(self.queries) <= self.limit:
+            return
+        message = f"{self.name} ran {len(self.queries)} SQL queries, its budget is {self.limit}"
+        if action == 'raise':
+            raise QueryBudgetExceeded('\n'.join([message, *self.queries]))
+        logger.warning(message)
+
+
+def get_budget_action():
+    return getattr(settings, 'QUERY_BUDGET_ACTION', 'log')
+
+
+@contextmanager
+def queries_within(name, limit):
+    """
+    Count the queries of a block against ``limit``, like ``query_budget``.
+    For work whose query count depends on its input, e.g. one import batch,
+    with a limit computed from that input. Its queries do not count against
+    the budget of the view running it.
+    """
+    action = get_budget_action()
+    if action == 'off':
+        yield
+        return
+    budget = QueryBudget(name, limit)
+    token = _budgets.set((*_budgets.get(), budget))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(budget))
+            yield
+    finally:
+        _budgets.reset(token)
+    budget.check(action)
+
+
+def bulk_statements(model, count, update_fields=None, using='default'):
+    """
+    Statements that ``bulk_create`` of ``count`` ``model`` objects, or their
+    ``bulk_update`` of ``update_fields``, is split into on the ``using``
+    database. SQLite caps the parameters of one statement, PostgreSQL does
+    not. For query budgets that grow with the input.
+    """
+    if not count:
+        return 0
+    connection = connections[using]
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    if update_fields is not None:
+        fields = ['pk', 'pk', *update_fields]
+    batch_size = max(connection.ops.bulk_batch_size(fields, [model()] * count), 1)
+    return -(-count // batch_size)
+
+
+def _budgeted(func, limit, name):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with queries_within(name, limit):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def query_budget(limit=None, **actions):
+    """
+    Cap the SQL queries of a view. Decorates a view function,
+    ``@query_budget(3)``, or a viewset class with a budget per action,
+    ``@query_budget(list=4, retrieve=2)``. Going over is logged, or raises
+    ``QueryBudgetExceeded`` when QUERY_BUDGET_ACTION is 'raise'.
+
+    Only queries run before the view returns count: the rows of a streaming
+    response are fetched later.
+    """
+    def decorate(view):
+        if isinstance(view, type):
+            for name, action_limit in actions.items():
+                setattr(view, name, _budgeted(getattr(view, name), action_limit, f"{view.__name__}.{name}"))
+            return view
+        # @api_view functions are wrapped in a view class named after the function
+        return _budgeted(view, limit, getattr(view, 'cls', view).__name__)
+    return decorate
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; 404 unless PERF_METRICS_ENABLED is set."""
+    if not is_enabled():
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,10 +10,16 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from decouple import config
 import dj_database_url
 
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,6 +56,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'partners',
@@ -69,6 +76,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.metrics.RequestMetricsMiddleware",  # Disabled unless PERF_METRICS_ENABLED
 ]
 
 
@@ -115,11 +123,14 @@ CORS_ALLOWED_ORIGINS = [
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 USE_NEON = config("USE_NEON", default=True, cast=bool)
+# Pool connections with psycopg 3 (psycopg[pool]) when installed; otherwise keep them open per thread
+DB_POOL = config('DB_POOL', default=True, cast=bool) and ConnectionPool is not None
 if USE_NEON:
     DATABASES = {
         'default': dj_database_url.config(
             default=config("DATABASE_URL"),
             conn_max_age=600,
+            conn_health_checks=True,
             ssl_require=True,
         )
     }
@@ -132,9 +143,23 @@ else:
             'PASSWORD': config('DB_PASSWORD', default='maxwell406'),
             'HOST': config('DB_HOST', default='localhost'),
             'PORT': config('DB_PORT', default='5432'),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # A worker's threads share the pool. CONN_HEALTH_CHECKS makes it check connections on checkout,
+    # and max_idle drops them before Neon closes idle ones. Django refuses persistent connections with a pool
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        'max_idle': config('DB_POOL_MAX_IDLE', default=240, cast=float),
+    }
+# Open the database connection (and pool) when the WSGI/ASGI app loads, not on the first request
+DB_WARM_UP = config('DB_WARM_UP', default=True, cast=bool)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -197,3 +222,103 @@ GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
 # optional: override base URL if needed
 # GEMINI_API_URL = config('GEMINI_API_URL', default='')
 
+
+# Partner spreadsheet import: rows resolved and written per bulk statement
+PARTNER_IMPORT_BATCH_SIZE = config('PARTNER_IMPORT_BATCH_SIZE', default=1000, cast=int)
+# Run uploads as background ImportJobs unless the request says otherwise (?background=0/1)
+PARTNER_IMPORT_BACKGROUND = config('PARTNER_IMPORT_BACKGROUND', default=False, cast=bool)
+# Run queued jobs on a thread pool inside the web process; turn off when `manage.py run_import_jobs` runs as a worker
+PARTNER_IMPORT_RUN_IN_PROCESS = config('PARTNER_IMPORT_RUN_IN_PROCESS', default=True, cast=bool)
+PARTNER_IMPORT_WORKERS = config('PARTNER_IMPORT_WORKERS', default=2, cast=int)
+# Processes parsing the sheets of multi-file, multi-sheet and zip uploads in parallel (1 parses in the web process)
+PARTNER_IMPORT_PARSE_WORKERS = config('PARTNER_IMPORT_PARSE_WORKERS', default=min(4, os.cpu_count() or 1), cast=int)
+# Largest total size of the spreadsheets inside one uploaded zip archive
+PARTNER_IMPORT_MAX_ARCHIVE_BYTES = config('PARTNER_IMPORT_MAX_ARCHIVE_BYTES', default=100 * 1024 * 1024, cast=int)
+
+# Uploaded files (import jobs)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+# Chunked uploads (/api/uploads/): parts are kept here until the upload completes
+PARTNER_UPLOAD_DIR = config('PARTNER_UPLOAD_DIR', default=str(BASE_DIR / 'media' / 'uploads'))
+PARTNER_UPLOAD_MAX_BYTES = config('PARTNER_UPLOAD_MAX_BYTES', default=200 * 1024 * 1024, cast=int)
+# Largest chunk accepted per PUT; keep it under what the proxy in front allows
+PARTNER_UPLOAD_CHUNK_SIZE = config('PARTNER_UPLOAD_CHUNK_SIZE', default=2 * 1024 * 1024, cast=int)
+# Open uploads untouched for this many seconds are deleted with their parts
+PARTNER_UPLOAD_EXPIRY = config('PARTNER_UPLOAD_EXPIRY', default=24 * 60 * 60, cast=int)
+# A running import without a progress checkpoint for this many seconds is put back in the queue
+PARTNER_IMPORT_STALE_AFTER = config('PARTNER_IMPORT_STALE_AFTER', default=10 * 60, cast=int)
+# Files of failed and cancelled imports are kept this many seconds so the jobs can be resumed
+PARTNER_IMPORT_KEEP_FILES = config('PARTNER_IMPORT_KEEP_FILES', default=7 * 24 * 60 * 60, cast=int)
+# Minimum pg_trgm similarity for /api/partners/fuzzy/ matches
+PARTNER_FUZZY_THRESHOLD = config('PARTNER_FUZZY_THRESHOLD', default=0.3, cast=float)
+# Default page size of the partners API (?page_size= overrides, up to 100)
+PARTNER_PAGE_SIZE = config('PARTNER_PAGE_SIZE', default=5, cast=int)
+
+# Caches
+# The 'partners' alias holds the partner list responses and facets, keyed on the
+# partner data version in the database, so every backend sees writes made by any
+# worker. Local memory is per process; 'file' or 'db' (run `manage.py createcachetable`)
+# let gunicorn workers share entries.
+PARTNER_CACHE_BACKEND = config('PARTNER_CACHE_BACKEND', default='locmem')
+PARTNER_CACHE_TIMEOUT = config('PARTNER_CACHE_TIMEOUT', default=300, cast=int)
+_PARTNER_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'partners',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('PARTNER_CACHE_LOCATION', default=str(BASE_DIR / '.cache' / 'partners')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'partners_cache',
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'partners': {
+        **_PARTNER_CACHE_BACKENDS[PARTNER_CACHE_BACKEND],
+        'TIMEOUT': PARTNER_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# In-process snapshot of the partners table (partners/snapshot.py). Every worker
+# serves plain list pages, facets and name lookups from memory and re-reads the
+# partner data version at most every CHECK_INTERVAL seconds to notice writes.
+PARTNER_SNAPSHOT_ENABLED = config('PARTNER_SNAPSHOT_ENABLED', default=False, cast=bool)
+PARTNER_SNAPSHOT_CHECK_INTERVAL = config('PARTNER_SNAPSHOT_CHECK_INTERVAL', default=1.0, cast=float)
+
+# Gemini recommendations (partnerSearch)
+# Dotted path of the client class; point it at a stub with the same interface in tests
+GEMINI_CLIENT_CLASS = config('GEMINI_CLIENT_CLASS', default='google.genai.Client')
+GEMINI_MODEL = config('GEMINI_MODEL', default='gemini-2.0-flash')
+RECOMMEND_CACHE_TTL = config('RECOMMEND_CACHE_TTL', default=60 * 60 * 24, cast=int)
+RECOMMEND_CACHE_MAX_ENTRIES = config('RECOMMEND_CACHE_MAX_ENTRIES', default=500, cast=int)
+# Upstream limits of the recommend endpoints: seconds per request, concurrent Gemini calls per process
+RECOMMEND_TIMEOUT = config('RECOMMEND_TIMEOUT', default=30, cast=int)
+RECOMMEND_MAX_CONCURRENCY = config('RECOMMEND_MAX_CONCURRENCY', default=4, cast=int)
+# Most items accepted by one /api/partners/bulk/ request
+PARTNER_BULK_MAX_ITEMS = config('PARTNER_BULK_MAX_ITEMS', default=500, cast=int)
+# Rows fetched per round trip by /api/partners/export/
+PARTNER_EXPORT_CHUNK_SIZE = config('PARTNER_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Per-request instrumentation (Server-Timing headers, JSON log lines, /api/_metrics)
+PERF_METRICS_ENABLED = config('PERF_METRICS_ENABLED', default=False, cast=bool)
+# Requests per route kept for the latency quantiles
+PERF_METRICS_WINDOW = config('PERF_METRICS_WINDOW', default=1000, cast=int)
+# What @query_budget does when a view runs more SQL queries than budgeted: 'log', 'raise' (tests) or 'off'
+QUERY_BUDGET_ACTION = config('QUERY_BUDGET_ACTION', default='log')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,39 @@
+"""
+Settings for the test suite (``pytest`` or ``manage.py test --settings=core.test_settings``).
+
+Tests run on SQLite unless TEST_DATABASE_URL points at a PostgreSQL server;
+the trigram and full-text paths only run there. Query budgets raise, so a
+view that goes over its budget fails its test.
+"""
+import os
+import tempfile
+
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('DB_POOL', 'False')
+os.environ.setdefault('DB_WARM_UP', 'False')
+os.environ.setdefault('QUERY_BUDGET_ACTION', 'raise')
+
+from .settings import *  # noqa: E402,F401,F403
+
+import dj_database_url  # noqa: E402
+
+DATABASES = {
+    'default': dj_database_url.parse(os.environ['TEST_DATABASE_URL'])
+    if os.environ.get('TEST_DATABASE_URL')
+    else {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+ALLOWED_HOSTS = ['testserver', 'localhost']
+
+_TMP = tempfile.mkdtemp(prefix='partnerdb-tests-')
+MEDIA_ROOT = os.path.join(_TMP, 'media')
+PARTNER_UPLOAD_DIR = os.path.join(_TMP, 'uploads')
+
+# Jobs run when a test calls run_job(), not on a background thread
+PARTNER_IMPORT_RUN_IN_PROCESS = False
+PARTNER_IMPORT_BACKGROUND = False
+PARTNER_IMPORT_PARSE_WORKERS = 1
+PERF_METRICS_ENABLED = False
+
+CACHES['partners'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'partners-tests'}
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -18,15 +18,29 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from partners.views import PartnerViewSet, hq_list, upload_excel
+from core.metrics import metrics_view
+from partners.views import (
+    ImportJobViewSet,
+    PartnerViewSet,
+    UploadSessionViewSet,
+    cache_stats,
+    facets,
+    hq_list,
+    upload_excel,
+)
 
 router = DefaultRouter()
 router.register(r'partners', PartnerViewSet)
+router.register(r'import-jobs', ImportJobViewSet)
+router.register(r'uploads', UploadSessionViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
     path('api/hqs/', hq_list),
+    path('api/facets/', facets),
+    path('api/cache-stats/', cache_stats),
+    path('api/_metrics', metrics_view),
     path('api/upload-excel/', upload_excel),
     path('api/partner-search/', include('partnerSearch.urls')),
 ]
\ No newline at end of file
@@ -0,0 +1,128 @@
+# cache.py
+"""
+Persistent cache of recommendation results, plus request coalescing.
+
+Results are stored in the database per normalized query, so they survive
+restarts and are shared by every worker. Entries expire after
+RECOMMEND_CACHE_TTL seconds, and once the table holds more than
+RECOMMEND_CACHE_MAX_ENTRIES rows the least recently used ones are evicted.
+
+Concurrent requests for the same query in one process share a single upstream
+call (``SingleFlight``).
+"""
+import hashlib
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CachedRecommendation
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """Case, surrounding punctuation and spacing do not change the answer."""
+    return WHITESPACE_RE.sub(' ', query).strip().strip('.?!').strip().lower()
+
+
+def cache_key(query):
+    return hashlib.sha256(normalize_query(query).encode()).hexdigest()
+
+
+def get_cached(query):
+    """Cached data for ``query``, or None if missing or expired."""
+    key = cache_key(query)
+    entry = CachedRecommendation.objects.filter(key=key).only('data', 'created').first()
+    if entry is None:
+        return None
+    now = timezone.now()
+    if entry.created < now - timedelta(seconds=settings.RECOMMEND_CACHE_TTL):
+        CachedRecommendation.objects.filter(pk=entry.pk).delete()
+        return None
+    CachedRecommendation.objects.filter(pk=entry.pk).update(last_used=now, hits=F('hits') + 1)
+    return entry.data
+
+
+def store(query, data):
+    now = timezone.now()
+    CachedRecommendation.objects.update_or_create(
+        key=cache_key(query),
+        defaults={'query': normalize_query(query), 'data': data, 'created': now, 'last_used': now},
+    )
+    evict()
+
+
+def evict():
+    """Delete the least recently used entries beyond RECOMMEND_CACHE_MAX_ENTRIES."""
+    stale = (
+        CachedRecommendation.objects.order_by('-last_used')
+        .values_list('pk', flat=True)[settings.RECOMMEND_CACHE_MAX_ENTRIES:]
+    )
+    stale = list(stale)
+    if stale:
+        CachedRecommendation.objects.filter(pk__in=stale).delete()
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result."""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+_flight = SingleFlight()
+
+
+def get_recommendations(query, fetch):
+    """
+    Return ``(data, cached)`` for ``query``, calling ``fetch(query)`` only on a
+    cache miss and only once for concurrent identical queries.
+    """
+    data = get_cached(query)
+    if data is not None:
+        return data, True
+
+    def load():
+        data = get_cached(query)  # another request may have stored it since
+        if data is not None:
+            return data, True
+        data = fetch(query)
+        store(query, data)
+        return data, False
+
+    return _flight.do(cache_key(query), load)
@@ -0,0 +1,66 @@
+# enrichment.py
+"""Match AI recommendations against the partners already in the database."""
+import pandas as pd
+
+from partners.importer import ImportResult, bulk_upsert, clean_frame, map_columns
+from partners.lookups import find_partners, normalize_name
+
+NAME_KEYS = ('firm name', 'firm_name', 'name')
+
+
+def firm_name_of(item):
+    """The firm name of a recommendation, whatever casing/key Gemini used."""
+    if not isinstance(item, dict):
+        return None
+    for key, value in item.items():
+        if str(key).strip().lower() in NAME_KEYS and value:
+            return str(value).strip()
+    return None
+
+
+def existing_matches(recommendations):
+    """
+    One entry per recommendation: ``is_existing``, ``partner_id`` and
+    ``partnership_status`` (the last two None for new firms). One batched
+    query for the whole list.
+    """
+    names = [firm_name_of(item) for item in recommendations]
+    partners = find_partners([name for name in names if name])
+    matches = []
+    for name in names:
+        partner = partners.get(normalize_name(name)) if name else None
+        matches.append({
+            'is_existing': partner is not None,
+            'partner_id': partner['id'] if partner else None,
+            'partnership_status': partner['current_partnership_status'] if partner else None,
+        })
+    return matches
+
+
+def annotate_existing(recommendations):
+    """Add the ``existing_matches`` fields to each recommendation dict in place."""
+    for item, match in zip(recommendations, existing_matches(recommendations)):
+        if isinstance(item, dict):
+            item.update(match)
+    return recommendations
+
+
+def import_new(recommendations):
+    """
+    Bulk-import the recommended firms that are not partners yet, reading their
+    keys through the spreadsheet COLUMN_MAPPING. Returns the ImportResult.
+    """
+    result = ImportResult()
+    new_items = [
+        {key: value for key, value in item.items() if key not in ('is_existing', 'partner_id', 'partnership_status')}
+        for item in recommendations
+        if isinstance(item, dict) and not item.get('is_existing') and firm_name_of(item)
+    ]
+    if not new_items:
+        return result
+
+    df = map_columns(pd.DataFrame(new_items))
+    if 'firm_name' not in df.columns and 'name' in df.columns:
+        df = df.rename(columns={'name': 'firm_name'})
+    bulk_upsert(clean_frame(df, result, row_numbers=range(1, len(df) + 1)), result)
+    return result
@@ -0,0 +1,78 @@
+# gemini.py
+import json
+
+import httpx
+from django.conf import settings
+from django.utils.module_loading import import_string
+from google.genai import types
+
+# prompt engineering: Instruction to return JSON only
+SYSTEM_INSTRUCTION = """
+You are a business researcher. Search for firms matching the user's description.
+Return a list of at least 10 real companies with their Firm Name, Focus Area and HQ location.
+Output strictly valid JSON in this format:
+[{ 'firm name': 'firm_name',
+    'headquarters': 'hq',
+    'origin': 'hq',
+    'focus area': 'focus_area',
+    'donor experience': 'donor_experience',
+    'contact': 'contact',
+    'sector': 'sector',
+    'current partnership status': 'current_partnership_status'}]
+"""
+
+_client = None
+
+
+def get_client():
+    """
+    Build the Gemini client on first use. GEMINI_CLIENT_CLASS can point at a
+    local stub with the same ``models.generate_content`` interface.
+    """
+    global _client
+    if _client is None:
+        client_class = import_string(settings.GEMINI_CLIENT_CLASS)
+        _client = client_class(api_key=settings.GEMINI_API_KEY)
+    return _client
+
+
+def reset_client():
+    global _client
+    _client = None
+
+
+def generate_config(timeout=None):
+    return types.GenerateContentConfig(
+        tools=[types.Tool(google_search=types.GoogleSearch())],  # ENABLES LIVE SEARCH
+        response_mime_type="application/json",  # Forces JSON output
+        system_instruction=SYSTEM_INSTRUCTION,
+        http_options=None if timeout is None else types.HttpOptions(timeout=max(int(timeout * 1000), 1)),
+    )
+
+
+def fetch_recommendations(user_query, timeout=None):
+    """
+    Ask Gemini (with search grounding) for firms and parse its JSON answer.
+    The request is abandoned with TimeoutError after ``timeout`` seconds.
+    """
+    try:
+        response = get_client().models.generate_content(
+            model=settings.GEMINI_MODEL,
+            contents=user_query,
+            config=generate_config(timeout),
+        )
+    except httpx.TimeoutException as e:
+        raise TimeoutError(str(e)) from e
+    return json.loads(response.text)
+
+
+async def stream_recommendation_text(user_query):
+    """Async iterator over the text chunks of Gemini's answer, as they arrive."""
+    stream = await get_client().aio.models.generate_content_stream(
+        model=settings.GEMINI_MODEL,
+        contents=user_query,
+        config=generate_config(),
+    )
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
@@ -1,3 +1,14 @@
 from django.db import models
 
-# Create your models here.
+
+class CachedRecommendation(models.Model):
+    """Gemini recommendations stored per normalized query (see partnerSearch.cache)."""
+    key = models.CharField(max_length=64, unique=True)  # sha256 of the normalized query
+    query = models.TextField()
+    data = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(db_index=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.query
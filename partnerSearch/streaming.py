@@ -0,0 +1,50 @@
+# streaming.py
+import json
+
+
+class JSONArrayStream:
+    """
+    Incremental parser for a JSON array of objects arriving in text chunks.
+
+    ``feed()`` returns the objects completed by the new chunk, so each
+    recommendation can be sent on as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text):
+        items = []
+        for char in text:
+            if self._depth:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char == '}' and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(json.loads(''.join(self._buffer)))
+                    self._buffer = []
+        return items
+
+
+def sse_event(event, data):
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
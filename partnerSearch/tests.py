@@ -1,3 +1,174 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+import httpx
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from partners.models import Partner
+
+from .gemini import reset_client
+from .models import CachedRecommendation
+from .streaming import JSONArrayStream
+from .views import _blocking_semaphore
+
+ANSWER = [
+    {'firm name': 'Acme', 'headquarters': 'Nepal'},
+    {'firm name': 'New {Co}', 'headquarters': 'Chile', 'sector': 'Health'},
+]
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Models:
+    def __init__(self, client):
+        self.client = client
+
+    def generate_content(self, model, contents, config):
+        self.client.calls.append(contents)
+        self.client.timeouts.append(config.http_options.timeout)
+        if self.client.error is not None:
+            raise self.client.error
+        return _Response(json.dumps(self.client.answer))
+
+
+class _AsyncModels(_Models):
+    async def generate_content_stream(self, model, contents, config):
+        self.client.calls.append(contents)
+        if self.client.error is not None:
+            raise self.client.error
+        return self._chunks(json.dumps(self.client.answer))
+
+    async def _chunks(self, text):
+        for start in range(0, len(text), 7):
+            yield _Response(text[start:start + 7])
+
+
+class StubClient:
+    """Stands in for google.genai.Client; the test sets ``answer`` or ``error``."""
+
+    answer = ANSWER
+    error = None
+    calls = []
+    timeouts = []
+
+    def __init__(self, api_key=None):
+        self.models = _Models(StubClient)
+        self.aio = type('Aio', (), {'models': _AsyncModels(StubClient)})()
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+@override_settings(GEMINI_CLIENT_CLASS='partnerSearch.tests.StubClient')
+class RecommendTestCase(TestCase):
+    def setUp(self):
+        reset_client()
+        self.addCleanup(reset_client)
+        StubClient.answer, StubClient.error, StubClient.calls, StubClient.timeouts = ANSWER, None, [], []
+        self.acme = Partner.objects.create(firm_name='ACME')
+
+    def recommend(self, query='water firms in nepal', **data):
+        response = self.client.post(
+            '/api/partner-search/recommend/', {'query': query, **data}, content_type='application/json'
+        )
+        return response.status_code, response.json()
+
+
+class RecommendTests(RecommendTestCase):
+    def test_recommendations_are_matched_against_partners_and_cached(self):
+        status, payload = self.recommend()
+        self.assertEqual(status, 200)
+        self.assertFalse(payload['cached'])
+        self.assertEqual(
+            [(item['firm name'], item['is_existing'], item['partner_id']) for item in payload['data']],
+            [('Acme', True, self.acme.pk), ('New {Co}', False, None)],
+        )
+
+        status, payload = self.recommend('Water firms in Nepal?')
+        self.assertTrue(payload['cached'])
+        self.assertEqual(len(payload['data']), 2)
+        self.assertEqual(StubClient.calls, ['water firms in nepal'])
+
+    def test_new_firms_are_imported_on_request(self):
+        status, payload = self.recommend(import_new=True)
+        self.assertEqual(payload['imported']['created'], 1)
+        partner = Partner.objects.get(firm_name='New {Co}')
+        self.assertEqual((partner.hq.name, partner.sector.name), ('Chile', 'Health'))
+        self.assertEqual(payload['data'][1]['partner_id'], partner.pk)
+
+    def test_upstream_error_is_reported_and_not_cached(self):
+        StubClient.error = RuntimeError('quota exceeded')
+        status, payload = self.recommend()
+        self.assertEqual((status, payload['message']), (500, 'quota exceeded'))
+        self.assertFalse(CachedRecommendation.objects.exists())
+
+    def test_the_upstream_call_is_bounded_by_the_timeout(self):
+        self.recommend()
+        self.assertTrue(0 < StubClient.timeouts[0] <= settings.RECOMMEND_TIMEOUT * 1000)
+
+        StubClient.error = httpx.ReadTimeout('slow')
+        status, payload = self.recommend('another query')
+        self.assertEqual((status, payload['message']), (504, 'Search timed out after 30 seconds'))
+
+    @override_settings(RECOMMEND_TIMEOUT=0)
+    def test_a_request_without_a_free_upstream_slot_times_out(self):
+        semaphore = _blocking_semaphore()
+        for _ in range(settings.RECOMMEND_MAX_CONCURRENCY):
+            semaphore.acquire()
+            self.addCleanup(semaphore.release)
+        status, payload = self.recommend()
+        self.assertEqual((status, payload['message']), (504, 'Search timed out after 0 seconds'))
+        self.assertEqual(StubClient.calls, [])
+
+    def test_a_body_that_is_not_a_json_object_is_a_400(self):
+        for body in ('{"query": ', '["water"]'):
+            response = self.client.post('/api/partner-search/recommend/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class RecommendStreamTests(RecommendTestCase):
+    async def stream(self, query='water firms in nepal'):
+        response = await self.async_client.post(
+            '/api/partner-search/recommend/stream/', {'query': query}, content_type='application/json'
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_events(b''.join([chunk async for chunk in response.streaming_content]).decode())
+
+    async def test_items_are_streamed_then_matched_and_cached(self):
+        events = await self.stream()
+        self.assertEqual([event for event, _ in events], ['item', 'item', 'existing', 'done'])
+        self.assertEqual([data for _, data in events[:2]], ANSWER)
+        self.assertEqual([match['partner_id'] for match in events[2][1]], [self.acme.pk, None])
+        self.assertEqual(events[3][1], {'count': 2, 'cached': False})
+
+        events = await self.stream()
+        self.assertEqual(events[-1][1], {'count': 2, 'cached': True})
+        self.assertEqual(len(StubClient.calls), 1)
+
+    async def test_a_body_that_is_not_json_is_a_400(self):
+        response = await self.async_client.post(
+            '/api/partner-search/recommend/stream/', '{"query": ', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_upstream_error_is_an_event(self):
+        StubClient.error = RuntimeError('quota exceeded')
+        self.assertEqual(await self.stream(), [('error', {'message': 'quota exceeded'})])
+
+
+class JSONArrayStreamTests(TestCase):
+    def test_objects_are_returned_as_their_closing_brace_arrives(self):
+        text = json.dumps([{'name': 'a "}" b', 'nested': {'x': 1}}, {'name': 'c\\\\'}])
+        parser = JSONArrayStream()
+        items = []
+        for char in text:
+            items.extend(parser.feed(char))
+        self.assertEqual(items, json.loads(text))
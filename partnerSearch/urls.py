@@ -6,4 +6,5 @@ urlpatterns = [
     # path('', views.partner_list, name='list'),                    # GET/POST all
     # path('<int:pk>/', views.partner_detail, name='detail'),       # single partner
     path('recommend/', views.recommend_partners, name='recommend'),  # ← THIS ONE
+    path('recommend/stream/', views.recommend_partners_stream, name='recommend-stream'),  # SSE, serve via ASGI
 ]
\ No newline at end of file
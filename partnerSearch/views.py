@@ -1,56 +1,172 @@
 # views.py
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+import asyncio
+import copy
 import json
-from google import genai
-from google.genai import types
-from decouple import config
+import threading
+import time
+import weakref
+from .cache import get_cached, get_recommendations, store
+from .enrichment import annotate_existing, existing_matches, import_new
+from .gemini import fetch_recommendations, stream_recommendation_text
+from .streaming import JSONArrayStream, sse_event
+
+# One semaphore per event loop. Under ASGI there is a single loop, so this caps
+# concurrent upstream calls for the whole process.
+_upstream_semaphores = weakref.WeakKeyDictionary()
+
+# The same cap for recommend_partners, whose calls run on the worker's threads
+_thread_semaphore = None
+_thread_semaphore_lock = threading.Lock()
+
+
+def _read_body(request):
+    """The JSON object posted to a recommend view, or None if the body is not one."""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _invalid_body():
+    return JsonResponse({'status': 'error', 'message': 'The body must be a JSON object'}, status=400)
+
+
+def _timed_out():
+    return f'Search timed out after {settings.RECOMMEND_TIMEOUT} seconds'
+
+
+def _blocking_semaphore():
+    global _thread_semaphore
+    with _thread_semaphore_lock:
+        if _thread_semaphore is None:
+            _thread_semaphore = threading.BoundedSemaphore(settings.RECOMMEND_MAX_CONCURRENCY)
+        return _thread_semaphore
+
+
+def _fetch_before(deadline):
+    """fetch_recommendations() waiting for a free upstream slot and answering by ``deadline``."""
+    def fetch(user_query):
+        semaphore = _blocking_semaphore()
+        if not semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise TimeoutError(_timed_out())
+        try:
+            return fetch_recommendations(user_query, timeout=max(deadline - time.monotonic(), 0))
+        finally:
+            semaphore.release()
+    return fetch
 
-# Initialize client (ideally put API key in settings.py/env variables)
-client = genai.Client(api_key=config('GEMINI_API_KEY'))
 
 @csrf_exempt
 def recommend_partners(request):
     if request.method == 'POST':
-        data = json.loads(request.body)
+        data = _read_body(request)
+        if data is None:
+            return _invalid_body()
         user_query = data.get('query', '')
 
-        # prompt engineering: Instruction to return JSON only
-        sys_instruction = """
-        You are a business researcher. Search for firms matching the user's description.
-        Return a list of at least 10 real companies with their Firm Name, Focus Area and HQ location.
-        Output strictly valid JSON in this format:
-        [{ 'firm name': 'firm_name',
-            'headquarters': 'hq',
-            'origin': 'hq',
-            'focus area': 'focus_area',
-            'donor experience': 'donor_experience',
-            'contact': 'contact',
-            'sector': 'sector',
-            'current partnership status': 'current_partnership_status'}]
-        """
-
         try:
-            response = client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=user_query,
-                config=types.GenerateContentConfig(
-                    tools=[types.Tool(google_search=types.GoogleSearch())], # ENABLES LIVE SEARCH
-                    response_mime_type="application/json", # Forces JSON output
-                    system_instruction=sys_instruction
-                )
-            )
-            
-            # Parse the JSON text from Gemini
-            recommendations = json.loads(response.text)
-            
-            # Optional: Check if these partners already exist in your Postgres DB
-            # for partner in recommendations:
-            #     partner['is_existing'] = Partner.objects.filter(name=partner['name']).exists()
-
-            return JsonResponse({'status': 'success', 'data': recommendations})
+            fetch = _fetch_before(time.monotonic() + settings.RECOMMEND_TIMEOUT)
+            # Served from the recommendation cache when the same query was answered recently
+            recommendations, cached = get_recommendations(user_query, fetch)
 
+            # Flag the firms that already exist in the partners table (one query)
+            recommendations = annotate_existing(copy.deepcopy(recommendations))
+            payload = {'status': 'success', 'data': recommendations, 'cached': cached}
+
+            # Optionally add the new firms to the partners table straight away
+            if data.get('import_new'):
+                result = import_new(recommendations)
+                annotate_existing(recommendations)
+                payload['imported'] = result.as_dict()
+
+            return JsonResponse(payload)
+
+        except TimeoutError:
+            return JsonResponse({'status': 'error', 'message': _timed_out()}, status=504)
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-    return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=400)
\ No newline at end of file
+    return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=400)
+
+
+
+def _upstream_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _upstream_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _upstream_semaphores[loop] = asyncio.Semaphore(settings.RECOMMEND_MAX_CONCURRENCY)
+    return semaphore
+
+
+async def _recommendation_events(user_query):
+    """
+    Server-sent events: one ``item`` per recommendation, then ``existing``
+    (the is_existing/partner_id/partnership_status of every item, in order)
+    and ``done``, or ``error``.
+    """
+    cached = await sync_to_async(get_cached)(user_query)
+    if cached is not None:
+        for item in cached:
+            yield sse_event('item', item)
+        yield sse_event('existing', await sync_to_async(existing_matches)(cached))
+        yield sse_event('done', {'count': len(cached), 'cached': True})
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.RECOMMEND_TIMEOUT
+    semaphore = _upstream_semaphore()
+    recommendations = []
+    try:
+        await asyncio.wait_for(semaphore.acquire(), deadline - loop.time())
+        try:
+            parser = JSONArrayStream()
+            chunks = stream_recommendation_text(user_query)
+            try:
+                while True:
+                    try:
+                        text = await asyncio.wait_for(anext(chunks), deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    for item in parser.feed(text):
+                        recommendations.append(item)
+                        yield sse_event('item', item)
+            finally:
+                await chunks.aclose()
+        finally:
+            semaphore.release()
+    except asyncio.TimeoutError:
+        yield sse_event('error', {'message': _timed_out()})
+        return
+    except Exception as e:
+        yield sse_event('error', {'message': str(e)})
+        return
+
+    await sync_to_async(store)(user_query, recommendations)
+    yield sse_event('existing', await sync_to_async(existing_matches)(recommendations))
+    yield sse_event('done', {'count': len(recommendations), 'cached': False})
+
+
+@csrf_exempt
+async def recommend_partners_stream(request):
+    """
+    Async variant of recommend_partners. Recommendations are streamed as
+    server-sent events while Gemini is still answering. Serve it through
+    core/asgi.py so that waiting on Gemini does not hold a worker thread.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=400)
+
+    data = _read_body(request)
+    if data is None:
+        return _invalid_body()
+    user_query = data.get('query', '')
+
+    response = StreamingHttpResponse(_recommendation_events(user_query), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let proxies hold back events
+    return response
@@ -1,16 +1,26 @@
 # admin.py
+from django.conf import settings
 from django.contrib import admin
+from django.core.files.base import ContentFile
+from django.shortcuts import redirect
+from django.urls import reverse
 from import_export.admin import ImportExportModelAdmin
-from .models import Partner
+from .jobs import enqueue_import
+from .models import ImportJob, Location, Partner, PartnershipStatus, Sector
 from .resources import PartnerResource
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 @admin.register(Partner)
 class PartnerAdmin(ImportExportModelAdmin):
     resource_class = PartnerResource
     list_display = ('firm_name', 'hq', 'contact', 'current_partnership_status', 'created', 'updated')
     list_filter = ('hq', 'current_partnership_status', 'created')
-    search_fields = ('firm_name', 'hq', 'focus_area', 'contact', 'donor_experience', 'current_partnership_status')
+    list_select_related = ('hq', 'current_partnership_status')
+    search_fields = ('firm_name', 'hq__name', 'focus_area', 'contact', 'donor_experience', 'current_partnership_status__name')
+    autocomplete_fields = ('hq', 'current_partnership_status', 'sector')
     ordering = ('firm_name',)
     list_per_page = 20
     fieldsets = (
@@ -18,7 +28,7 @@ class PartnerAdmin(ImportExportModelAdmin):
             'fields': ('firm_name',)
         }),
         ('Details', {
-            'fields': ('hq', 'focus_area', 'contact', 'donor_experience', 'current_partnership_status')
+            'fields': ('hq', 'sector', 'focus_area', 'contact', 'donor_experience', 'current_partnership_status')
         }),
         ('Timestamps', {
             'fields': ('created', 'updated'),
@@ -34,6 +44,11 @@ class PartnerAdmin(ImportExportModelAdmin):
         """
         Override process_import to handle temporary file cleanup more robustly.
         """
+        if getattr(settings, 'PARTNER_IMPORT_BACKGROUND', False):
+            response = self._enqueue_confirmed_import(request)
+            if response is not None:
+                return response
+
         import_file = request.FILES.get('import_file')
         if not import_file:
             return self._handle_import_file_not_found(request)
@@ -55,6 +70,35 @@ class PartnerAdmin(ImportExportModelAdmin):
 
         return result
 
+    def _enqueue_confirmed_import(self, request):
+        """
+        Hand a confirmed CSV/XLSX import over to a background ImportJob and
+        redirect to its status page. Returns None for anything the job runner
+        cannot read, so the regular import takes over.
+        """
+        if not self.has_import_permission(request):
+            return None
+        confirm_form = self.create_confirm_form(request)
+        if not confirm_form.is_valid():
+            return None
+
+        input_format = self.get_import_formats()[int(confirm_form.cleaned_data["format"])]()
+        extension = input_format.get_extension()
+        if extension not in ('csv', 'xlsx'):
+            return None
+
+        tmp_storage = self.get_tmp_storage_class()(
+            name=confirm_form.cleaned_data["import_file_name"],
+            read_mode='rb',
+            **self.get_tmp_storage_class_kwargs(),
+        )
+        name = os.path.splitext(confirm_form.cleaned_data["original_file_name"])[0]
+        job = enqueue_import(ContentFile(tmp_storage.read(), name=f"{name}.{extension}"))
+        tmp_storage.remove()
+
+        self.message_user(request, f"Import of {job.original_name} queued as job {job.pk}.")
+        return redirect(reverse('admin:partners_importjob_change', args=[job.pk]))
+
     def get_import_path(self, request, *args, **kwargs):
         """
         Get the import path, ensuring it matches the temp storage location.
@@ -66,3 +110,24 @@ class PartnerAdmin(ImportExportModelAdmin):
     def _handle_import_file_not_found(self, request):
         self.message_user(request, "No file was uploaded.", level='error')
         return None
+
+
+
+@admin.register(Location, Sector, PartnershipStatus)
+class LookupTableAdmin(admin.ModelAdmin):
+    """Renaming a row here renames it on every partner that uses it."""
+    list_display = ('name',)
+    search_fields = ('name',)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'original_name', 'status', 'rows_read', 'total_rows', 'processed', 'created', 'finished')
+    list_filter = ('status', 'created')
+    readonly_fields = [field.name for field in ImportJob._meta.fields] + ['progress']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PartnersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'partners'
+
+    def ready(self):
+        from . import cache, facets, jobs, lookup_tables, signals, snapshot, versions  # noqa: F401  (connect receivers)
@@ -0,0 +1,239 @@
+# benchmark.py
+"""
+Synthetic-data benchmarks for partner ingestion and the read endpoints.
+
+Used by ``manage.py benchmark_partners``. Every scenario runs inside a
+transaction that is rolled back, so the database is left as it was and the
+numbers can be compared between commits and between SQLite and PostgreSQL
+(run the command once per settings module). The data generators are shared
+with the pytest-benchmark suite in ``benchmarks/``, which runs the same
+scenarios with the query budgets raising.
+"""
+import io
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from rest_framework.test import APIRequestFactory
+from tablib import Dataset
+
+from .cache import CACHE_ALIAS
+from .lookup_tables import LOOKUPS
+from .snapshot import store
+
+HEADERS = (
+    'Firm Name',
+    'Headquarters',
+    'Focus Area',
+    'Contact',
+    'Donor Experience',
+    'Current Partnership Status',
+    'Sector',
+)
+RESOURCE_HEADERS = (
+    'firm_name',
+    'hq',
+    'focus_area',
+    'contact',
+    'donor_experience',
+    'current_partnership_status',
+    'sector',
+)
+
+COUNTRIES = ['Bangladesh', 'Nepal', 'Kenya', 'Uganda', 'Peru', 'Vietnam', 'Ghana', 'India']
+SECTORS = ['Health', 'Education', 'Energy', 'Water', 'Agriculture', 'Governance']
+STATUSES = ['Active', 'Prospective', 'Former', 'On hold']
+DONORS = ['USAID', 'FCDO', 'World Bank', 'ADB', 'EU', 'GIZ']
+WORDS = [
+    'capacity', 'climate', 'nutrition', 'training', 'monitoring', 'evaluation',
+    'resilience', 'finance', 'digital', 'gender', 'sanitation', 'research',
+]
+
+# Read requests timed against PartnerViewSet: label -> query string
+LIST_QUERIES = {
+    'list': {},
+    'search': {'search': 'climate'},
+    'filter': {'hq': 'Kenya'},
+    'search+filter': {'search': 'health', 'hq': 'Nepal'},
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def generate_rows(count, seed=0, prefix='Benchmark Partner'):
+    """Yield ``count`` deterministic partner rows in spreadsheet column order."""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield (
+            f'{prefix} {i:06d}',
+            rng.choice(COUNTRIES),
+            ' '.join(rng.sample(WORDS, 3)),
+            f'contact{i}@example.org',
+            ', '.join(rng.sample(DONORS, 2)),
+            rng.choice(STATUSES),
+            rng.choice(SECTORS),
+        )
+
+
+def build_workbook(rows):
+    """Serialize rows to an .xlsx file held in memory."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADERS)
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    index = max(int(round(fraction * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+@contextmanager
+def measure(track_memory=True):
+    """
+    Time a block and count its queries. Yields a dict filled in on exit with
+    ``seconds``, ``queries`` and ``peak_mb`` (None without memory tracking).
+    """
+    stats = {}
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            yield stats
+    finally:
+        stats['seconds'] = time.perf_counter() - started
+        stats['queries'] = len(queries.captured_queries)
+        stats['peak_mb'] = None
+        if track_memory:
+            stats['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+
+
+@contextmanager
+def rolled_back():
+    """Run a block in a transaction that is always rolled back."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+    finally:
+        # Shared cache entries built from the discarded rows are keyed on a data
+        # version that was rolled back with them and is never reached again.
+        # Drop the in-process copies only; the version row stays as it was.
+        store.clear()
+        for cache in LOOKUPS.values():
+            cache.clear()
+
+
+def _import_stats(label, rows, stats):
+    return {
+        'scenario': label,
+        'rows': rows,
+        'seconds': round(stats['seconds'], 4),
+        'rows_per_sec': round(rows / stats['seconds'], 1) if stats['seconds'] else None,
+        'queries': stats['queries'],
+        'peak_mb': None if stats['peak_mb'] is None else round(stats['peak_mb'], 2),
+    }
+
+
+def _request_factory():
+    # Build requests for a host the settings accept ('testserver' usually is not)
+    hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+    return APIRequestFactory(SERVER_NAME=hosts[0] if hosts else 'localhost')
+
+
+def bench_upload(label, payload, rows, track_memory):
+    from .views import upload_excel
+
+    request = _request_factory().post(
+        '/api/upload-excel/',
+        {'file': SimpleUploadedFile('benchmark.xlsx', payload)},
+        format='multipart',
+    )
+    with measure(track_memory) as stats:
+        response = upload_excel(request)
+    if response.status_code >= 400:
+        raise RuntimeError(f'upload_excel failed: {response.data}')
+    return _import_stats(label, rows, stats)
+
+
+def bench_resource_import(label, rows, track_memory):
+    from .resources import PartnerResource
+
+    dataset = Dataset(headers=list(RESOURCE_HEADERS))
+    for row in rows:
+        dataset.append(row)
+    with measure(track_memory) as stats:
+        result = PartnerResource().import_data(dataset, dry_run=False, raise_errors=True)
+    if result.has_errors():
+        raise RuntimeError(f'{label} reported errors')
+    return _import_stats(label, len(dataset), stats)
+
+
+def bench_reads(label, view, params, repeat, cold):
+    """Time ``repeat`` GET requests, clearing the partner cache first if ``cold``."""
+    factory = _request_factory()
+    timings, queries = [], []
+    for _ in range(repeat):
+        if cold:
+            caches[CACHE_ALIAS].clear()
+        request = factory.get('/api/partners/', params)
+        with measure(track_memory=False) as stats:
+            response = view(request)
+            response.render()
+        timings.append(stats['seconds'] * 1000)
+        queries.append(stats['queries'])
+    return {
+        'scenario': label,
+        'requests': repeat,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': max(queries),
+    }
+
+
+def run(size, repeat=20, track_memory=True, cold=True, seed=0):
+    """
+    Run every scenario against ``size`` synthetic rows and return the result
+    dicts. Imports are measured twice: into an empty set of benchmark firms
+    and again with the same file (all rows unchanged). The admin resource
+    then re-imports the rows with a changed headquarters column.
+    """
+    from .views import PartnerViewSet, hq_list
+
+    rows = list(generate_rows(size, seed))
+    payload = build_workbook(rows)
+    changed = [(row[0], COUNTRIES[(i + 1) % len(COUNTRIES)]) + row[2:] for i, row in enumerate(rows)]
+    list_view = PartnerViewSet.as_view({'get': 'list'})
+
+    results = []
+    with rolled_back():
+        results.append(bench_upload('upload_excel (insert)', payload, size, track_memory))
+        results.append(bench_upload('upload_excel (unchanged)', payload, size, track_memory))
+        results.append(bench_resource_import('PartnerResource (update)', changed, track_memory))
+        for label, params in LIST_QUERIES.items():
+            results.append(bench_reads(f'PartnerViewSet {label}', list_view, params, repeat, cold))
+        results.append(bench_reads('hq_list', hq_list, {}, repeat, cold))
+    for result in results:
+        result['size'] = size
+        result['vendor'] = connection.vendor
+    return results
@@ -0,0 +1,79 @@
+# cache.py
+"""
+Response cache for the partner list endpoint.
+
+Entries live in the ``partners`` cache alias (local memory by default, or the
+file or database backend; see ``PARTNER_CACHE_BACKEND`` in settings). Keys
+include the shared partner data version the request is answered at (see
+versions.py), so a write made by any process makes all earlier entries
+unreachable at once instead of deleting them one by one. The list ETag
+(conditional.py) is built from the same version, so a cached body always
+goes out under the validators it was stored with.
+"""
+import hashlib
+import threading
+
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .snapshot import request_version
+
+CACHE_ALIAS = 'partners'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else None
+    stats['backend'] = get_cache().__class__.__name__
+    return stats
+
+
+def make_key(request, prefix='list'):
+    """
+    Cache key for a request: the data version, the rendered media type and
+    the non-empty query parameters in sorted order.
+    """
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    raw = repr((request.path, request.accepted_media_type, params))
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"partners:{prefix}:{request_version(request).key}:{digest}"
+
+
+class CachedListMixin:
+    """Serve repeated list requests from the ``partners`` cache."""
+
+    def list(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = make_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _count('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count('misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
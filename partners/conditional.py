@@ -0,0 +1,73 @@
+# conditional.py
+"""
+Conditional GET support for the partners API.
+
+List validators come from the shared partner data version (versions.py),
+which every write bumps: the ETag is built from it and the request, and
+Last-Modified is the time of the last bump. The response cache keys its
+entries on the same version, so a cached body is never sent under newer
+validators. Detail validators come from the row's own ``updated``. Both cost
+at most one small query before anything is serialized, so a matching
+``If-None-Match`` or ``If-Modified-Since`` returns a 304 without building
+the payload.
+"""
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .snapshot import request_version
+
+
+def _make_etag(*parts):
+    return quote_etag(hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest())
+
+
+def _conditional(request, etag, last_modified):
+    """Return a 304/412 response if the request's validators match, else None."""
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def _set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+class ConditionalGetMixin:
+    """Adds ETag/Last-Modified validation to ``list`` and ``retrieve``."""
+
+    def list_validators(self, request):
+        version = request_version(request)
+        etag = _make_etag("list", version.key, request.get_full_path(), request.accepted_media_type)
+        return etag, version.changed
+
+    def retrieve_validators(self, request):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        updated = (
+            self.get_queryset().filter(**{self.lookup_field: lookup})
+            .values_list("updated", flat=True).first()
+        )
+        if updated is None:
+            return None, None
+        return _make_etag("detail", lookup, updated, request.accepted_media_type), updated
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.list_validators(request)
+        response = _conditional(request, etag, last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return _set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = self.retrieve_validators(request)
+        if etag is None:
+            return super().retrieve(request, *args, **kwargs)  # 404
+        response = _conditional(request, etag, last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return _set_validators(response, etag, last_modified)
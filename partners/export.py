@@ -0,0 +1,102 @@
+# export.py
+"""
+Streaming partner exports.
+
+Rows are read with ``QuerySet.iterator()`` (a server-side cursor on
+PostgreSQL) and encoded one at a time, so exporting the whole table uses
+constant memory. CSV and NDJSON start sending bytes with the first row.
+XLSX is a zip archive that can only be written once complete, so the rows are
+written through openpyxl's write-only mode into a temporary file, which is then
+streamed out.
+"""
+import csv
+import json
+import tempfile
+
+from django.conf import settings
+from openpyxl import Workbook
+
+from .lookup_tables import lookup_names, value_columns
+
+EXPORT_FIELDS = (
+    'id',
+    'firm_name',
+    'hq',
+    'focus_area',
+    'contact',
+    'donor_experience',
+    'current_partnership_status',
+    'sector',
+    'created',
+    'updated',
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def get_chunk_size():
+    return getattr(settings, 'PARTNER_EXPORT_CHUNK_SIZE', 2000)
+
+
+def iter_rows(queryset, fields=EXPORT_FIELDS):
+    # Lookup columns are read as ids and named from memory, without joins
+    rows = queryset.values_list(*value_columns(fields)).iterator(chunk_size=get_chunk_size())
+    return lookup_names(rows, fields)
+
+
+def export_value(value):
+    """A value as CSV and NDJSON write it: dates and datetimes in full ISO 8601."""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, fields=EXPORT_FIELDS):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(fields)  # BOM so Excel reads UTF-8
+    for row in iter_rows(queryset, fields):
+        yield writer.writerow([export_value(value) for value in row])
+
+
+def stream_ndjson(queryset, fields=EXPORT_FIELDS):
+    for row in iter_rows(queryset, fields):
+        yield json.dumps({field: export_value(value) for field, value in zip(fields, row)}) + '\n'
+
+
+def stream_xlsx(queryset, fields=EXPORT_FIELDS):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Partners')
+    sheet.append(fields)
+    for row in iter_rows(queryset, fields):
+        # Excel cannot store timezone-aware datetimes
+        sheet.append([
+            value.replace(tzinfo=None) if getattr(value, 'tzinfo', None) else value
+            for value in row
+        ])
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while True:
+            chunk = file.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'xlsx': stream_xlsx,
+}
@@ -0,0 +1,89 @@
+# facets.py
+"""
+Distinct values with counts for the filterable partner columns.
+
+The facets are counted per lookup id and named from the in-memory lookup
+cache. They are computed with one UNION ALL query and cached under the shared
+partner data version (versions.py), so a write made by any process moves
+every process to a new entry. The cached entry carries an ETag and a
+Last-Modified time so that clients can revalidate with a 304.
+"""
+import hashlib
+import json
+
+from django.db.models import Count, F, Value
+from django.utils import timezone
+
+from .cache import get_cache
+from .lookup_tables import LOOKUPS
+from .models import Partner
+from .snapshot import request_snapshot, request_version
+
+FACET_FIELDS = ('hq', 'sector', 'current_partnership_status')
+
+CACHE_KEY = 'partners:facets'
+# Entries of older versions are never read again; the timeout only frees them
+CACHE_TIMEOUT = 60 * 60
+
+
+def _facet_query(field):
+    # Grouped on the lookup id; names are filled in from LOOKUPS
+    return (
+        Partner.objects.order_by()
+        .exclude(**{f'{field}__isnull': True})
+        .annotate(facet=Value(field), value=F(f'{field}_id'))
+        .values('facet', 'value')
+        .annotate(count=Count('id'))
+    )
+
+
+def compute_facets(snapshot=None):
+    """
+    ``{field: [{"value": ..., "count": ...}, ...]}``, values sorted. Counted
+    from ``snapshot`` when given, else with one query.
+    """
+    if snapshot is not None:
+        rows = [
+            {'facet': field, 'value': pk, 'count': len(records)}
+            for field in FACET_FIELDS
+            for pk, records in snapshot.by_lookup[field].items()
+            if pk is not None and records
+        ]
+    else:
+        queries = [_facet_query(field) for field in FACET_FIELDS]
+        rows = queries[0].union(*queries[1:], all=True)
+
+    rows = list(rows)
+    for field in FACET_FIELDS:
+        LOOKUPS[field].preload(row['value'] for row in rows if row['facet'] == field)
+    facets = {field: [] for field in FACET_FIELDS}
+    for row in rows:
+        name = LOOKUPS[row['facet']].name(row['value'])
+        facets[row['facet']].append({'value': name, 'count': row['count']})
+    for values in facets.values():
+        values.sort(key=lambda item: item['value'])
+    return facets
+
+
+def get_facets(request):
+    """
+    Facets entry for the data version ``request`` is answered at:
+    ``{"data", "etag", "last_modified"}``. Kept on the request, so the
+    validators and the body agree.
+    """
+    if not hasattr(request, '_facets'):
+        version = request_version(request)
+        cache = get_cache()
+        key = f'{CACHE_KEY}:{version.key}'
+        entry = cache.get(key)
+        if entry is None:
+            data = compute_facets(request_snapshot(request))
+            payload = json.dumps(data, sort_keys=True).encode()
+            entry = {
+                'data': data,
+                'etag': hashlib.md5(payload).hexdigest(),
+                'last_modified': (version.changed or timezone.now()).replace(microsecond=0),
+            }
+            cache.set(key, entry, CACHE_TIMEOUT)
+        request._facets = entry
+    return request._facets
@@ -0,0 +1,31 @@
+# filters.py
+from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from .lookup_tables import LOOKUPS
+from .models import Partner
+
+
+class LookupNameFilter(filters.CharFilter):
+    """
+    Filter a lookup foreign key by name (case-insensitive). The name is
+    resolved to its id in memory, so the query is an integer comparison.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        pk = LOOKUPS[self.field_name].id_for(value, create=False)
+        if pk is None:
+            return qs.none()
+        return qs.filter(**{f'{self.field_name}_id': pk})
+
+
+class PartnerFilter(filters.FilterSet):
+    hq = LookupNameFilter(field_name='hq')
+    sector = LookupNameFilter(field_name='sector')
+    current_partnership_status = LookupNameFilter(field_name='current_partnership_status')
+
+    class Meta:
+        model = Partner
+        fields = ['hq', 'sector', 'current_partnership_status']
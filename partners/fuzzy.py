@@ -0,0 +1,153 @@
+# fuzzy.py
+"""
+Typo-tolerant firm name lookup.
+
+PostgreSQL answers fuzzy queries with pg_trgm (``%`` operator backed by a GIN
+trigram index). The ``%`` operator matches at ``pg_trgm.similarity_threshold``
+(0.3 unless changed), so the query sets it to the requested threshold for its
+own transaction. Other databases, mainly SQLite in local development and tests,
+and servers without pg_trgm use ``TrigramIndex``: an in-process inverted index over the same trigrams
+pg_trgm extracts, scored the same way (shared trigrams / all trigrams).
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections, transaction
+from django.db.models import Count, Max
+
+from .models import Partner
+from .snapshot import get_snapshot
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def get_threshold():
+    return getattr(settings, 'PARTNER_FUZZY_THRESHOLD', 0.3)
+
+
+def trigrams(text):
+    """Trigrams of ``text`` the way pg_trgm builds them."""
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """pg_trgm ``similarity()`` of two strings."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+class TrigramIndex:
+    """Inverted trigram index over ``(id, name)`` pairs."""
+
+    def __init__(self, items=()):
+        self._names = {}
+        self._grams = {}
+        self._postings = defaultdict(set)
+        for pk, name in items:
+            self.add(pk, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, pk, name):
+        grams = trigrams(name)
+        self._names[pk] = name
+        self._grams[pk] = grams
+        for gram in grams:
+            self._postings[gram].add(pk)
+
+    def search(self, query, threshold=None, limit=10):
+        """Return ``[(pk, name, similarity)]``, best matches first (all if ``limit`` is None)."""
+        threshold = get_threshold() if threshold is None else threshold
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for pk in self._postings.get(gram, ()):
+                shared[pk] += 1
+
+        matches = []
+        for pk, count in shared.items():
+            score = count / (len(query_grams) + len(self._grams[pk]) - count)
+            if score >= threshold:
+                matches.append((pk, self._names[pk], score))
+        matches.sort(key=lambda match: (-match[2], match[1]))
+        return matches[:limit]
+
+
+_index_cache = {}
+_has_pg_trgm = {}
+
+
+def has_pg_trgm(using='default'):
+    """Whether the pg_trgm extension is installed on a PostgreSQL database."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    if using not in _has_pg_trgm:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _has_pg_trgm[using] = cursor.fetchone() is not None
+    return _has_pg_trgm[using]
+
+
+def get_partner_index(using='default'):
+    """
+    Trigram index over all firm names, rebuilt only when the row count or the
+    latest ``updated`` timestamp changes (or the partner snapshot's version).
+    """
+    snapshot = get_snapshot() if using == 'default' else None
+    if snapshot is not None:
+        key = (using, 'snapshot', snapshot.version)
+        if _index_cache.get('key') != key:
+            _index_cache['index'] = TrigramIndex((record.id, record.firm_name) for record in snapshot.records)
+            _index_cache['key'] = key
+        return _index_cache['index']
+
+    partners = Partner.objects.using(using)
+    signature = partners.aggregate(count=Count('id'), latest=Max('updated'))
+    key = (using, signature['count'], signature['latest'])
+    if _index_cache.get('key') != key:
+        _index_cache['index'] = TrigramIndex(partners.values_list('id', 'firm_name'))
+        _index_cache['key'] = key
+    return _index_cache['index']
+
+
+def fuzzy_search(query, queryset=None, threshold=None, limit=10):
+    """
+    Partners whose firm name resembles ``query``, best matches first, each
+    with a ``similarity`` attribute.
+    """
+    queryset = Partner.objects.all() if queryset is None else queryset
+    threshold = get_threshold() if threshold is None else threshold
+
+    if has_pg_trgm(queryset.db):
+        with transaction.atomic(using=queryset.db), connections[queryset.db].cursor() as cursor:
+            # set_limit() for this transaction only, so that ``%`` (and its
+            # index) matches below 0.3 too
+            cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", [str(threshold)])
+            return list(
+                queryset.filter(firm_name__trigram_similar=query)
+                .annotate(similarity=TrigramSimilarity('firm_name', query))
+                .filter(similarity__gte=threshold)
+                .order_by('-similarity', 'firm_name')[:limit]
+            )
+
+    matches = get_partner_index(queryset.db).search(query, threshold, limit=None)
+    partners = queryset.in_bulk([pk for pk, _, _ in matches])
+    results = []
+    for pk, _, score in matches:
+        if pk in partners:
+            partners[pk].similarity = score
+            results.append(partners[pk])
+    return results[:limit]
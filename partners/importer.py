@@ -0,0 +1,495 @@
+# importer.py
+"""
+Set-based ingestion of partner spreadsheets.
+
+The whole sheet is cleaned with column-wise pandas operations, existing firms
+are resolved with one case-insensitive lookup per batch and the writes go
+through ``bulk_create`` / ``bulk_update`` instead of one query per row.
+"""
+import codecs
+import csv
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from core.metrics import bulk_statements, queries_within
+
+from .lookup_tables import LOOKUPS, normalize_label
+from .models import Partner, content_hash
+from .signals import notify_partners_changed
+
+# Spreadsheet header (stripped, lower-cased) -> Partner field
+COLUMN_MAPPING = {
+    'firm name': 'firm_name',
+    'headquarters': 'hq',
+    'origin': 'hq',
+    'focus area': 'focus_area',
+    'donor experience': 'donor_experience',
+    'contact': 'contact',
+    'sector': 'sector',
+    'current partnership status': 'current_partnership_status'
+}
+
+# Optional columns copied onto the partner when the cell is not empty
+PARTNER_FIELDS = (
+    'hq',
+    'focus_area',
+    'contact',
+    'donor_experience',
+    'current_partnership_status',
+    'sector',
+)
+
+# Spreadsheet row of the first data row (row 1 holds the headers)
+FIRST_DATA_ROW = 2
+
+# SQL queries of one batch besides the statements its bulk writes and reads
+# are split into (see batch_query_budget()): fingerprints, per lookup table up
+# to three for new names and one to name the stored values, the savepoint
+# around the writes and the data version bump. A batch retried row by row gets
+# ROW_RETRY_QUERIES per partner.
+BATCH_QUERIES = 16
+ROW_RETRY_QUERIES = 5
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file cannot be imported as a partner sheet."""
+
+
+def get_batch_size():
+    return getattr(settings, 'PARTNER_IMPORT_BATCH_SIZE', 1000)
+
+
+def map_columns(df):
+    """Normalize the headers of ``df`` and rename them to Partner fields."""
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    df = df.rename(columns=COLUMN_MAPPING, errors='ignore')
+    # 'headquarters' and 'origin' both map to hq, keep the first one
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def normalize_key(firm_name):
+    """Key used to match firm names case-insensitively."""
+    return firm_name.lower()
+
+
+class ImportResult:
+    """
+    Row counters and skipped-row messages collected during an import. With
+    ``preview=True`` it also lists, per firm, the insert/update/noop decision
+    and the changed values.
+    """
+
+    COUNTERS = {'insert': 'created', 'update': 'updated', 'noop': 'unchanged'}
+
+    def __init__(self, preview=False):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = []
+        self.preview = {'insert': [], 'update': [], 'noop': []} if preview else None
+
+    def skip(self, row_number, reason):
+        self.skipped.append(f"Row {row_number}: {reason}")
+
+    def count(self, action, rows):
+        """Count a firm, from spreadsheet ``rows``, once its ``action`` is done."""
+        counter = self.COUNTERS[action]
+        setattr(self, counter, getattr(self, counter) + 1)
+
+    def record(self, action, firm_name, rows, changes=None):
+        if self.preview is None:
+            return
+        entry = {"firm_name": firm_name, "rows": [int(row) for row in rows]}
+        if changes:
+            entry["changes"] = changes
+        self.preview[action].append(entry)
+
+    def as_dict(self):
+        data = {
+            "processed": self.processed,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+        }
+        if self.preview is not None:
+            data["preview"] = self.preview
+        return data
+
+
+def _max_length(field):
+    model, name = (LOOKUPS[field].model, 'name') if field in LOOKUPS else (Partner, field)
+    return model._meta.get_field(name).max_length
+
+
+def clean_frame(df, result, row_numbers=None):
+    """
+    Clean a mapped DataFrame column by column.
+
+    Rows without a firm name or with values longer than the column allows are
+    recorded in ``result`` and dropped. The returned frame is indexed by the
+    spreadsheet row number and keeps NaN for empty optional cells, which means
+    "leave the stored value alone".
+    """
+    df = df.copy()
+    if row_numbers is None:
+        row_numbers = range(FIRST_DATA_ROW, FIRST_DATA_ROW + len(df))
+    df.index = pd.Index(row_numbers)
+
+    names = df['firm_name']
+    names = names.where(names.isna(), names.astype(str).str.strip())
+    missing = names.isna() | (names == '')
+    for row_number in df.index[missing]:
+        result.skip(row_number, "firm_name is missing")
+
+    cleaned = pd.DataFrame({'firm_name': names}, index=df.index)
+    for field in PARTNER_FIELDS:
+        if field not in df.columns:
+            continue
+        column = df[field]
+        # Lookup names (hq, sector, status) are matched ignoring case later on
+        values = column.astype(str).str.strip()
+        cleaned[field] = values.where(column.notna())
+
+    cleaned = cleaned[~missing]
+
+    too_long = pd.Series(False, index=cleaned.index)
+    for field in ('firm_name',) + PARTNER_FIELDS:
+        max_length = _max_length(field)
+        if max_length is None or field not in cleaned.columns:
+            continue
+        over = cleaned[field].str.len() > max_length
+        over = over.fillna(False).astype(bool) & ~too_long
+        for row_number in cleaned.index[over]:
+            result.skip(
+                row_number,
+                f"Error - {field} is longer than {max_length} characters",
+            )
+        too_long |= over
+
+    return cleaned[~too_long]
+
+
+def _collapse_duplicates(cleaned):
+    """
+    Merge rows naming the same firm, later rows winning per column.
+
+    This reproduces what row-by-row ``update_or_create`` did for a firm that
+    appears several times in one sheet. Returns ``{key: (values, rows)}``.
+    """
+    keys = cleaned['firm_name'].str.lower().rename('name_key')
+    merged = cleaned.groupby(keys, sort=False).last()
+    rows = cleaned.index.to_series().groupby(keys, sort=False).agg(list)
+
+    records = {}
+    for key, values in zip(merged.index, merged.to_dict('records')):
+        values = {
+            field: value for field, value in values.items() if not pd.isna(value)
+        }
+        records[key] = (values, rows[key])
+    return records
+
+
+def fetch_fingerprints(keys):
+    """
+    Map normalized firm names to ``(id, content_hash)`` of existing partners
+    with one narrow query that does not read the content columns.
+    """
+    if not keys:
+        return {}
+    rows = (
+        Partner.objects.annotate(name_key=Lower('firm_name'))
+        .filter(name_key__in=keys)
+        .values_list('name_key', 'id', 'content_hash')
+    )
+    return {key: (pk, digest) for key, pk, digest in rows}
+
+
+def batch_query_budget(size):
+    """
+    Most SQL queries one batch of ``size`` firms may run on this database:
+    BATCH_QUERIES plus the statements that reading the changed partners,
+    ``bulk_create`` and ``bulk_update`` are split into.
+    """
+    in_bulk_size = connection.features.max_query_params or size
+    fields = [field.name for field in Partner._meta.concrete_fields if not field.primary_key]
+    return (
+        BATCH_QUERIES
+        + -(-size // in_bulk_size)
+        + bulk_statements(Partner, size)
+        + bulk_statements(Partner, size, update_fields=fields)
+    )
+
+
+def _save_rows(to_create, to_update, update_fields, rows_by_key, result):
+    """
+    Write one batch. If the bulk statements fail, retry the batch one partner
+    at a time so that the offending rows can be reported as skipped.
+    """
+    try:
+        with transaction.atomic():
+            if to_create:
+                Partner.objects.bulk_create(to_create)
+            if to_update:
+                Partner.objects.bulk_update(to_update, update_fields)
+        for partner in to_create:
+            result.count('insert', rows_by_key[normalize_key(partner.firm_name)])
+        for partner in to_update:
+            result.count('update', rows_by_key[normalize_key(partner.firm_name)])
+        return
+    except Exception:
+        # The rolled back bulk_create() may have assigned primary keys
+        for partner in to_create:
+            partner.pk = None
+            partner._state.adding = True
+
+    for partner in to_create + to_update:
+        created = partner._state.adding
+        rows = rows_by_key[normalize_key(partner.firm_name)]
+        try:
+            with queries_within('bulk_upsert row retry', ROW_RETRY_QUERIES), transaction.atomic():
+                partner.save()
+        except Exception as e:
+            for row_number in rows:
+                result.skip(row_number, f"Error - {str(e)}")
+            result.processed -= len(rows)
+            continue
+        result.count('insert' if created else 'update', rows)
+
+
+def _resolve_labels(records, create=True):
+    """
+    Look the hq/sector/status names of a batch up in their tables, creating
+    the missing ones if ``create``. Returns ``{field: {normalized name: (id, name)}}``.
+    """
+    return {
+        field: cache.resolve([values[field] for values, _ in records if field in values], create)
+        for field, cache in LOOKUPS.items()
+    }
+
+
+def _with_labels(values, labels):
+    """
+    ``values`` with lookup names replaced by their stored spelling, plus a
+    ``{field_id: id}`` dict for the model. Names not in the tables yet (dry
+    runs only) are kept as given, with a None id.
+    """
+    canonical, ids = dict(values), {}
+    for field, found in labels.items():
+        if field not in values:
+            continue
+        label = found.get(normalize_label(values[field]))
+        if label is None:
+            ids[f'{field}_id'] = None
+        else:
+            ids[f'{field}_id'], canonical[field] = label
+    return canonical, ids
+
+
+def _lookup_differs(field, old, new):
+    if field in LOOKUPS:
+        return normalize_label(old or '') != normalize_label(new or '')
+    return old != new
+
+
+def bulk_upsert(cleaned, result, batch_size=None, dry_run=False, on_progress=None):
+    """
+    Create or update the partners described by a cleaned frame.
+
+    Existing firms are matched case-insensitively on ``firm_name``, and
+    hq/sector/status names are resolved to lookup rows once per batch. A row
+    whose content hash equals the stored ``content_hash`` is a no-op without
+    loading the partner. The others are compared with the live values and
+    only the changed ones are written. With ``dry_run`` nothing is written
+    (new lookup names are not created either); the counters (and
+    ``result.preview`` if enabled) describe what would happen.
+
+    Every batch has its own query budget (``batch_query_budget()``), so the
+    budget of the view running the import does not depend on the file size.
+    ``on_progress`` is called with the result after every batch.
+    """
+    batch_size = batch_size or get_batch_size()
+    result.processed += len(cleaned)
+    records = _collapse_duplicates(cleaned)
+    keys = list(records)
+
+    for start in range(0, len(keys), batch_size):
+        batch = {key: records[key] for key in keys[start:start + batch_size]}
+        with queries_within('bulk_upsert batch', batch_query_budget(len(batch))):
+            _upsert_batch(batch, result, dry_run)
+        if on_progress is not None:
+            on_progress(result)
+    return result
+
+
+def _upsert_batch(records, result, dry_run):
+    """Write one batch of ``{key: (values, rows)}`` records; see bulk_upsert()."""
+    fingerprints = fetch_fingerprints(list(records))
+    labels = _resolve_labels(list(records.values()), create=not dry_run)
+    now = timezone.now()
+
+    to_create, to_update = [], []
+    update_fields = {'updated', 'content_hash'}
+    rows_by_key = {}
+    candidates = {}
+    for key, (values, rows) in records.items():
+        values, ids = _with_labels(values, labels)
+        rows_by_key[key] = rows
+        match = fingerprints.get(key)
+        if match is None:
+            partner = Partner(**{
+                field: value for field, value in values.items() if field not in LOOKUPS
+            }, **ids)
+            partner.content_hash = content_hash(values)
+            to_create.append(partner)
+            result.record('insert', values['firm_name'], rows)
+        elif content_hash(values) == match[1]:
+            result.count('noop', rows)
+            result.record('noop', values['firm_name'], rows)
+        else:
+            candidates[match[0]] = (key, values, ids)
+
+    partners = Partner.objects.defer('search_vector').in_bulk(list(candidates))
+    for field, cache in LOOKUPS.items():
+        cache.preload(getattr(partner, f'{field}_id') for partner in partners.values())
+    for pk, (key, values, ids) in candidates.items():
+        rows = rows_by_key[key]
+        partner = partners[pk]
+        current = partner.content_values()
+        changes = {
+            field: [current[field], value]
+            for field, value in values.items()
+            if _lookup_differs(field, current[field], value)
+        }
+        if not changes:
+            result.count('noop', rows)
+            result.record('noop', values['firm_name'], rows)
+            continue
+        result.record('update', values['firm_name'], rows, changes)
+        for field in changes:
+            if field in LOOKUPS:
+                setattr(partner, f'{field}_id', ids[f'{field}_id'])
+            else:
+                setattr(partner, field, values[field])
+            current[field] = values[field]
+        # bulk_update() skips auto_now, so bump the timestamp ourselves
+        partner.updated = now
+        partner.content_hash = content_hash(current)
+        update_fields.update(changes)
+        to_update.append(partner)
+
+    if dry_run:
+        for action, partners in (('insert', to_create), ('update', to_update)):
+            for partner in partners:
+                result.count(action, rows_by_key[normalize_key(partner.firm_name)])
+        return
+    written = result.created + result.updated
+    _save_rows(to_create, to_update, sorted(update_fields), rows_by_key, result)
+    if result.created + result.updated != written:
+        notify_partners_changed()
+
+
+def iter_excel_rows(file, sheet=None):
+    """
+    Yield the rows of a worksheet (the first one unless ``sheet`` names
+    another) as tuples of cell values.
+
+    The workbook is opened in read-only mode, so openpyxl parses the sheet
+    lazily instead of building the whole tree in memory.
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0] if sheet is None else workbook[sheet]
+        for row in worksheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def count_data_rows(file):
+    """
+    Number of data rows declared by an Excel upload, or ``None`` when it is
+    unknown (CSV uploads, workbooks without a dimension record).
+    """
+    if file.name.lower().endswith('.csv'):
+        return None
+    workbook = load_workbook(file, read_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+    finally:
+        workbook.close()
+    return max(max_row - 1, 0) if max_row else None
+
+
+def iter_csv_rows(file, encoding='utf-8-sig'):
+    """Yield the rows of a CSV upload, with empty cells as ``None``."""
+    for row in csv.reader(codecs.iterdecode(file, encoding)):
+        yield tuple(value if value != '' else None for value in row)
+
+
+def iter_rows(file):
+    """Pick the row reader matching the extension of an uploaded file."""
+    if file.name.lower().endswith('.csv'):
+        return iter_csv_rows(file)
+    return iter_excel_rows(file)
+
+
+def iter_frames(rows, chunk_size=None, skip_rows=0):
+    """
+    Turn a stream of rows into mapped DataFrames of at most ``chunk_size``
+    rows, yielding ``(frame, row_numbers)`` pairs.
+
+    The first row holds the headers. Blank rows are dropped but still count
+    towards the spreadsheet row numbers used in skipped-row messages. The
+    first ``skip_rows`` data rows are read past without being imported.
+    """
+    chunk_size = chunk_size or get_batch_size()
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError("The file is empty")
+
+    if 'firm_name' not in map_columns(pd.DataFrame(columns=list(header))).columns:
+        raise ImportFormatError("Missing required column: firm_name")
+
+    width = len(header)
+    numbered = islice(enumerate(rows, start=FIRST_DATA_ROW), skip_rows, None)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        records, row_numbers = [], []
+        for row_number, row in chunk:
+            if all(value is None or str(value).strip() == '' for value in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            records.append(row)
+            row_numbers.append(row_number)
+        if not records:
+            continue
+        frame = pd.DataFrame.from_records(records, columns=list(header))
+        yield map_columns(frame), row_numbers
+
+
+def import_rows(rows, result=None, batch_size=None, on_progress=None, dry_run=False, skip_rows=0):
+    """
+    Stream rows through mapping, cleaning and batched writes.
+
+    Only one batch of rows is held in memory at a time. ``on_progress`` is
+    called with the result and the last spreadsheet row read after every
+    batch has been written. ``skip_rows`` resumes after that many data rows.
+    """
+    result = result or ImportResult()
+    for frame, row_numbers in iter_frames(rows, batch_size, skip_rows):
+        cleaned = clean_frame(frame, result, row_numbers)
+        bulk_upsert(cleaned, result, batch_size, dry_run=dry_run)
+        if on_progress is not None:
+            on_progress(result, row_numbers[-1])
+    return result
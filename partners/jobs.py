@@ -0,0 +1,298 @@
+# jobs.py
+"""
+Background spreadsheet imports backed by the ``ImportJob`` table.
+
+Uploads are stored on disk and recorded as queued jobs, so no message broker
+is needed. Jobs are picked up either by the in-process thread pool (the
+default) or by ``manage.py run_import_jobs`` running as a separate worker.
+Claiming a job is a conditional UPDATE, so several workers can share the
+queue without running a job twice.
+
+Every written batch is a checkpoint: the job records how many rows it has
+read, and a failed, cancelled or stalled job that is queued again skips
+those rows instead of starting over. Multi-source uploads (zip archives,
+workbooks with several sheets) also save their counters and check for
+cancellation after every batch, but start over when resumed. Jobs remember
+the sha256 of their file, so the same file uploaded twice reuses the first
+job.
+
+The thread pool starts with the first request a process serves, and drains
+the jobs an earlier process left queued. Stalled jobs are put back in the
+queue whenever a worker looks for work: when the thread pool starts, before
+each job it runs, and on every poll of ``run_import_jobs``. A job's file is
+deleted once it succeeds; failed and cancelled jobs keep theirs for
+PARTNER_IMPORT_KEEP_FILES seconds, after which they can no longer be resumed.
+Expired files are purged by the same workers.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .importer import FIRST_DATA_ROW, ImportResult, count_data_rows, import_rows, iter_rows
+from .models import ImportJob
+from .pipeline import import_sources, is_multi_source
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ImportCancelled(Exception):
+    """Raised from the progress callback once a job has been cancelled."""
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PARTNER_IMPORT_WORKERS', 2),
+            thread_name_prefix='partner-import',
+        )
+    # Pick up the jobs an earlier process left queued or stalled
+    _executor.submit(_run_in_thread)
+    return _executor
+
+
+@receiver(request_started, dispatch_uid='partners_start_import_jobs')
+def _start_on_first_request(**kwargs):
+    # Not from AppConfig.ready(): migrate, run_import_jobs and the other
+    # management commands load the apps too, and must not drain the queue
+    request_started.disconnect(dispatch_uid='partners_start_import_jobs')
+    if getattr(settings, 'PARTNER_IMPORT_RUN_IN_PROCESS', True):
+        _get_executor()
+
+
+def _dispatch(job_id):
+    # Hand a queued job to the local thread pool once the transaction commits
+    if getattr(settings, 'PARTNER_IMPORT_RUN_IN_PROCESS', True):
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job_id))
+
+
+def file_sha256(file):
+    """sha256 of an uploaded file, read in chunks. Leaves the file at its start."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def enqueue_import(file, sha256=None):
+    """
+    Store an uploaded file as a queued job and return the job.
+
+    When ``PARTNER_IMPORT_RUN_IN_PROCESS`` is on, the job is handed to the
+    local thread pool once the surrounding transaction commits.
+    """
+    sha256 = sha256 or file_sha256(file)
+    job = ImportJob.objects.create(file=file, original_name=file.name, file_sha256=sha256)
+    _dispatch(job.pk)
+    return job
+
+
+def _stale_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'PARTNER_IMPORT_STALE_AFTER', 600))
+
+
+def _resumable():
+    return (
+        Q(status__in=[ImportJob.FAILED, ImportJob.CANCELLED])
+        | Q(status=ImportJob.RUNNING, heartbeat__lt=_stale_cutoff())
+    ) & ~Q(file='')
+
+
+def resume_job(job):
+    """
+    Queue a failed, cancelled or stalled job again. It continues after the
+    last batch it wrote. Jobs whose file was deleted stay as they are.
+    Returns the job, refreshed.
+    """
+    requeued = ImportJob.objects.filter(_resumable(), pk=job.pk).update(
+        status=ImportJob.QUEUED, cancel_requested=False, error='', finished=None
+    )
+    if requeued:
+        _dispatch(job.pk)
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs():
+    """Put running jobs whose worker stopped checkpointing back in the queue."""
+    return ImportJob.objects.filter(status=ImportJob.RUNNING, heartbeat__lt=_stale_cutoff()).update(
+        status=ImportJob.QUEUED
+    )
+
+
+def delete_job_file(job):
+    """Delete a job's file from storage; the job can no longer be resumed."""
+    if job.file:
+        job.file.delete(save=False)
+        ImportJob.objects.filter(pk=job.pk).update(file='')
+
+
+def purge_job_files():
+    """Delete the files of jobs that failed or were cancelled PARTNER_IMPORT_KEEP_FILES seconds ago."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'PARTNER_IMPORT_KEEP_FILES', 7 * 24 * 60 * 60))
+    expired = ImportJob.objects.filter(
+        status__in=[ImportJob.FAILED, ImportJob.CANCELLED], finished__lt=cutoff
+    ).exclude(file='')
+    for job in expired:
+        delete_job_file(job)
+
+
+def find_duplicate_job(sha256):
+    """
+    The job that already imports a file with this sha256, or None. A failed
+    or stalled one is resumed; cancelled jobs, and unfinished jobs whose file
+    was deleted, are not reused.
+    """
+    job = (
+        ImportJob.objects.filter(file_sha256=sha256)
+        .exclude(status=ImportJob.CANCELLED)
+        .exclude(~Q(status=ImportJob.SUCCEEDED), file='')
+        .order_by('-created')
+        .first()
+    )
+    if job is not None and job.status in (ImportJob.FAILED, ImportJob.RUNNING):
+        job = resume_job(job)
+    return job
+
+
+def cancel_job(job):
+    """
+    Cancel a job. Queued jobs stop right away; running jobs stop after the
+    batch they are writing, keeping the batches already committed.
+    """
+    if job.status == ImportJob.QUEUED:
+        ImportJob.objects.filter(pk=job.pk, status=ImportJob.QUEUED).update(
+            status=ImportJob.CANCELLED, cancel_requested=True, finished=timezone.now()
+        )
+    elif job.status == ImportJob.RUNNING:
+        ImportJob.objects.filter(pk=job.pk).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def claim_job(job_id):
+    """Atomically move a queued job to running. Returns False if it was taken."""
+    return bool(
+        ImportJob.objects.filter(pk=job_id, status=ImportJob.QUEUED)
+        .update(status=ImportJob.RUNNING, started=timezone.now(), heartbeat=timezone.now())
+    )
+
+
+def claim_next_job():
+    """Claim the oldest queued job, or return None when the queue is empty."""
+    for job_id in ImportJob.objects.filter(status=ImportJob.QUEUED).order_by('created').values_list('pk', flat=True)[:10]:
+        if claim_job(job_id):
+            return job_id
+    return None
+
+
+def _save_progress(job_id, result, rows_read=None, **extra):
+    fields = {
+        'processed': result.processed,
+        'created_count': result.created,
+        'updated_count': result.updated,
+        'unchanged_count': result.unchanged,
+        'skipped': result.skipped,
+        'heartbeat': timezone.now(),
+        **extra,
+    }
+    if rows_read is not None:
+        fields['rows_read'] = rows_read
+    ImportJob.objects.filter(pk=job_id).update(**fields)
+
+
+def _resumed_result(job):
+    # Counters of the rows handled before the last checkpoint
+    result = ImportResult()
+    result.processed = job.processed
+    result.created = job.created_count
+    result.updated = job.updated_count
+    result.unchanged = job.unchanged_count
+    result.skipped = list(job.skipped)
+    return result
+
+
+def run_job(job_id):
+    """
+    Run a job that has already been claimed by the caller, starting after
+    the rows an earlier run of it checkpointed.
+    """
+    job = ImportJob.objects.get(pk=job_id)
+    result = _resumed_result(job)
+
+    def on_progress(progress, last_row=None):
+        nonlocal result
+        result = progress
+        _save_progress(job_id, result, None if last_row is None else last_row - FIRST_DATA_ROW + 1)
+        if ImportJob.objects.filter(pk=job_id, cancel_requested=True).exists():
+            raise ImportCancelled()
+
+    try:
+        with job.file.open('rb') as file:
+            if is_multi_source(file):
+                # Parsed up front and written in one phase. The batches report
+                # progress, but rows_read is not recorded: a rerun starts over
+                # (rows already imported are unchanged no-ops then)
+                result = import_sources([file], on_progress=on_progress)
+            else:
+                total_rows = count_data_rows(file)
+                ImportJob.objects.filter(pk=job_id).update(total_rows=total_rows)
+                file.seek(0)
+                import_rows(iter_rows(file), result, on_progress=on_progress, skip_rows=job.rows_read)
+    except ImportCancelled:
+        _save_progress(job_id, result, status=ImportJob.CANCELLED, finished=timezone.now())
+    except Exception as e:
+        logger.exception("Import job %s failed", job_id)
+        _save_progress(job_id, result, status=ImportJob.FAILED, error=str(e), finished=timezone.now())
+    else:
+        _save_progress(job_id, result, status=ImportJob.SUCCEEDED, finished=timezone.now())
+        delete_job_file(job)
+
+
+def _run_in_thread(job_id=None):
+    """
+    Run ``job_id`` if it is still queued, then every other queued job,
+    including the stalled ones put back in the queue first. Expired job
+    files are purged on the way.
+    """
+    close_old_connections()
+    try:
+        requeue_stale_jobs()
+        purge_job_files()
+        if job_id is not None and claim_job(job_id):
+            run_job(job_id)
+        while (job_id := claim_next_job()) is not None:
+            run_job(job_id)
+    finally:
+        connection.close()
+
+
+def run_worker(poll_interval=2.0, once=False):
+    """Process queued jobs until interrupted (or the queue drains, if ``once``)."""
+    while True:
+        requeue_stale_jobs()
+        purge_job_files()
+        job_id = claim_next_job()
+        if job_id is not None:
+            run_job(job_id)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
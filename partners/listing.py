@@ -0,0 +1,34 @@
+# listing.py
+from rest_framework.response import Response
+
+from core.metrics import timed
+from .serializers import PartnerValuesSerializer
+from .snapshot import list_records
+
+
+class ValuesListMixin:
+    """
+    Serve ``list`` from ``.values()`` rows through PartnerValuesSerializer.
+    ``?fields=firm_name,hq`` returns only those columns (plus ``id``), and
+    only those are read from the database. Requests the partner snapshot can
+    answer are served from its records instead.
+    """
+    fields_query_param = "fields"
+
+    def list(self, request, *args, **kwargs):
+        serializer = PartnerValuesSerializer(request.query_params.get(self.fields_query_param))
+        rows = list_records(request)
+        if rows is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            # Cursor pages read their position from the rows, so select the keys too
+            paging_fields = self.paginator.ordering_fields(request) if self.paginator is not None else ()
+            rows = serializer.select(queryset, extra=paging_fields)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            with timed("serializer"):
+                data = serializer.to_representation(page)
+            return self.get_paginated_response(data)
+        with timed("serializer"):
+            data = serializer.to_representation(rows)
+        return Response(data)
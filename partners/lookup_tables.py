@@ -0,0 +1,285 @@
+# lookup_tables.py
+"""
+Name <-> id resolution for the Location, Sector and PartnershipStatus tables
+behind ``Partner.hq``, ``Partner.sector`` and ``Partner.current_partnership_status``.
+
+The tables are small, so each process keeps them in memory and the importer,
+serializers, filters and facets translate names without joins. Names match
+ignoring case and repeated whitespace. Rows read or created inside a
+transaction are only cached once it commits, so rows created by a
+rolled-back (or dry-run) import never leak into the cache. Until then the
+thread keeps them aside and uses them only while that transaction is open.
+"""
+import threading
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Location, Partner, PartnershipStatus, Sector, content_hash
+from .signals import notify_partners_changed
+
+# Partners rewritten per UPDATE when a lookup row is renamed
+RESTAMP_BATCH_SIZE = 500
+
+
+def clean_label(name):
+    """The name stored for a new lookup row: stripped, inner whitespace collapsed."""
+    return ' '.join(str(name).split())
+
+
+def normalize_label(name):
+    """Key lookup names are matched on."""
+    return clean_label(name).lower()
+
+
+class _Pending:
+    """Rows one open transaction read or created, valid while its atomic blocks are open."""
+
+    __slots__ = ('blocks', 'ids', 'names', 'loaded')
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.ids = {}  # normalized name -> id
+        self.names = {}  # id -> name
+        self.loaded = False  # whether the whole table was read inside the transaction
+
+    def add(self, rows):
+        for pk, name in rows:
+            self.ids[normalize_label(name)] = pk
+            self.names[pk] = name
+
+
+class LookupCache:
+    """
+    In-memory ``name <-> id`` map of one lookup table.
+
+    The committed rows live in ``_table``, an ``(ids, names)`` pair that is
+    replaced as a whole under the lock and never changed in place, so readers
+    use whatever pair they picked up without locking. Rows a transaction reads
+    or creates are kept per thread until it commits, and are forgotten as soon
+    as the atomic blocks they were read in are no longer open, so a rollback
+    (a failed import, a test) leaves nothing behind.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+        self._table = None  # (normalized name -> id, id -> name), None until loaded
+        self._local = threading.local()
+
+    def _pending(self, create=False):
+        """This thread's ``_Pending`` for the open transaction, or None."""
+        pending = getattr(self._local, 'pending', None)
+        blocks = connection.atomic_blocks
+        if pending is not None and (
+            len(pending.blocks) > len(blocks)
+            or any(held is not block for held, block in zip(pending.blocks, blocks))
+        ):
+            pending = self._local.pending = None  # its transaction or savepoint is over
+        if pending is None and create and blocks:
+            pending = self._local.pending = _Pending(tuple(blocks))
+        return pending
+
+    def _ensure_loaded(self):
+        """The committed ``(ids, names)``, reading the table if needed."""
+        table = self._table
+        if table is not None:
+            return table
+        pending = self._pending()
+        if pending is not None and pending.loaded:
+            return {}, {}
+        rows = list(self.model.objects.values_list('pk', 'name'))
+        if not connection.in_atomic_block:
+            return self._remember(rows)
+        # The transaction may see rows of its own that could still roll back
+        self._remember_on_commit(rows)
+        self._pending(create=True).loaded = True
+        return {}, {}
+
+    def _remember(self, rows):
+        with self._lock:
+            ids, names = self._table or ({}, {})
+            ids, names = dict(ids), dict(names)
+            for pk, name in rows:
+                ids[normalize_label(name)] = pk
+                names[pk] = name
+            self._table = ids, names
+        return ids, names
+
+    def _remember_on_commit(self, rows):
+        """Cache rows read now: at once outside a transaction, else once it commits."""
+        if not rows:
+            return
+        if connection.in_atomic_block:
+            self._pending(create=True).add(rows)
+        transaction.on_commit(lambda: self._remember(rows))
+
+    def clear(self):
+        with self._lock:
+            self._table = None
+        self._local.pending = None
+
+    def _lookup(self, key):
+        """``(id, name)`` of the row whose normalized name is ``key``, if cached."""
+        ids, names = self._ensure_loaded()
+        pk = ids.get(key)
+        if pk is not None:
+            return pk, names[pk]
+        pending = self._pending()
+        if pending is not None and key in pending.ids:
+            pk = pending.ids[key]
+            return pk, pending.names[pk]
+        return None
+
+    def _known(self, pk):
+        name = self._ensure_loaded()[1].get(pk)
+        if name is None:
+            pending = self._pending()
+            if pending is not None:
+                name = pending.names.get(pk)
+        return name
+
+    def preload(self, pks):
+        """Read the names of the uncached ids among ``pks`` with one query."""
+        missing = {pk for pk in pks if pk is not None and self._known(pk) is None}
+        if missing:
+            self._remember_on_commit(list(self.model.objects.filter(pk__in=missing).values_list('pk', 'name')))
+
+    def name(self, pk):
+        """Name of the row ``pk``, or None."""
+        if pk is None:
+            return None
+        name = self._known(pk)
+        if name is None:
+            self.preload([pk])
+            name = self._known(pk)
+        return name
+
+    def _fetch(self, keys):
+        rows = (
+            self.model.objects.annotate(name_key=Lower('name'))
+            .filter(name_key__in=keys)
+            .values_list('pk', 'name')
+        )
+        return [(pk, name) for pk, name in rows]
+
+    def resolve(self, names, create=True):
+        """
+        Map the normalized form of each of ``names`` to ``(id, name)``. Names
+        missing from the table are created if ``create``, else left out.
+        Costs no query when every name is cached, otherwise one to three.
+        """
+        wanted = {}
+        for name in names:
+            if name is not None and str(name).strip():
+                wanted.setdefault(normalize_label(name), clean_label(name))
+
+        found, missing = {}, []
+        for key in wanted:
+            label = self._lookup(key)
+            if label is None:
+                missing.append(key)
+            else:
+                found[key] = label
+        if not missing:
+            return found
+
+        rows = self._fetch(missing)
+        if create and len(rows) < len(missing):
+            known = {normalize_label(name) for _, name in rows}
+            self.model.objects.bulk_create(
+                [self.model(name=wanted[key]) for key in missing if key not in known],
+                ignore_conflicts=True,  # created meanwhile by another process
+            )
+            rows = self._fetch(missing)
+        found.update((normalize_label(name), (pk, name)) for pk, name in rows)
+        self._remember_on_commit(rows)
+        return found
+
+    def id_for(self, name, create=True):
+        """Id of the row named ``name`` (created if missing and ``create``), or None."""
+        if name is None or not str(name).strip():
+            return None
+        label = self.resolve([name], create).get(normalize_label(name))
+        return label[0] if label else None
+
+
+# Partner field -> cache of the table it points to
+LOOKUPS = {
+    'hq': LookupCache(Location),
+    'sector': LookupCache(Sector),
+    'current_partnership_status': LookupCache(PartnershipStatus),
+}
+LOOKUP_FIELDS = tuple(LOOKUPS)
+
+
+def value_columns(fields):
+    """``values()`` arguments for ``fields``: lookup fields are read as their ``_id``."""
+    return [f'{field}_id' if field in LOOKUPS else field for field in fields]
+
+
+def preload_names(rows, columns):
+    """
+    Read the names of every lookup id in ``rows`` that is not cached yet,
+    with at most one query per table. ``columns`` maps lookup fields to the
+    key of their id in a row.
+    """
+    for field, column in columns.items():
+        LOOKUPS[field].preload({row[column] for row in rows})
+
+
+def lookup_names(rows, fields, chunk_size=1000):
+    """
+    Turn tuples read with ``value_columns(fields)`` into tuples with names
+    in place of lookup ids. Names missing from the cache are read once per
+    ``chunk_size`` rows.
+    """
+    names = [LOOKUPS[field].name if field in LOOKUPS else None for field in fields]
+    if not any(names):
+        yield from rows
+        return
+    columns = {field: index for index, field in enumerate(fields) if field in LOOKUPS}
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        preload_names(chunk, columns)
+        for row in chunk:
+            yield tuple(value if to_name is None else to_name(value) for value, to_name in zip(row, names))
+
+
+def _lookup_changed(sender, instance, created=False, **kwargs):
+    field = next(field for field, cache in LOOKUPS.items() if cache.model is sender)
+    transaction.on_commit(LOOKUPS[field].clear)
+    if created:
+        return
+    # Other processes drop their copies when they see the lookup version move
+    from .versions import bump_lookup_version
+
+    bump_lookup_version()
+    if _restamp_partners(field, instance):
+        notify_partners_changed()
+
+
+def _restamp_partners(field, lookup):
+    """
+    A rename changes what the partners pointing at ``lookup`` display, their
+    content hash and how they are searched. Give them a new ``updated`` (and
+    so new detail ETags) and content hash, and rewrite the foreign key column
+    so the search vector trigger runs. Returns the number of partners.
+    """
+    partners = list(Partner.objects.filter(**{f'{field}_id': lookup.pk}).defer('search_vector'))
+    now = timezone.now()
+    for partner in partners:
+        values = partner.content_values()
+        values[field] = lookup.name
+        partner.content_hash = content_hash(values)
+        partner.updated = now
+    Partner.objects.bulk_update(partners, [f'{field}_id', 'content_hash', 'updated'], batch_size=RESTAMP_BATCH_SIZE)
+    return len(partners)
+
+
+for _model in (Location, Sector, PartnershipStatus):
+    post_save.connect(_lookup_changed, sender=_model, dispatch_uid=f'lookup_changed_{_model.__name__}')
+    post_delete.connect(_lookup_changed, sender=_model, dispatch_uid=f'lookup_deleted_{_model.__name__}')
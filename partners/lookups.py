@@ -0,0 +1,41 @@
+# lookups.py
+"""Batched firm-name lookups shared by the importer and the recommender."""
+from django.db.models.functions import Lower
+
+from .lookup_tables import lookup_names, value_columns
+from .models import Partner
+from .snapshot import get_snapshot
+
+LOOKUP_BATCH_SIZE = 500
+
+
+def normalize_name(name):
+    """Key firm names are matched on: stripped and lower-cased."""
+    return str(name).strip().lower()
+
+
+def find_partners(names, fields=('id', 'firm_name', 'current_partnership_status')):
+    """
+    Map the normalized form of each name in ``names`` to the ``fields`` of the
+    partner with that firm name. Uses the LOWER(firm_name) index, one query per
+    LOOKUP_BATCH_SIZE names, or none when the partner snapshot is on.
+    """
+    keys = list({normalize_name(name) for name in names if name and str(name).strip()})
+    found = {}
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        columns = value_columns(fields)
+        records = [snapshot.by_name[key] for key in keys if key in snapshot.by_name]
+        rows = ((record.firm_name.lower(), *(record[column] for column in columns)) for record in records)
+        for row in lookup_names(rows, ('name_key',) + tuple(fields)):
+            found[row[0]] = dict(zip(fields, row[1:]))
+        return found
+    for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        rows = (
+            Partner.objects.annotate(name_key=Lower('firm_name'))
+            .filter(name_key__in=keys[start:start + LOOKUP_BATCH_SIZE])
+            .values_list('name_key', *value_columns(fields))
+        )
+        for row in lookup_names(rows, ('name_key',) + tuple(fields)):
+            found[row[0]] = dict(zip(fields, row[1:]))
+    return found
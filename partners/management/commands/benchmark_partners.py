@@ -0,0 +1,68 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from partners.benchmark import run
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark partner imports and read endpoints on synthetic data. "
+        "Writes are rolled back; run once per settings module to compare databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+            help="Synthetic dataset sizes in rows.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20,
+            help="Requests per read scenario (p50/p95 are computed over these).",
+        )
+        parser.add_argument(
+            "--warm-cache", action="store_true",
+            help="Keep the partner list cache between read requests.",
+        )
+        parser.add_argument(
+            "--no-memory", action="store_true",
+            help="Skip tracemalloc peak memory tracking, which slows imports down.",
+        )
+        parser.add_argument(
+            "--json", dest="json_path",
+            help="Also write the results to this file as JSON.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor} ({connection.settings_dict['NAME']})")
+        results = []
+        for size in options["sizes"]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{size} rows"))
+            size_results = run(
+                size,
+                repeat=options["repeat"],
+                track_memory=not options["no_memory"],
+                cold=not options["warm_cache"],
+            )
+            for result in size_results:
+                self.stdout.write(self.format_result(result))
+            results.extend(size_results)
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"\nResults written to {options['json_path']}")
+
+    @staticmethod
+    def format_result(result):
+        if "rows_per_sec" in result:
+            memory = "n/a" if result["peak_mb"] is None else f"{result['peak_mb']:.1f} MB"
+            return (
+                f"  {result['scenario']:<28} {result['seconds']:>9.3f}s "
+                f"{result['rows_per_sec']:>10.0f} rows/s {result['queries']:>7} queries  peak {memory}"
+            )
+        return (
+            f"  {result['scenario']:<28} p50 {result['p50_ms']:>8.2f}ms  "
+            f"p95 {result['p95_ms']:>8.2f}ms {result['queries']:>7} queries"
+        )
@@ -0,0 +1,126 @@
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from partners.facets import FACET_FIELDS, _facet_query
+from partners.models import Partner
+from partners.serializers import PartnerValuesSerializer
+from partners.views import PartnerViewSet
+
+# Plan lines that read the whole partners table
+SEQ_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on partners_partner\b"),
+    "sqlite": re.compile(r"\bSCAN (?:TABLE )?partners_partner\b(?! USING)"),
+}
+
+
+# Orderings SQLite serves by walking the table's rowid b-tree
+ROWID_ORDERINGS = {("id",), ("-id",), ("pk",), ("-pk",)}
+
+
+def walks_rowid_order(queryset):
+    """
+    Whether SQLite reads an unfiltered page in primary key order. Its plan
+    says ``SCAN partners_partner`` like a full scan does, but the walk stops
+    once the LIMIT is reached.
+    """
+    query = queryset.query
+    return not query.where and query.high_mark is not None and tuple(query.order_by) in ROWID_ORDERINGS
+
+
+def reads_whole_table(vendor, plan, queryset):
+    if not SEQ_SCAN_PATTERNS[vendor].search(plan):
+        return False
+    return not (vendor == "sqlite" and walks_rowid_order(queryset))
+
+
+def api_queryset(path):
+    """The filtered and ordered queryset PartnerViewSet.list runs for ``path``."""
+    view = PartnerViewSet()
+    view.request = Request(APIRequestFactory().get(path))
+    view.format_kwarg = None
+    view.action = "list"
+    view.kwargs = {}
+    return view.filter_queryset(view.get_queryset())
+
+
+def query_shapes():
+    """``(label, queryset)`` for the query shapes issued by the API and the admin."""
+    page = settings.PARTNER_PAGE_SIZE
+    values = PartnerValuesSerializer()
+    by_hq = api_queryset("/api/partners/?hq=Bangladesh")
+    shapes = [
+        ("list page", values.select(api_queryset("/api/partners/"))[:page]),
+        ("list ?hq=", values.select(by_hq)[:page]),
+        ("list ?search=", values.select(api_queryset("/api/partners/?search=health"))[:page]),
+        ("list cursor by firm_name",
+         values.select(api_queryset("/api/partners/")).order_by("firm_name", "id").filter(firm_name__gt="M")[:page]),
+        # The fuzzy index freshness check's max(updated) is planned like this ORDER BY ... LIMIT 1
+        ("fuzzy max(updated)", Partner.objects.order_by("-updated").values("updated")[:1]),
+        ("detail", Partner.objects.filter(pk=1)),
+        ("admin ordering", Partner.objects.order_by("firm_name")[:100]),
+        ("admin ?hq=", Partner.objects.filter(hq_id=1).order_by("firm_name")[:100]),
+        ("admin ?status=", Partner.objects.filter(current_partnership_status_id=1).order_by("firm_name")[:100]),
+        ("admin ?created=", Partner.objects.filter(created__gte=timezone.now() - timedelta(days=30)).order_by("firm_name")[:100]),
+        ("lookup by lower(firm_name)",
+         Partner.objects.annotate(name_key=Lower("firm_name")).filter(name_key__in=["acme", "beta"])),
+    ]
+    shapes += [(f"facet {field}", _facet_query(field)) for field in FACET_FIELDS]
+    return shapes
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every partner query shape used by the API and report sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans", action="store_true",
+            help="Print the full plan of every query, not only the flagged ones.",
+        )
+        parser.add_argument(
+            "--no-seqscan", action="store_true",
+            help=(
+                "PostgreSQL: plan with enable_seqscan off, to check that an index is usable "
+                "even when the table is too small for the planner to prefer it."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQ_SCAN_PATTERNS:
+            self.stderr.write(f"EXPLAIN parsing is not supported on {vendor}.")
+            return
+
+        rows = Partner.objects.count()
+        self.stdout.write(f"Database: {vendor}, {rows} partners")
+        if vendor == "postgresql" and rows < 1000 and not options["no_seqscan"]:
+            self.stdout.write(
+                "Small table: the planner may prefer sequential scans anyway; "
+                "try --no-seqscan or run against a copy of production data."
+            )
+
+        shapes = query_shapes()
+        flagged = 0
+        with transaction.atomic():
+            if vendor == "postgresql" and options["no_seqscan"]:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for label, queryset in shapes:
+                plan = queryset.explain()
+                seq_scan = reads_whole_table(vendor, plan, queryset)
+                flagged += seq_scan
+                status = self.style.WARNING("SEQ SCAN") if seq_scan else self.style.SUCCESS("index")
+                self.stdout.write(f"  {label:<30} {status}")
+                if seq_scan or options["verbose_plans"]:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"      {line}")
+
+        summary = f"\n{flagged} of {len(shapes)} query shapes use a sequential scan."
+        self.stdout.write(self.style.WARNING(summary) if flagged else self.style.SUCCESS(summary))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from partners.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run queued partner import jobs (use with PARTNER_IMPORT_RUN_IN_PROCESS=False)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval", type=float, default=2.0,
+            help="Seconds to wait between polls when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit once the queue is empty instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for import jobs...")
+        run_worker(poll_interval=options["poll_interval"], once=options["once"])
@@ -0,0 +1,14 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0002_partner_sector'),
+        ('partners', '0003_remove_partner_sector_alter_partner_options_and_more'),
+    ]
+
+    operations = [
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Weighted document: the firm name ranks above location/sector/status, which
+# rank above the long free-text columns.
+UPDATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION partners_partner_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.firm_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.hq, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sector, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.current_partnership_status, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.focus_area, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(NEW.contact, '')), 'D') ||
+        setweight(to_tsvector('simple', coalesce(NEW.donor_experience, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+CREATE_TRIGGER = """
+CREATE TRIGGER partners_partner_search_vector_trigger
+BEFORE INSERT OR UPDATE OF firm_name, hq, sector, current_partnership_status, focus_area, contact, donor_experience
+ON partners_partner
+FOR EACH ROW EXECUTE FUNCTION partners_partner_search_vector_update();
+"""
+
+# Fires the trigger once for every existing row
+BACKFILL = "UPDATE partners_partner SET firm_name = firm_name;"
+
+CREATE_INDEX = """
+CREATE INDEX partners_partner_search_vector_gin
+ON partners_partner USING gin (search_vector);
+"""
+
+DROP = """
+DROP INDEX IF EXISTS partners_partner_search_vector_gin;
+DROP TRIGGER IF EXISTS partners_partner_search_vector_trigger ON partners_partner;
+DROP FUNCTION IF EXISTS partners_partner_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    # SQLite keeps the column unused; search falls back to icontains there
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in (UPDATE_FUNCTION, CREATE_TRIGGER, BACKFILL, CREATE_INDEX):
+        schema_editor.execute(sql)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partner',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:58
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    # Skipped where pg_trgm is not installable; partners.fuzzy then falls back
+    # to its in-process trigram index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS partners_partner_firm_name_trgm "
+        "ON partners_partner USING gin (firm_name gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS partners_partner_firm_name_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0006_partner_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='partner',
+            index=models.Index(django.db.models.functions.text.Lower('firm_name'), name='partner_firm_name_lower_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
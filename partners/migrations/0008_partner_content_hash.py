@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:05
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+# Frozen copies of partners.models.CONTENT_FIELDS and content_hash() as of this
+# migration, so that later changes to the model do not change what it computes
+CONTENT_FIELDS = (
+    'firm_name',
+    'hq',
+    'focus_area',
+    'contact',
+    'donor_experience',
+    'current_partnership_status',
+    'sector',
+)
+
+
+def content_hash(values):
+    normalized = [values.get(field) or '' for field in CONTENT_FIELDS]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+def backfill_content_hash(apps, schema_editor):
+    Partner = apps.get_model('partners', 'Partner')
+    batch = []
+    for partner in Partner.objects.only('id', *CONTENT_FIELDS).iterator(chunk_size=1000):
+        partner.content_hash = content_hash({field: getattr(partner, field) for field in CONTENT_FIELDS})
+        batch.append(partner)
+        if len(batch) == 1000:
+            Partner.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        Partner.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0007_partner_trigram_lookup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partner',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+DROP_TRIGGER = "DROP TRIGGER IF EXISTS partners_partner_search_vector_trigger ON partners_partner;"
+
+# Same as in migration 0006
+CREATE_TRIGGER = """
+CREATE TRIGGER partners_partner_search_vector_trigger
+BEFORE INSERT OR UPDATE OF firm_name, hq, sector, current_partnership_status, focus_area, contact, donor_experience
+ON partners_partner
+FOR EACH ROW EXECUTE FUNCTION partners_partner_search_vector_update();
+"""
+
+
+def drop_search_trigger(apps, schema_editor):
+    # The trigger reads the text columns that 0012 removes; 0012 recreates it
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER)
+
+
+def restore_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def lookup_model(name, **options):
+    return migrations.CreateModel(
+        name=name,
+        fields=[
+            ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ('name', models.CharField(max_length=255)),
+        ],
+        options={
+            'ordering': ['name'],
+            'abstract': False,
+            **options,
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0009_partner_access_path_indexes'),
+    ]
+
+    operations = [
+        lookup_model('Location'),
+        lookup_model('PartnershipStatus', verbose_name_plural='partnership statuses'),
+        lookup_model('Sector'),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='location_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='partnershipstatus',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='partnershipstatus_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='sector',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='sector_name_ci_unique'),
+        ),
+        # Filled from the text columns by 0011, renamed over them by 0012
+        migrations.AddField(
+            model_name='partner',
+            name='hq_ref',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='partners.location'),
+        ),
+        migrations.AddField(
+            model_name='partner',
+            name='current_partnership_status_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='partners.partnershipstatus'),
+        ),
+        migrations.AddField(
+            model_name='partner',
+            name='sector_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='partners.sector'),
+        ),
+        migrations.RunPython(drop_search_trigger, restore_search_trigger),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import hashlib
+import json
+from collections import Counter
+
+from django.db import migrations
+
+# Frozen copies of partners.models.CONTENT_FIELDS and content_hash() as of this
+# migration, so that later changes to the model do not change what it computes
+CONTENT_FIELDS = (
+    'firm_name',
+    'hq',
+    'focus_area',
+    'contact',
+    'donor_experience',
+    'current_partnership_status',
+    'sector',
+)
+
+# Partner text column -> lookup model
+LOOKUP_FIELDS = {
+    'hq': 'Location',
+    'sector': 'Sector',
+    'current_partnership_status': 'PartnershipStatus',
+}
+BATCH_SIZE = 1000
+
+
+def content_hash(values):
+    normalized = [values.get(field) or '' for field in CONTENT_FIELDS]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+def normalize_label(name):
+    return ' '.join(str(name).split()).lower()
+
+
+def populate(apps, schema_editor):
+    """
+    One lookup row per distinct value, ignoring case and extra whitespace
+    ("bangladesh", "Bangladesh " and "BANGLADESH" become one row). The most
+    common spelling becomes the name, preferring mixed case on a tie.
+    """
+    Partner = apps.get_model('partners', 'Partner')
+    names = {}
+    for field, model_name in LOOKUP_FIELDS.items():
+        Lookup = apps.get_model('partners', model_name)
+        spellings = {}
+        for value in Partner.objects.exclude(**{f'{field}__isnull': True}).values_list(field, flat=True):
+            if not value.strip():
+                continue
+            spellings.setdefault(normalize_label(value), Counter())[' '.join(value.split())] += 1
+
+        ids = {}
+        for key, counts in spellings.items():
+            name = min(counts, key=lambda spelling: (
+                -counts[spelling], spelling.isupper() or spelling.islower(), spelling,
+            ))
+            ids[key] = Lookup.objects.create(name=name).pk
+        names[field] = dict(Lookup.objects.values_list('pk', 'name'))
+
+        partners = []
+        for partner in Partner.objects.exclude(**{f'{field}__isnull': True}).only('pk', field).iterator():
+            partner_id = ids.get(normalize_label(getattr(partner, field)))
+            if partner_id is not None:
+                setattr(partner, f'{field}_ref_id', partner_id)
+                partners.append(partner)
+        Partner.objects.bulk_update(partners, [f'{field}_ref'], batch_size=BATCH_SIZE)
+
+    # Hash the stored spellings, as the importer will
+    partners = []
+    for partner in Partner.objects.iterator():
+        values = {field: getattr(partner, field) for field in CONTENT_FIELDS if field not in LOOKUP_FIELDS}
+        for field in LOOKUP_FIELDS:
+            values[field] = names[field].get(getattr(partner, f'{field}_ref_id'))
+        partner.content_hash = content_hash(values)
+        partners.append(partner)
+    Partner.objects.bulk_update(partners, ['content_hash'], batch_size=BATCH_SIZE)
+
+
+def unpopulate(apps, schema_editor):
+    Partner = apps.get_model('partners', 'Partner')
+    for field, model_name in LOOKUP_FIELDS.items():
+        Lookup = apps.get_model('partners', model_name)
+        names = dict(Lookup.objects.values_list('pk', 'name'))
+        partners = []
+        for partner in Partner.objects.exclude(**{f'{field}_ref__isnull': True}).only('pk', f'{field}_ref').iterator():
+            setattr(partner, field, names[getattr(partner, f'{field}_ref_id')])
+            partners.append(partner)
+        Partner.objects.bulk_update(partners, [field], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0010_lookup_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate, unpopulate),
+    ]
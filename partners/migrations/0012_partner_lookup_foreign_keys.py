@@ -0,0 +1,140 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# As in 0006, with the location/sector/status names read from the lookup tables
+UPDATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION partners_partner_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.firm_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce((SELECT name FROM partners_location WHERE id = NEW.hq_id), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce((SELECT name FROM partners_sector WHERE id = NEW.sector_id), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT name FROM partners_partnershipstatus WHERE id = NEW.current_partnership_status_id), ''
+        )), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.focus_area, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(NEW.contact, '')), 'D') ||
+        setweight(to_tsvector('simple', coalesce(NEW.donor_experience, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+CREATE_TRIGGER = """
+CREATE TRIGGER partners_partner_search_vector_trigger
+BEFORE INSERT OR UPDATE OF firm_name, hq_id, sector_id, current_partnership_status_id, focus_area, contact, donor_experience
+ON partners_partner
+FOR EACH ROW EXECUTE FUNCTION partners_partner_search_vector_update();
+"""
+
+# Fires the trigger once for every existing row
+BACKFILL = "UPDATE partners_partner SET firm_name = firm_name;"
+
+DROP_TRIGGER = "DROP TRIGGER IF EXISTS partners_partner_search_vector_trigger ON partners_partner;"
+
+# The 0006 function, over the text columns that reversing this migration restores
+OLD_UPDATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION partners_partner_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.firm_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.hq, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sector, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.current_partnership_status, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.focus_area, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(NEW.contact, '')), 'D') ||
+        setweight(to_tsvector('simple', coalesce(NEW.donor_experience, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in (UPDATE_FUNCTION, CREATE_TRIGGER, BACKFILL):
+        schema_editor.execute(sql)
+
+
+def restore_search_function(apps, schema_editor):
+    # 0010 recreates the trigger once the text columns are back
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_TRIGGER)
+    schema_editor.execute(OLD_UPDATE_FUNCTION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0011_populate_lookup_tables'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='partner',
+            name='partner_hq_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='partner',
+            name='partner_hq_present_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='partner',
+            name='partner_sector_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='partner',
+            name='partner_status_idx',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='hq',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='sector',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='current_partnership_status',
+        ),
+        migrations.RenameField(
+            model_name='partner',
+            old_name='hq_ref',
+            new_name='hq',
+        ),
+        migrations.RenameField(
+            model_name='partner',
+            old_name='sector_ref',
+            new_name='sector',
+        ),
+        migrations.RenameField(
+            model_name='partner',
+            old_name='current_partnership_status_ref',
+            new_name='current_partnership_status',
+        ),
+        migrations.AlterField(
+            model_name='partner',
+            name='hq',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='partners', to='partners.location'),
+        ),
+        migrations.AlterField(
+            model_name='partner',
+            name='sector',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='partners', to='partners.sector'),
+        ),
+        migrations.AlterField(
+            model_name='partner',
+            name='current_partnership_status',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='partners', to='partners.partnershipstatus'),
+        ),
+        migrations.AddIndex(
+            model_name='partner',
+            index=models.Index(fields=['hq', 'id'], name='partner_hq_id_idx'),
+        ),
+        migrations.RunPython(create_search_trigger, restore_search_function),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    PartnerDataVersion = apps.get_model('partners', 'PartnerDataVersion')
+    PartnerDataVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0012_partner_lookup_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartnerDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0014_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partnerdataversion',
+            name='changed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='partnerdataversion',
+            name='lookup_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
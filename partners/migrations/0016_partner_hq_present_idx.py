@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0015_partnerdataversion_shared'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='partner',
+            index=models.Index(condition=models.Q(('hq__isnull', False)), fields=['hq'], name='partner_hq_present_idx'),
+        ),
+    ]
@@ -1,20 +1,228 @@
 # models.py
+import hashlib
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Lower
+
+# Columns covered by Partner.content_hash
+CONTENT_FIELDS = (
+    'firm_name',
+    'hq',
+    'focus_area',
+    'contact',
+    'donor_experience',
+    'current_partnership_status',
+    'sector',
+)
+
+
+class LookupTable(models.Model):
+    """
+    A small table of names referenced by Partner. Names are unique ignoring
+    case; see lookup_tables.py for the in-memory name <-> id cache.
+    """
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        abstract = True
+        ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='%(class)s_name_ci_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Location(LookupTable):
+    """Headquarters of a firm (country or city)."""
+
+
+class Sector(LookupTable):
+    pass
+
+
+class PartnershipStatus(LookupTable):
+    class Meta(LookupTable.Meta):
+        verbose_name_plural = "partnership statuses"
+
+
+def content_hash(values):
+    """
+    sha256 over the CONTENT_FIELDS of a mapping. Missing, None and '' all hash
+    the same, so an empty spreadsheet cell matches a NULL column.
+    """
+    normalized = [values.get(field) or '' for field in CONTENT_FIELDS]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
 
 class Partner(models.Model):
     firm_name = models.CharField(max_length=255, unique=True)  # Required field, unique constraint
-    hq = models.CharField(max_length=255, blank=True, null=True)  # Headquarters (country/city)
+    # Headquarters (country/city); indexed by partner_hq_id_idx
+    hq = models.ForeignKey(
+        Location, on_delete=models.PROTECT, blank=True, null=True, related_name='partners', db_index=False,
+    )
     focus_area = models.TextField(blank=True, null=True)
     contact = models.CharField(max_length=255, blank=True, null=True)
     donor_experience = models.TextField(blank=True, null=True)
-    current_partnership_status = models.CharField(max_length=255, blank=True, null=True)
-    sector = models.CharField(max_length=255, blank=True, null=True)  # NEW: sector of the firm
+    current_partnership_status = models.ForeignKey(
+        PartnershipStatus, on_delete=models.PROTECT, blank=True, null=True, related_name='partners',
+    )
+    sector = models.ForeignKey(Sector, on_delete=models.PROTECT, blank=True, null=True, related_name='partners')
+    # Full-text document kept up to date by a database trigger on PostgreSQL (see migration 0006)
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+    # Fingerprint of the content columns, lets re-imports skip unchanged rows without loading them
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
 
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["firm_name"]
+        indexes = [
+            # Case-insensitive firm lookups (importer, recommendations) filter on LOWER(firm_name)
+            models.Index(Lower('firm_name'), name='partner_firm_name_lower_idx'),
+            # ?hq= on the API, which pages by id (also serves plain hq lookups)
+            models.Index(fields=['hq', 'id'], name='partner_hq_id_idx'),
+            # hq facet counts and hq_list only group partners that have an hq
+            models.Index(fields=['hq'], name='partner_hq_present_idx', condition=models.Q(hq__isnull=False)),
+            # Admin date filter
+            models.Index(fields=['created'], name='partner_created_idx'),
+            # max(updated) behind the fuzzy index freshness check
+            models.Index(fields=['updated'], name='partner_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.firm_name
+
+    def content_values(self):
+        """The CONTENT_FIELDS of this partner, with lookup tables as names."""
+        from .lookup_tables import LOOKUPS
+
+        values = {}
+        for field in CONTENT_FIELDS:
+            if field in LOOKUPS:
+                values[field] = LOOKUPS[field].name(getattr(self, f'{field}_id'))
+            else:
+                values[field] = getattr(self, field)
+        return values
+
+    def compute_content_hash(self):
+        return content_hash(self.content_values())
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
+
+class PartnerDataVersion(models.Model):
+    """
+    Single row counting writes to the partners table (``version``) and
+    renames or deletions of lookup rows (``lookup_version``). Every process
+    keys its list cache, list ETags, facets and partner snapshot on it (see
+    versions.py), so a write in one process is seen by all of them.
+    """
+    version = models.BigIntegerField(default=0)
+    lookup_version = models.BigIntegerField(default=0)
+    changed = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return self.firm_name
\ No newline at end of file
+        return f"partners v{self.version}"
+
+
+class ImportJob(models.Model):
+    """A spreadsheet import queued in the database and run outside the request."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+    file = models.FileField(upload_to='imports/')
+    original_name = models.CharField(max_length=255)
+    # sha256 of the file, so that uploading the same file again reuses this job
+    file_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    cancel_requested = models.BooleanField(default=False)
+
+    total_rows = models.PositiveIntegerField(blank=True, null=True)  # Unknown for CSV uploads
+    rows_read = models.PositiveIntegerField(default=0)  # Data rows handled so far
+    processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+    skipped = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    # Last progress checkpoint; a running job without one for a while has stalled
+    heartbeat = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"{self.original_name} ({self.status})"
+
+    @property
+    def progress(self):
+        """Share of the sheet handled so far, between 0 and 1, if known."""
+        if self.status == self.SUCCEEDED:
+            return 1.0
+        if not self.total_rows:
+            return None
+        return min(self.rows_read / self.total_rows, 1.0)
+
+
+class UploadSession(models.Model):
+    """
+    A spreadsheet sent in chunks (see uploads.py). The bytes received so far
+    are kept in ``part_path`` on local disk until the upload is completed.
+    """
+
+    OPEN = 'open'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    original_name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, db_index=True)
+    received = models.PositiveBigIntegerField(default=0)  # Contiguous bytes stored from offset 0
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=OPEN)
+    job = models.ForeignKey(ImportJob, on_delete=models.SET_NULL, blank=True, null=True, related_name='uploads')
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"{self.original_name} ({self.received}/{self.size} bytes)"
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.PARTNER_UPLOAD_DIR, f"{self.pk}.part")
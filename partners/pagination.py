@@ -1,6 +1,70 @@
-from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PartnerCursorPagination(CursorPagination):
+    """
+    Keyset pagination: every page is a ``WHERE key > last_key LIMIT n`` query,
+    so deep pages cost the same as the first one and no COUNT(*) is issued.
+
+    Pages are keyed on ``id`` by default, or on ``(firm_name, id)`` with
+    ``?cursor_ordering=firm_name``.
+    """
+    page_size = settings.PARTNER_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "id"
+    ordering_query_param = "cursor_ordering"
+    orderings = {
+        "id": ("id",),
+        "firm_name": ("firm_name", "id"),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        key = request.query_params.get(self.ordering_query_param, self.ordering)
+        return self.orderings.get(key, self.orderings[self.ordering])
+
 
 class PartnerPagination(PageNumberPagination):
-    page_size = 10
+    """
+    Page-number pagination (``?page=``) by default. ``?pagination=cursor``, or
+    following a ``?cursor=`` link, switches to ``PartnerCursorPagination``.
+    Cursor mode has its own ordering, so it does not keep the relevance order
+    of ranked search results.
+    """
+    page_size = settings.PARTNER_PAGE_SIZE
     page_size_query_param = "page_size"
     max_page_size = 100
+    mode_query_param = "pagination"
+    cursor_class = PartnerCursorPagination
+
+    cursor_paginator = None
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def ordering_fields(self, request):
+        """Fields the rows of a page must carry for the next/previous links."""
+        if self.use_cursor(request):
+            return self.cursor_class().get_ordering(request, None, None)
+        return ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_html_context()
+        return super().get_html_context()
@@ -0,0 +1,286 @@
+# pipeline.py
+"""
+Imports from several sources at once: many uploaded files, every sheet of a
+workbook and the members of zip archives.
+
+Each sheet or CSV file is a source. Sources are read and cleaned in parallel
+on a process pool (openpyxl parsing is CPU bound), then concatenated in
+upload order and written by one ``bulk_upsert`` call. A firm found in several
+sources is therefore merged like a firm repeated within one sheet: later
+sources win per column. Every source gets its own report next to the
+totals.
+
+Uploaded files and archive members are copied to temporary files in chunks
+and read from there, so no upload is ever held in memory as a whole. The
+copies are deleted once the import is done.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+import pandas as pd
+from django.conf import settings
+from openpyxl import load_workbook
+
+from .importer import (
+    ImportFormatError,
+    ImportResult,
+    bulk_upsert,
+    clean_frame,
+    iter_csv_rows,
+    iter_excel_rows,
+    iter_frames,
+)
+
+SPREADSHEET_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+ARCHIVE_EXTENSIONS = ('.zip',)
+
+# One sheet of a workbook (``sheet`` set) or one CSV file, read from a temporary copy at ``path``
+Source = namedtuple('Source', ['name', 'path', 'sheet'])
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_pool = None
+
+
+def get_parse_workers():
+    return getattr(settings, 'PARTNER_IMPORT_PARSE_WORKERS', min(4, os.cpu_count() or 1))
+
+
+def get_max_archive_bytes():
+    return getattr(settings, 'PARTNER_IMPORT_MAX_ARCHIVE_BYTES', 100 * 1024 * 1024)
+
+
+def is_multi_source(file):
+    """
+    Whether an uploaded file holds several sources: a zip archive or a
+    workbook with more than one sheet. Leaves the file at its start.
+    """
+    name = file.name.lower()
+    if name.endswith(ARCHIVE_EXTENSIONS):
+        return True
+    if name.endswith('.csv'):
+        return False
+    try:
+        workbook = load_workbook(file, read_only=True)
+        try:
+            return len(workbook.sheetnames) > 1
+        finally:
+            workbook.close()
+    except Exception:
+        return False  # reported by the regular import
+    finally:
+        file.seek(0)
+
+
+def _spool(name, file, paths):
+    """Copy a binary file object to a temporary file in chunks; returns its path."""
+    # openpyxl tells workbook formats apart by the extension
+    suffix = os.path.splitext(name)[1]
+    with tempfile.NamedTemporaryFile(prefix='partner-source-', suffix=suffix, delete=False) as copy:
+        paths.append(copy.name)
+        shutil.copyfileobj(file, copy, COPY_CHUNK_SIZE)
+    return copy.name
+
+
+def _expand(name, file, sources, failures, paths):
+    lowered = name.lower()
+    if lowered.endswith(ARCHIVE_EXTENSIONS):
+        try:
+            archive = zipfile.ZipFile(file)
+        except zipfile.BadZipFile:
+            failures.append({'source': name, 'error': "Not a valid zip archive"})
+            return
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('.')
+            and info.filename.lower().endswith(SPREADSHEET_EXTENSIONS)
+        ]
+        if sum(info.file_size for info in members) > get_max_archive_bytes():
+            failures.append({'source': name, 'error': "Archive is too large once extracted"})
+            return
+        for info in members:
+            with archive.open(info) as member:
+                _expand(f"{name}/{info.filename}", member, sources, failures, paths)
+    elif lowered.endswith('.csv'):
+        sources.append(Source(name, _spool(name, file, paths), None))
+    elif lowered.endswith(SPREADSHEET_EXTENSIONS):
+        path = _spool(name, file, paths)
+        try:
+            workbook = load_workbook(path, read_only=True)
+            sheets = workbook.sheetnames
+            workbook.close()
+        except Exception as e:
+            failures.append({'source': name, 'error': f"Cannot read workbook: {e}"})
+            return
+        sources.extend(Source(f"{name} [{sheet}]", path, sheet) for sheet in sheets)
+
+
+def expand_sources(files):
+    """
+    Split uploaded files into sources, in upload order. Returns
+    ``(sources, failures, paths)``: failures are reports for unreadable
+    files, and ``paths`` the temporary copies, which the caller removes with
+    ``remove_copies()``.
+    """
+    sources, failures, paths = [], [], []
+    try:
+        for file in files:
+            file.seek(0)
+            _expand(os.path.basename(file.name), file, sources, failures, paths)
+    except BaseException:
+        remove_copies(paths)
+        raise
+    return sources, failures, paths
+
+
+def remove_copies(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def parse_source(source):
+    """
+    Read and clean one source; runs in a pool worker. Returns a dict with the
+    cleaned frame (None if the source cannot be imported) and its skipped rows.
+    """
+    result = ImportResult()
+    with open(source.path, 'rb') as file:
+        if source.sheet is None:
+            rows = iter_csv_rows(file)
+        else:
+            rows = iter_excel_rows(file, source.sheet)
+        try:
+            frames = [clean_frame(frame, result, row_numbers) for frame, row_numbers in iter_frames(rows)]
+        except ImportFormatError as e:
+            return {'cleaned': None, 'skipped': [], 'error': str(e)}
+    cleaned = pd.concat(frames) if frames else None
+    return {'cleaned': cleaned, 'skipped': result.skipped, 'error': None}
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: a forked worker would share the parent's database sockets
+        _pool = ProcessPoolExecutor(
+            max_workers=get_parse_workers(),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _pool
+
+
+def parse_sources(sources):
+    """``parse_source`` for every source, on the process pool when there are several."""
+    global _pool
+    if len(sources) > 1 and get_parse_workers() > 1:
+        try:
+            return list(_get_pool().map(parse_source, sources))
+        except BrokenProcessPool:
+            _pool = None  # a worker died; parse in this process instead
+    return [parse_source(source) for source in sources]
+
+
+class SourcedImportResult(ImportResult):
+    """
+    ImportResult over the concatenated sources. Its row numbers are positions
+    in the combined frame; ``origins`` maps them back to (source, row). Each
+    firm counts towards the source of its last row once it is written. The
+    other sources it appeared in count it as a duplicate.
+    """
+
+    def __init__(self, reports, origins, preview=False):
+        super().__init__(preview)
+        self.reports = reports
+        self.origins = origins
+
+    def _locate(self, position):
+        report, row_number = self.origins[position]
+        return self.reports[report], row_number
+
+    def skip(self, row_number, reason):
+        report, row_number = self._locate(row_number)
+        report['skipped'].append(f"Row {row_number}: {reason}")
+        self.skipped.append(f"{report['source']}: Row {row_number}: {reason}")
+
+    def count(self, action, rows):
+        super().count(action, rows)
+        located = [self._locate(position)[0] for position in rows]
+        final = located[-1]
+        final[self.COUNTERS[action]] += 1
+        for report in {id(report): report for report in located}.values():
+            if report is not final:
+                report['duplicates'] += 1
+
+    def record(self, action, firm_name, rows, changes=None):
+        if self.preview is None:
+            return
+        located = [self._locate(position) for position in rows]
+        entry = {
+            "firm_name": firm_name,
+            "rows": [{"source": report['source'], "row": int(row)} for report, row in located],
+        }
+        if changes:
+            entry["changes"] = changes
+        self.preview[action].append(entry)
+
+    def as_dict(self):
+        return {**super().as_dict(), "sources": self.reports}
+
+
+def import_sources(files, dry_run=False, batch_size=None, on_progress=None):
+    """
+    Import every source in ``files`` with one batched write phase and return
+    a SourcedImportResult. Raises ImportFormatError if no source can be
+    imported. ``on_progress`` is called with the result once the sources are
+    parsed and after every batch written.
+    """
+    sources, failures, paths = expand_sources(files)
+    try:
+        return _import_sources(sources, failures, dry_run, batch_size, on_progress)
+    finally:
+        remove_copies(paths)
+
+
+def _import_sources(sources, failures, dry_run, batch_size, on_progress):
+    reports = [
+        {'source': source.name, 'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0, 'skipped': []}
+        for source in sources
+    ]
+    frames, origins = [], []
+    for index, (report, parsed) in enumerate(zip(reports, parse_sources(sources))):
+        report['skipped'].extend(parsed['skipped'])
+        if parsed['error'] is not None:
+            report['error'] = parsed['error']
+            continue
+        if parsed['cleaned'] is None:
+            continue
+        report['rows'] = len(parsed['cleaned'])
+        origins.extend((index, row_number) for row_number in parsed['cleaned'].index)
+        frames.append(parsed['cleaned'])
+
+    reports.extend(failures)
+    if not frames and not any('error' not in report for report in reports):
+        errors = '; '.join(f"{report['source']}: {report['error']}" for report in reports)
+        raise ImportFormatError(errors or "No spreadsheet found in the upload")
+
+    result = SourcedImportResult(reports, origins, preview=dry_run)
+    for report in reports:
+        result.skipped.extend(f"{report['source']}: {message}" for message in report.get('skipped', ()))
+    if on_progress is not None:
+        on_progress(result)
+    if frames:
+        combined = pd.concat(frames, ignore_index=True)
+        bulk_upsert(combined, result, batch_size, dry_run=dry_run, on_progress=on_progress)
+    return result
@@ -1,15 +1,63 @@
 # resources.py
+from django.conf import settings
+from django.db.models.functions import Lower
+from django.utils import timezone
 from import_export import resources
 from import_export.fields import Field
-from .models import Partner
+from import_export.widgets import Widget
+from .lookup_tables import LOOKUPS, normalize_label
+from .lookups import LOOKUP_BATCH_SIZE, normalize_name
+from .models import CONTENT_FIELDS, Partner, content_hash
+from .signals import notify_partners_changed
+
+
+class LookupWidget(Widget):
+    """
+    Imports and exports a lookup foreign key as its name. PartnerResource
+    resolves the names of a whole dataset up front with ``set_labels()``.
+    """
+
+    def __init__(self, field, **kwargs):
+        super().__init__(**kwargs)
+        self.field = field
+        self.labels = {}
+        self._names = {}
+
+    def set_labels(self, labels):
+        """``{normalized name: (id, name)}`` as returned by LookupCache.resolve()."""
+        self.labels = labels
+        self._names = {pk: name for pk, name in labels.values()}
+
+    def name(self, pk):
+        # This import's new rows only reach LOOKUPS once it commits
+        if pk in self._names:
+            return self._names[pk]
+        return LOOKUPS[self.field].name(pk)
+
+    def clean(self, value, row=None, **kwargs):
+        if value is None or not str(value).strip():
+            return None
+        label = self.labels.get(normalize_label(value))
+        if label is not None:
+            return label[0]
+        return LOOKUPS[self.field].id_for(value)
+
+    def render(self, value, obj=None, **kwargs):
+        return self.name(value) or ''
+
+
+def lookup_field(name):
+    return Field(attribute=f'{name}_id', column_name=name, widget=LookupWidget(name))
+
 
 class PartnerResource(resources.ModelResource):
     firm_name = Field(attribute='firm_name', column_name='firm_name')
-    hq = Field(attribute='hq', column_name='hq')
+    hq = lookup_field('hq')
     focus_area = Field(attribute='focus_area', column_name='focus_area')
     contact = Field(attribute='contact', column_name='contact')
     donor_experience = Field(attribute='donor_experience', column_name='donor_experience')
-    current_partnership_status = Field(attribute='current_partnership_status', column_name='current_partnership_status')
+    current_partnership_status = lookup_field('current_partnership_status')
+    sector = lookup_field('sector')
 
     class Meta:
         model = Partner
@@ -20,21 +68,54 @@ class PartnerResource(resources.ModelResource):
             'contact',
             'donor_experience',
             'current_partnership_status',
+            'sector',
         )
         export_order = fields
         import_id_fields = ('firm_name',)  # Use firm_name as identifier for updates
         skip_unchanged = True
         report_skipped = True
         use_bulk = True  # Enable bulk operations for better performance
+        batch_size = settings.PARTNER_IMPORT_BATCH_SIZE
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._instances = {}
+
+    def before_import(self, dataset, **kwargs):
+        """
+        Load every partner named in the dataset up front, keyed by normalized
+        firm name, so that rows are matched (and compared for skip_unchanged)
+        in memory instead of with one query per row.
+        """
+        super().before_import(dataset, **kwargs)
+        self._instances = {}
+        headers = dataset.headers or []
+        # Resolve (and create) the dataset's lookup names in one go per table;
+        # a dry run rolls the new rows back with the rest of the import
+        for field in LOOKUPS:
+            if field in headers:
+                self.fields[field].widget.set_labels(LOOKUPS[field].resolve(dataset[field]))
+        if 'firm_name' not in headers:
+            return
+        keys = list({
+            normalize_name(name) for name in dataset['firm_name']
+            if name is not None and str(name).strip()
+        })
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            partners = (
+                Partner.objects.annotate(name_key=Lower('firm_name'))
+                .filter(name_key__in=keys[start:start + LOOKUP_BATCH_SIZE])
+            )
+            self._instances.update((partner.name_key, partner) for partner in partners)
 
     def before_import_row(self, row, **kwargs):
         """Clean and validate data before import"""
         # Clean firm_name
         if 'firm_name' in row and row['firm_name']:
             row['firm_name'] = str(row['firm_name']).strip()
-        
+
         # Clean other fields
-        for field in ['hq', 'focus_area', 'contact', 'donor_experience', 'current_partnership_status']:
+        for field in ['hq', 'focus_area', 'contact', 'donor_experience', 'current_partnership_status', 'sector']:
             if field in row and row[field]:
                 row[field] = str(row[field]).strip()
             elif field in row:
@@ -42,8 +123,50 @@ class PartnerResource(resources.ModelResource):
 
     def get_or_init_instance(self, instance_loader, row):
         """Get existing instance or create new one based on firm_name"""
-        try:
-            instance = Partner.objects.get(firm_name=row['firm_name'])
+        key = normalize_name(row.get('firm_name') or '')
+        instance = self._instances.get(key)
+        if instance is not None:
             return instance, False  # False means it's an update
-        except Partner.DoesNotExist:
-            return Partner(), True  # True means it's a new instance
+        instance = Partner()
+        # Later rows for the same firm update this pending instance
+        self._instances[key] = instance
+        return instance, True  # True means it's a new instance
+
+    def skip_row(self, instance, original, row, import_validation_errors=None):
+        """Unchanged rows are skipped; an empty cell matches a NULL column."""
+        if not self._meta.skip_unchanged or import_validation_errors:
+            return False
+        return all(
+            (field.get_value(instance) or '') == (field.get_value(original) or '')
+            for field in self.get_import_fields()
+        )
+
+    def save_instance(self, instance, is_create, row, **kwargs):
+        # A firm repeated in the file: its pending instance is already queued
+        # for bulk_create and has just been updated in place
+        if not is_create and instance.pk is None:
+            return
+        super().save_instance(instance, is_create, row, **kwargs)
+
+    def before_save_instance(self, instance, row, **kwargs):
+        # bulk_update() does not apply auto_now nor Partner.save()
+        instance.updated = timezone.now()
+        instance.content_hash = content_hash(self._content_values(instance))
+
+    def _content_values(self, instance):
+        values = {}
+        for field in CONTENT_FIELDS:
+            if field in LOOKUPS:
+                values[field] = self.fields[field].widget.name(getattr(instance, f'{field}_id'))
+            else:
+                values[field] = getattr(instance, field)
+        return values
+
+    def get_bulk_update_fields(self):
+        # firm_name too: matching is case-insensitive, so the file may fix its casing
+        return super().get_bulk_update_fields() + ['firm_name', 'updated', 'content_hash']
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if not kwargs.get('dry_run'):
+            notify_partners_changed()
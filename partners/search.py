@@ -0,0 +1,53 @@
+# search.py
+"""
+Search backend for the partners API.
+
+On PostgreSQL the ``?search=`` terms are matched against the trigger-maintained
+``search_vector`` column (GIN indexed) and results come back by relevance.
+Every term is matched as a prefix, so partial words typed in the frontend
+still match. Other databases, or ``?search_mode=contains``, use DRF's
+``icontains`` search over ``search_fields``.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F
+from rest_framework import filters
+
+# Must match the configuration used by the trigger in migration 0006
+SEARCH_CONFIG = 'simple'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def build_prefix_query(terms):
+    """Turn search terms into a tsquery that ANDs a prefix match per word."""
+    words = [word for term in terms for word in WORD_RE.findall(term.lower())]
+    if not words:
+        return None
+    raw = ' & '.join(f"{word}:*" for word in words)
+    return SearchQuery(raw, config=SEARCH_CONFIG, search_type='raw')
+
+
+class PartnerSearchFilter(filters.SearchFilter):
+    search_mode_param = 'search_mode'
+
+    def use_full_text(self, request, queryset):
+        if connections[queryset.db].vendor != 'postgresql':
+            return False
+        return request.query_params.get(self.search_mode_param, 'ranked') != 'contains'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not self.use_full_text(request, queryset):
+            return super().filter_queryset(request, queryset, view)
+
+        query = build_prefix_query(terms)
+        if query is None:
+            return super().filter_queryset(request, queryset, view)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', 'id')
+        )
@@ -1,7 +1,276 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Partner
+from core.metrics import TimedListSerializer, TimedSerializerMixin, bulk_statements, queries_within
+from .lookup_tables import LOOKUPS, clean_label, normalize_label, preload_names, value_columns
+from .models import ImportJob, Partner, UploadSession
+from .signals import notify_partners_changed
+
+
+class LookupNameField(serializers.Field):
+    """
+    A lookup-table foreign key (hq, sector, status) read and written as its
+    name. Validation only cleans the name; ``resolve_lookup_names()`` turns
+    it into an id, creating unknown rows, inside the write transaction.
+    """
+    default_error_messages = {
+        "invalid": "Must be a string.",
+        "max_length": "Ensure this field has no more than {max_length} characters.",
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("required", False)
+        kwargs.setdefault("allow_null", True)
+        super().__init__(**kwargs)
+
+    def bind(self, field_name, parent):
+        # Read the id column so that no lookup row is fetched per partner
+        if self.source is None:
+            self.source = f"{field_name}_id"
+        super().bind(field_name, parent)
+
+    @property
+    def cache(self):
+        return LOOKUPS[self.field_name]
+
+    def to_representation(self, value):
+        return self.cache.name(value)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail("invalid")
+        if not data.strip():
+            return None
+        max_length = self.cache.model._meta.get_field("name").max_length
+        if len(data.strip()) > max_length:
+            self.fail("max_length", max_length=max_length)
+        return clean_label(data)
+
+
+def resolve_lookup_names(items):
+    """
+    Replace the lookup names LookupNameField left in validated data with
+    ids, creating the missing lookup rows. Call it inside the transaction
+    that writes the partners, so a failed write leaves no rows behind.
+    """
+    for field, cache in LOOKUPS.items():
+        key = f"{field}_id"
+        named = [attrs for attrs in items if attrs.get(key) is not None]
+        if not named:
+            continue
+        found = cache.resolve([attrs[key] for attrs in named])
+        for attrs in named:
+            attrs[key] = found[normalize_label(attrs[key])][0]
+
+
+class PartnerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    hq = LookupNameField()
+    current_partnership_status = LookupNameField()
+    sector = LookupNameField()
 
-class PartnerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Partner
-        fields = "__all__"
\ No newline at end of file
+        fields = [
+            "id", "firm_name", "hq", "focus_area", "contact", "donor_experience",
+            "current_partnership_status", "sector", "created", "updated",
+        ]
+        list_serializer_class = TimedListSerializer
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            resolve_lookup_names([validated_data])
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            resolve_lookup_names([validated_data])
+            return super().update(instance, validated_data)
+
+# SQL queries of a bulk write besides its bulk statements: the savepoint, per
+# lookup table up to four for new names (load, look up, create, read back) and
+# one to name the stored values of updated partners, and the data version bump
+BULK_WRITE_QUERIES = 18
+
+
+class PartnerBulkListSerializer(serializers.ListSerializer):
+    """
+    Validates and writes a list of partners for /api/partners/bulk/.
+
+    Firm name uniqueness and, for updates, the ``id`` of every item are
+    checked with a few queries for the whole list instead of a few per item.
+    ``save()`` creates the missing lookup rows and writes all items with one
+    ``bulk_create`` or ``bulk_update`` in one transaction, under a query
+    budget that grows with the number of items. For updates ``instance`` is
+    the queryset the ids must belong to.
+    """
+    unique_message = "partner with this firm name already exists."
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._prepare([item for item in data if isinstance(item, dict)])
+        return super().to_internal_value(data)
+
+    def _prepare(self, items):
+        names = [item["firm_name"].strip() for item in items if isinstance(item.get("firm_name"), str)]
+        self._taken_names = dict(Partner.objects.filter(firm_name__in=names).values_list("firm_name", "id"))
+        self._seen_names = set()
+        if self.instance is not None:
+            ids = [self._parse_id(item.get("id")) for item in items]
+            self._existing_ids = set(self.instance.filter(pk__in=[pk for pk in ids if pk]).values_list("pk", flat=True))
+            self._seen_ids = set()
+
+    @staticmethod
+    def _parse_id(value):
+        try:
+            return serializers.IntegerField(min_value=1).run_validation(value)
+        except serializers.ValidationError:
+            return None
+
+    def _validate_id(self, data):
+        if data.get("id") is None:
+            raise serializers.ValidationError({"id": ["This field is required."]})
+        pk = self._parse_id(data["id"])
+        if pk not in self._existing_ids:
+            raise serializers.ValidationError({"id": [f'Invalid pk "{data["id"]}" - object does not exist.']})
+        if pk in self._seen_ids:
+            raise serializers.ValidationError({"id": ["Duplicate id."]})
+        self._seen_ids.add(pk)
+        return pk
+
+    def run_child_validation(self, data):
+        pk = self._validate_id(data) if self.instance is not None and isinstance(data, dict) else None
+        attrs = super().run_child_validation(data)
+        name = attrs.get("firm_name")
+        if name is not None:
+            owner = self._taken_names.get(name)
+            if name in self._seen_names or owner not in (None, pk):
+                raise serializers.ValidationError({"firm_name": [self.unique_message]})
+            self._seen_names.add(name)
+        if pk is not None:
+            attrs["id"] = pk
+        return attrs
+
+    def create(self, validated_data):
+        budget = BULK_WRITE_QUERIES + bulk_statements(Partner, len(validated_data))
+        with queries_within("PartnerBulkListSerializer.create", budget), transaction.atomic():
+            resolve_lookup_names(validated_data)
+            partners = [Partner(**attrs) for attrs in validated_data]
+            for partner in partners:
+                partner.content_hash = partner.compute_content_hash()
+            Partner.objects.bulk_create(partners)
+            notify_partners_changed()
+        return partners
+
+    def update(self, queryset, validated_data):
+        """Apply the changes; items whose partner vanished since validation come back as None."""
+        changes = {attrs["id"]: {k: v for k, v in attrs.items() if k != "id"} for attrs in validated_data}
+        fields = sorted({field for attrs in changes.values() for field in attrs})
+        now = timezone.now()
+        budget = (
+            BULK_WRITE_QUERIES
+            + bulk_statements(Partner, len(changes))  # in_bulk() reads in batches as large
+            + bulk_statements(Partner, len(changes), update_fields=[*fields, "updated", "content_hash"])
+        )
+        with queries_within("PartnerBulkListSerializer.update", budget), transaction.atomic():
+            resolve_lookup_names(changes.values())
+            partners = queryset.select_for_update().defer("search_vector").in_bulk(list(changes))
+            for field, cache in LOOKUPS.items():
+                cache.preload(getattr(partner, f"{field}_id") for partner in partners.values())
+            for pk, attrs in changes.items():
+                partner = partners.get(pk)
+                if partner is None:
+                    continue
+                for field, value in attrs.items():
+                    setattr(partner, field, value)
+                # bulk_update() skips auto_now and Partner.save()
+                partner.updated = now
+                partner.content_hash = partner.compute_content_hash()
+            Partner.objects.bulk_update(partners.values(), [*fields, "updated", "content_hash"])
+            notify_partners_changed()
+        return [partners.get(pk) for pk in changes]
+
+
+class PartnerBulkSerializer(PartnerSerializer):
+    """One item of a bulk request; firm name uniqueness is checked per list."""
+
+    class Meta(PartnerSerializer.Meta):
+        extra_kwargs = {"firm_name": {"validators": []}}
+        list_serializer_class = PartnerBulkListSerializer
+
+
+class PartnerBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=settings.PARTNER_BULK_MAX_ITEMS,
+    )
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id", "original_name", "status", "cancel_requested", "progress",
+            "total_rows", "rows_read", "processed", "created_count",
+            "updated_count", "unchanged_count", "skipped", "error",
+            "file_sha256", "created", "started", "heartbeat", "finished",
+        ]
+        read_only_fields = fields
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Opens a chunked upload from ``original_name``, ``size`` and ``sha256``; the rest is read-only."""
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "original_name", "size", "sha256", "received", "status", "job", "created", "updated"]
+        read_only_fields = ["id", "received", "status", "job", "created", "updated"]
+
+
+class PartnerValuesSerializer:
+    """
+    Read-only counterpart of PartnerSerializer for list responses. It selects
+    ``.values()`` rows and returns them as plain dicts, skipping the per-field
+    machinery of ModelSerializer. ``fields`` narrows the SELECT list and the
+    output; ``id`` is always included.
+    """
+    all_fields = tuple(PartnerSerializer.Meta.fields)
+
+    def __init__(self, fields=None):
+        self.fields = self.parse_fields(fields)
+
+    @classmethod
+    def parse_fields(cls, value):
+        if not value:
+            return cls.all_fields
+        requested = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = sorted(requested - set(cls.all_fields))
+        if unknown:
+            raise serializers.ValidationError({
+                "fields": f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(cls.all_fields)}"
+            })
+        requested.add("id")
+        # Keep the column order of the full representation
+        return tuple(name for name in cls.all_fields if name in requested)
+
+    def select(self, queryset, extra=()):
+        """
+        ``queryset.values()`` with the output fields plus ``extra`` ones (e.g.
+        paging keys). Lookup fields are read as ids, named from memory later.
+        """
+        extra = [name for name in extra if name not in self.fields]
+        return queryset.values(*value_columns(self.fields), *extra)
+
+    def to_representation(self, rows):
+        columns = list(zip(self.fields, value_columns(self.fields)))
+        names = {name: LOOKUPS[name].name for name in self.fields if name in LOOKUPS}
+        rows = list(rows)
+        preload_names(rows, {name: column for name, column in columns if name in names})
+        return [
+            {
+                name: names[name](row[column]) if name in names else row[column]
+                for name, column in columns
+            }
+            for row in rows
+        ]
@@ -0,0 +1,63 @@
+# signals.py
+"""
+``partners_changed`` is sent whenever partner rows may have changed. Its
+receivers bump the shared partner data version (versions.py) that caches
+derived from the table are keyed on.
+
+Single-object saves and deletes send it through the model signals. Bulk paths
+(the spreadsheet importer, the admin import) do not fire model signals, so
+they call ``notify_partners_changed()`` themselves. Code that saves or deletes
+many partners through the model wraps it in ``notify_once()`` to send one
+signal instead of one per row.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from import_export.signals import post_import
+
+from .models import Partner
+
+partners_changed = Signal()
+
+# Per thread: depth of nested notify_once() blocks and whether a row changed in them
+_batch = threading.local()
+
+
+def notify_partners_changed():
+    partners_changed.send(sender=Partner)
+
+
+@contextmanager
+def notify_once():
+    """
+    Collapse the model signals of the rows saved or deleted in the block
+    into one notification, sent when the block succeeds. Use it inside the
+    transaction that writes the rows.
+    """
+    depth = getattr(_batch, 'depth', 0)
+    if depth == 0:
+        _batch.changed = False
+    _batch.depth = depth + 1
+    try:
+        yield
+    finally:
+        _batch.depth = depth
+    if depth == 0 and _batch.changed:
+        notify_partners_changed()
+
+
+@receiver(post_save, sender=Partner)
+@receiver(post_delete, sender=Partner)
+def partner_saved_or_deleted(sender, **kwargs):
+    if getattr(_batch, 'depth', 0):
+        _batch.changed = True
+    else:
+        notify_partners_changed()
+
+
+@receiver(post_import)
+def partners_imported(sender, model=None, **kwargs):
+    if model is Partner:
+        notify_partners_changed()
@@ -0,0 +1,174 @@
+# snapshot.py
+"""
+Optional in-process snapshot of the partners table.
+
+With ``PARTNER_SNAPSHOT_ENABLED`` each process holds every partner as a
+``PartnerRecord`` (the API columns, no search vector), indexed by id,
+lower-cased firm name and lookup id. Plain list pages and their ETags, the
+facets behind ``hq_list``, ``find_partners`` and the fuzzy fallback index
+are then answered from memory. Search and cursor pages still query the
+database.
+
+The snapshot is tagged with the shared partner data version (versions.py).
+A process re-reads that version at most every
+``PARTNER_SNAPSHOT_CHECK_INTERVAL`` seconds and reloads when it moved, so
+writes made by other workers show up within the interval and its own writes
+on the next read. The snapshot is not used inside a transaction, where it
+could disagree with uncommitted rows.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import receiver
+
+from .lookup_tables import LOOKUPS, value_columns
+from .models import CONTENT_FIELDS, Partner
+from .signals import partners_changed
+from .versions import read_version
+
+# Columns kept per partner, named like the .values() columns of the list
+COLUMNS = ('id', *value_columns(CONTENT_FIELDS), 'created', 'updated')
+# Query parameters a snapshot list page can answer; anything else goes to the database
+LIST_PARAMS = frozenset({'page', 'page_size', 'fields', 'format', *LOOKUPS})
+
+
+def is_enabled():
+    return getattr(settings, 'PARTNER_SNAPSHOT_ENABLED', False)
+
+
+class PartnerRecord:
+    """One partner. ``record[column]`` reads like a ``.values()`` row."""
+
+    __slots__ = COLUMNS
+
+    def __init__(self, values):
+        for column, value in zip(COLUMNS, values):
+            setattr(self, column, value)
+
+    def __getitem__(self, column):
+        return getattr(self, column)
+
+
+class PartnerSnapshot:
+    """All partners at one ``DataVersion``, in id order."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.records = [PartnerRecord(row) for row in rows]
+        self.by_id = {record.id: record for record in self.records}
+        self.by_name = {record.firm_name.lower(): record for record in self.records}
+        # field -> lookup id -> records, in id order
+        self.by_lookup = {field: defaultdict(list) for field in LOOKUPS}
+        for record in self.records:
+            for field, index in self.by_lookup.items():
+                index[record[f'{field}_id']].append(record)
+
+    def filter(self, **names):
+        """Records whose lookup fields carry the given names (case-insensitive)."""
+        ids = {}
+        for field, name in names.items():
+            pk = LOOKUPS[field].id_for(name, create=False)
+            if pk is None:
+                return []
+            ids[field] = pk
+        if not ids:
+            return self.records
+        # Walk the shortest candidate list and check the other fields on it
+        field = min(ids, key=lambda field: len(self.by_lookup[field].get(ids[field], ())))
+        return [
+            record for record in self.by_lookup[field].get(ids[field], ())
+            if all(record[f'{other}_id'] == pk for other, pk in ids.items())
+        ]
+
+
+class SnapshotStore:
+    """The process's current snapshot, reloaded when the database version moves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked = None  # time.monotonic() of the last version check
+
+    def expire(self):
+        """Check the version on the next read."""
+        self._checked = None
+
+    def _fresh(self):
+        checked = self._checked
+        interval = getattr(settings, 'PARTNER_SNAPSHOT_CHECK_INTERVAL', 1.0)
+        return self._snapshot is not None and checked is not None and time.monotonic() - checked < interval
+
+    def get(self):
+        """The snapshot, or None when it is disabled or a transaction is open."""
+        if not is_enabled() or connection.in_atomic_block:
+            return None
+        if self._fresh():
+            return self._snapshot
+        with self._lock:
+            if self._fresh():
+                return self._snapshot
+            checked = time.monotonic()
+            # Version first: rows read after it are at least that new
+            version = read_version()
+            previous = self._snapshot
+            if previous is None or previous.version != version:
+                rows = Partner.objects.order_by('id').values_list(*COLUMNS)
+                self._snapshot = PartnerSnapshot(version, rows)
+            self._checked = checked
+        return self._snapshot
+
+    def clear(self):
+        with self._lock:
+            self._snapshot, self._checked = None, None
+
+
+store = SnapshotStore()
+
+
+def get_snapshot():
+    return store.get()
+
+
+def request_snapshot(request):
+    """The snapshot a request is answered from, the same one for its whole duration."""
+    if not hasattr(request, '_snapshot'):
+        request._snapshot = get_snapshot()
+    return request._snapshot
+
+
+def request_version(request):
+    """
+    ``DataVersion`` a request is answered at: its snapshot's, or read from
+    the database once per request. Cache keys and ETags built from it agree
+    with the body served.
+    """
+    if not hasattr(request, '_data_version'):
+        snapshot = request_snapshot(request)
+        request._data_version = snapshot.version if snapshot is not None else read_version()
+    return request._data_version
+
+
+def list_records(request):
+    """
+    Records answering a partner list request in id order, or None when it
+    needs the database (snapshot off, search, cursor pages, unknown
+    parameters). Kept on the request so the ETag and the page agree.
+    """
+    if not hasattr(request, '_snapshot_records'):
+        records = None
+        params = request.query_params
+        if set(params) <= LIST_PARAMS:
+            snapshot = request_snapshot(request)
+            if snapshot is not None:
+                records = snapshot.filter(**{field: params[field] for field in LOOKUPS if params.get(field)})
+        request._snapshot_records = records
+    return request._snapshot_records
+
+
+@receiver(partners_changed)
+def expire_snapshot(**kwargs):
+    # This process's own write: reload on the next read instead of after the interval
+    transaction.on_commit(store.expire)
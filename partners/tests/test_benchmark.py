@@ -0,0 +1,18 @@
+from django.test import TestCase
+
+from partners.benchmark import rolled_back
+from partners.importer import import_rows
+from partners.models import Location, Partner
+from partners.versions import read_version
+
+
+class RolledBackTests(TestCase):
+    def test_database_and_data_version_are_left_as_they_were(self):
+        Partner.objects.create(firm_name='Acme')
+        before = read_version()
+        with rolled_back():
+            import_rows([('Firm Name', 'Headquarters'), ('Globex', 'Peru')])
+            self.assertEqual(Partner.objects.count(), 2)
+        self.assertEqual(read_version(), before)
+        self.assertEqual(list(Partner.objects.values_list('firm_name', flat=True)), ['Acme'])
+        self.assertFalse(Location.objects.exists())
@@ -0,0 +1,67 @@
+"""
+Query budgets of the API at realistic sizes. The test settings make
+``query_budget`` raise, so a view that goes over its budget fails here.
+"""
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from partners.benchmark import build_workbook, generate_rows
+from partners.cache import CACHE_ALIAS
+from partners.models import Partner
+
+SIZE = 1000
+
+
+class BudgetTestCase(TestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client = APIClient()
+
+    def upload(self, rows, batch_size=None):
+        upload = SimpleUploadedFile('partners.xlsx', build_workbook(rows))
+        with override_settings(PARTNER_IMPORT_BATCH_SIZE=batch_size or SIZE):
+            response = self.client.post('/api/upload-excel/', {'file': upload}, format='multipart')
+        self.assertLess(response.status_code, 300, response.content)
+        return response.json()
+
+
+class UploadBudgetTests(BudgetTestCase):
+    def test_first_upload_then_unchanged_then_changed(self):
+        rows = list(generate_rows(SIZE))
+        self.assertEqual(self.upload(rows)['created'], SIZE)
+        self.assertEqual(self.upload(rows)['unchanged'], SIZE)
+        changed = [(*row[:2], f'{row[2]} v2', *row[3:]) for row in rows]
+        self.assertEqual(self.upload(changed)['updated'], SIZE)
+
+    def test_many_batches(self):
+        self.assertEqual(self.upload(list(generate_rows(SIZE)), batch_size=100)['created'], SIZE)
+
+    def test_reads_after_an_uncommitted_import(self):
+        self.upload(list(generate_rows(200)))
+        for query in ('', '?hq=Kenya', '?search=climate', '?search=health&hq=Nepal', '?pagination=cursor'):
+            self.assertEqual(self.client.get(f'/api/partners/{query}').status_code, 200, query)
+        self.assertEqual(self.client.get('/api/hqs/').status_code, 200)
+        self.assertEqual(self.client.get('/api/facets/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/partners/{Partner.objects.first().pk}/').status_code, 200)
+
+
+@override_settings(PARTNER_BULK_MAX_ITEMS=500)
+class BulkBudgetTests(BudgetTestCase):
+    def test_bulk_create_update_delete(self):
+        items = [
+            {'firm_name': f'Firm {i}', 'hq': f'Country {i % 50}', 'sector': f'Sector {i % 7}',
+             'current_partnership_status': 'Active'}
+            for i in range(500)
+        ]
+        response = self.client.post('/api/partners/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        ids = [result['id'] for result in response.json()['results']]
+
+        changes = [{'id': pk, 'hq': f'Region {i % 60}', 'focus_area': 'water'} for i, pk in enumerate(ids)]
+        response = self.client.patch('/api/partners/bulk/', changes, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        response = self.client.delete('/api/partners/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.json()['deleted'], 500)
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from partners import serializers
+from partners.models import Location, Partner, Sector
+
+
+class PartnerWriteTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+
+class LookupCreationTests(PartnerWriteTestCase):
+    def test_invalid_partner_creates_no_lookup_rows(self):
+        response = self.client.post('/api/partners/', {'hq': 'Atlantis', 'sector': 'Myth'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Location.objects.exists())
+        self.assertFalse(Sector.objects.exists())
+
+    def test_invalid_bulk_item_creates_no_lookup_rows(self):
+        response = self.client.post(
+            '/api/partners/bulk/',
+            [{'firm_name': 'Acme', 'hq': 'Atlantis'}, {'hq': 'Lemuria'}],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Location.objects.exists())
+        self.assertFalse(Partner.objects.exists())
+
+    def test_new_names_are_created_on_save(self):
+        response = self.client.post('/api/partners/', {'firm_name': 'Acme', 'hq': ' New   Zealand '}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['hq'], 'New Zealand')
+        response = self.client.patch(f"/api/partners/{response.json()['id']}/", {'hq': 'new zealand'}, format='json')
+        self.assertEqual(response.json()['hq'], 'New Zealand')
+        self.assertEqual(Location.objects.count(), 1)
+
+
+class BulkAtomicityTests(PartnerWriteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.acme = Partner.objects.create(firm_name='Acme', focus_area='water')
+        self.globex = Partner.objects.create(firm_name='Globex', focus_area='energy')
+
+    def test_create_reports_every_invalid_item_and_writes_none(self):
+        response = self.client.post('/api/partners/bulk/', [
+            {'firm_name': 'Initech', 'hq': 'Peru'},
+            {'firm_name': 'Acme'},
+            {'firm_name': 'Hooli'},
+            {'firm_name': 'Hooli'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()), ['1', '3'])
+        self.assertEqual(Partner.objects.count(), 2)
+        self.assertFalse(Location.objects.exists())
+
+    def test_update_with_an_unknown_id_changes_nothing(self):
+        response = self.client.patch('/api/partners/bulk/', [
+            {'id': self.acme.pk, 'focus_area': 'health'},
+            {'id': 999999, 'focus_area': 'health'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ['1'])
+        self.assertIn('id', response.json()['1'])
+        self.acme.refresh_from_db()
+        self.assertEqual(self.acme.focus_area, 'water')
+
+    def test_database_error_rolls_back_the_whole_list(self):
+        resolve = serializers.resolve_lookup_names
+
+        def resolve_then_race(items):
+            resolve(items)
+            # Another request takes a firm name after validation
+            Partner.objects.create(firm_name='Hooli')
+
+        with mock.patch.object(serializers, 'resolve_lookup_names', resolve_then_race):
+            with self.assertRaises(IntegrityError):
+                self.client.post('/api/partners/bulk/', [
+                    {'firm_name': 'Initech', 'hq': 'Peru'},
+                    {'firm_name': 'Hooli', 'sector': 'Tech'},
+                ], format='json')
+        self.assertEqual(set(Partner.objects.values_list('firm_name', flat=True)), {'Acme', 'Globex'})
+        self.assertFalse(Location.objects.exists())
+        self.assertFalse(Sector.objects.exists())
+
+    def test_update_and_delete_apply_to_every_item(self):
+        response = self.client.patch('/api/partners/bulk/', [
+            {'id': self.acme.pk, 'focus_area': 'health', 'hq': 'Peru'},
+            {'id': self.globex.pk, 'firm_name': 'Globex Corp'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(
+            list(Partner.objects.order_by('pk').values_list('firm_name', 'focus_area', 'hq__name')),
+            [('Acme', 'health', 'Peru'), ('Globex Corp', 'energy', None)],
+        )
+
+        response = self.client.delete(
+            '/api/partners/bulk/', {'ids': [self.acme.pk, 999999]}, format='json'
+        )
+        self.assertEqual(response.json()['deleted'], 1)
+        self.assertEqual([item['status'] for item in response.json()['results']], ['deleted', 'not_found'])
+        self.assertEqual(list(Partner.objects.values_list('pk', flat=True)), [self.globex.pk])
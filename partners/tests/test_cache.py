@@ -0,0 +1,136 @@
+from django.core.cache import caches
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from partners.cache import CACHE_ALIAS
+from partners.lookup_tables import LOOKUPS
+from partners.models import Location, Partner, PartnerDataVersion
+from partners.snapshot import store
+from partners.versions import VERSION_PK
+
+
+def make_partner(firm_name, hq=None, **fields):
+    if hq is not None:
+        fields['hq_id'] = LOOKUPS['hq'].id_for(hq)
+    return Partner.objects.create(firm_name=firm_name, **fields)
+
+
+def bump_elsewhere(**changes):
+    """What a write made by another process leaves behind: only the version row moves here."""
+    changes.setdefault('version', F('version') + 1)
+    PartnerDataVersion.objects.filter(pk=VERSION_PK).update(changed=timezone.now(), **changes)
+
+
+class CacheTestCase(TestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client = APIClient()
+
+
+class ListCacheTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.acme = make_partner('Acme', hq='Nepal')
+        make_partner('Globex', hq='Peru')
+
+    def test_repeated_list_is_a_cache_hit_with_one_query(self):
+        first = self.client.get('/api/partners/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):  # the data version
+            second = self.client.get('/api/partners/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get('/api/partners/?hq=Nepal')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/partners/?hq=Nepal', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get('/api/partners/?hq=Peru')['ETag'], etag)
+
+    def test_write_through_the_api_invalidates(self):
+        etag = self.client.get('/api/partners/')['ETag']
+        self.client.patch(f'/api/partners/{self.acme.pk}/', {'focus_area': 'water'}, format='json')
+
+        response = self.client.get('/api/partners/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['focus_area'], 'water')
+
+    def test_write_by_another_process_invalidates(self):
+        etag = self.client.get('/api/partners/')['ETag']
+        Partner.objects.filter(pk=self.acme.pk).update(focus_area='energy')
+        bump_elsewhere()
+
+        response = self.client.get('/api/partners/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['focus_area'], 'energy')
+
+    def test_lookup_rename_by_another_process_refreshes_names(self):
+        self.client.get('/api/partners/')
+        Location.objects.filter(name='Nepal').update(name='Nepal (Federal)')
+        bump_elsewhere(lookup_version=F('lookup_version') + 1)
+
+        results = self.client.get('/api/partners/').json()['results']
+        self.assertEqual(results[0]['hq'], 'Nepal (Federal)')
+
+
+class RetrieveConditionalTests(CacheTestCase):
+    def test_etag_changes_when_the_row_changes(self):
+        partner = make_partner('Acme')
+        url = f'/api/partners/{partner.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Partner.objects.filter(pk=partner.pk).update(updated=timezone.now() + timezone.timedelta(seconds=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FacetsTests(CacheTestCase):
+    def test_facets_revalidate_and_follow_writes(self):
+        make_partner('Acme', hq='Nepal')
+        response = self.client.get('/api/facets/')
+        self.assertEqual(response.json()['hq'], [{'value': 'Nepal', 'count': 1}])
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/facets/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        make_partner('Globex', hq='Nepal')
+        response = self.client.get('/api/facets/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['hq'], [{'value': 'Nepal', 'count': 2}])
+
+        Partner.objects.filter(firm_name='Globex').update(hq=None)
+        bump_elsewhere()
+        self.assertEqual(self.client.get('/api/facets/').json()['hq'], [{'value': 'Nepal', 'count': 1}])
+        self.assertEqual(self.client.get('/api/hqs/').json(), ['Nepal'])
+
+
+@override_settings(PARTNER_SNAPSHOT_ENABLED=True, PARTNER_SNAPSHOT_CHECK_INTERVAL=0)
+class SnapshotListTests(TransactionTestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        # The tables are emptied by a flush, not a rollback, between these tests
+        for cache in LOOKUPS.values():
+            cache.clear()
+        store.clear()
+        PartnerDataVersion.objects.get_or_create(pk=VERSION_PK)
+
+    def tearDown(self):
+        store.clear()
+
+    def test_snapshot_follows_writes_of_other_processes(self):
+        client = APIClient()
+        make_partner('Acme', hq='Nepal')
+        first = client.get('/api/partners/')
+        self.assertEqual([item['firm_name'] for item in first.json()['results']], ['Acme'])
+
+        Partner.objects.filter(firm_name='Acme').update(firm_name='Acme Ltd')
+        bump_elsewhere()
+        response = client.get('/api/partners/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['firm_name'] for item in response.json()['results']], ['Acme Ltd'])
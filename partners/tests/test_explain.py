@@ -0,0 +1,24 @@
+import io
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from partners.management.commands.explain_partner_queries import walks_rowid_order
+from partners.models import Partner
+
+
+class RowidOrderTests(TestCase):
+    def test_only_unfiltered_pages_in_key_order_qualify(self):
+        self.assertTrue(walks_rowid_order(Partner.objects.order_by('id')[:20]))
+        self.assertFalse(walks_rowid_order(Partner.objects.order_by('id')))
+        self.assertFalse(walks_rowid_order(Partner.objects.order_by('firm_name')[:20]))
+        self.assertFalse(walks_rowid_order(Partner.objects.filter(focus_area__icontains='water').order_by('id')[:20]))
+
+    @skipUnless(connection.vendor == 'sqlite', "checks SQLite's plan wording")
+    def test_the_list_page_is_not_reported_as_a_scan(self):
+        out = io.StringIO()
+        call_command('explain_partner_queries', stdout=out, no_color=True)
+        self.assertRegex(out.getvalue(), r'\n  list page +index\n')
+        self.assertRegex(out.getvalue(), r'\n  list \?search= +SEQ SCAN\n')
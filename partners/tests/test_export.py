@@ -0,0 +1,31 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from partners.models import Location, Partner
+
+UPDATED = datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        partner = Partner.objects.create(firm_name='Acme', hq=Location.objects.create(name='Nepal'))
+        Partner.objects.filter(pk=partner.pk).update(updated=UPDATED)
+
+    def export(self, file_format):
+        response = APIClient().get('/api/partners/export/', {'file_format': file_format})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8-sig')
+
+    def test_ndjson_keeps_microseconds_like_csv(self):
+        [line] = self.export('ndjson').splitlines()
+        item = json.loads(line)
+        [row] = csv.DictReader(io.StringIO(self.export('csv')))
+        self.assertEqual((item['firm_name'], item['hq']), ('Acme', 'Nepal'))
+        self.assertEqual(datetime.fromisoformat(item['updated']), UPDATED)
+        self.assertEqual(item['updated'], row['updated'])
+        self.assertEqual(item['created'], row['created'])
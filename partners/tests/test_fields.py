@@ -0,0 +1,63 @@
+import datetime
+import decimal
+import json
+import re
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from partners.cache import CACHE_ALIAS
+from partners.lookup_tables import LOOKUPS
+from partners.models import Partner
+from partners.renderers import ORJSONRenderer
+
+
+class FieldsParamTests(TestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.acme = Partner.objects.create(
+            firm_name='Acme', hq_id=LOOKUPS['hq'].id_for('Nepal'), focus_area='water'
+        )
+
+    def test_only_the_requested_fields_are_returned_and_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/partners/?fields=hq, firm_name&search=acme')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': self.acme.pk, 'firm_name': 'Acme', 'hq': 'Nepal'}])
+        select_lists = [query['sql'].split(' FROM ')[0] for query in queries]
+        columns = [set(re.findall(r'"partners_partner"\."(\w+)"', select)) for select in select_lists]
+        self.assertIn({'id', 'firm_name', 'hq_id'}, columns)
+        self.assertFalse([names for names in columns if 'focus_area' in names])
+
+    def test_unknown_fields_are_a_400(self):
+        response = self.client.get('/api/partners/?fields=firm_name,revenue,bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown field(s): bogus, revenue', response.json()['fields'])
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    data = {
+        'name': 'Açme',
+        'values': [1, 2.5, None, True],
+        'updated': datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2024, 1, 2),
+        'amount': decimal.Decimal('1.10'),
+    }
+
+    def test_output_matches_the_json_renderer(self):
+        rendered = ORJSONRenderer().render(self.data)
+        self.assertEqual(rendered, JSONRenderer().render(self.data))
+        self.assertEqual(json.loads(rendered)['updated'], '2024-01-02T03:04:05.123456Z')
+
+    def test_indented_and_unencodable_output_falls_back(self):
+        indented = 'application/json; indent=2'
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, indented), JSONRenderer().render(self.data, indented)
+        )
+        too_big = {'count': 2 ** 70}  # orjson only encodes 64-bit integers
+        self.assertEqual(ORJSONRenderer().render(too_big), JSONRenderer().render(too_big))
@@ -0,0 +1,25 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from partners.fuzzy import fuzzy_search, similarity
+from partners.models import Partner
+
+NAMES = ['Acme Consulting', 'Acme International Development Holdings', 'Globex']
+
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        Partner.objects.bulk_create([Partner(firm_name=name) for name in NAMES])
+
+    def test_threshold_below_the_pg_trgm_default(self):
+        self.assertLess(similarity('acme', NAMES[1]), 0.3)
+        self.assertEqual(
+            [partner.firm_name for partner in fuzzy_search('acme', threshold=0.1)],
+            NAMES[:2],
+        )
+        self.assertEqual([partner.firm_name for partner in fuzzy_search('acme', threshold=0.3)], NAMES[:1])
+
+    @override_settings(PARTNER_FUZZY_THRESHOLD=0.1)
+    def test_endpoint_uses_the_configured_threshold(self):
+        results = APIClient().get('/api/partners/fuzzy/', {'q': 'acme'}).json()
+        self.assertEqual([item['firm_name'] for item in results], NAMES[:2])
@@ -0,0 +1,95 @@
+from django.test import TestCase
+
+from partners.importer import ImportFormatError, ImportResult, import_rows
+from partners.models import Location, Partner
+
+HEADER = ('Firm Name', 'Headquarters', 'Sector', 'Focus Area')
+
+
+def run_import(*rows, **kwargs):
+    return import_rows([HEADER, *rows], **kwargs)
+
+
+class ImportRowsTests(TestCase):
+    def test_counts_created_updated_unchanged_and_skipped(self):
+        result = run_import(
+            ('Acme', 'Nepal', 'Health', 'water'),
+            ('Globex', 'Peru', None, None),
+        )
+        self.assertEqual(
+            (result.processed, result.created, result.updated, result.unchanged), (2, 2, 0, 0)
+        )
+
+        result = run_import(
+            ('Acme', 'nepal', 'HEALTH', 'water'),  # lookup names match ignoring case
+            ('Globex', 'Chile', None, None),
+            (None, 'Kenya', None, None),
+            ('x' * 300, None, None, None),
+        )
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(result.unchanged, 1)
+        self.assertEqual(
+            result.skipped,
+            [
+                "Row 4: firm_name is missing",
+                "Row 5: Error - firm_name is longer than 255 characters",
+            ],
+        )
+        globex = Partner.objects.get(firm_name='Globex')
+        self.assertEqual(globex.hq.name, 'Chile')
+        self.assertEqual(globex.content_hash, globex.compute_content_hash())
+        self.assertEqual(Partner.objects.count(), 2)
+
+    def test_duplicate_rows_are_merged_with_later_rows_winning(self):
+        result = run_import(
+            ('Acme', 'Nepal', None, 'water'),
+            ('acme', None, 'Health', 'energy'),
+        )
+        self.assertEqual((result.created, result.updated), (1, 0))
+        partner = Partner.objects.get()
+        self.assertEqual(partner.firm_name, 'acme')
+        self.assertEqual((partner.hq.name, partner.sector.name, partner.focus_area), ('Nepal', 'Health', 'energy'))
+
+    def test_empty_cells_keep_stored_values(self):
+        run_import(('Acme', 'Nepal', 'Health', 'water'))
+        result = run_import(('Acme', None, None, 'energy'))
+        self.assertEqual(result.updated, 1)
+        partner = Partner.objects.get()
+        self.assertEqual((partner.hq.name, partner.sector.name, partner.focus_area), ('Nepal', 'Health', 'energy'))
+
+    def test_dry_run_writes_nothing_and_previews_decisions(self):
+        run_import(('Acme', 'Nepal', None, 'water'), ('Globex', 'Peru', None, None))
+        before = list(Partner.objects.order_by('pk').values_list('firm_name', 'focus_area', 'content_hash'))
+
+        result = run_import(
+            ('Acme', 'Nepal', None, 'water'),
+            ('Globex', 'Atlantis', None, None),
+            ('Initech', None, None, None),
+            result=ImportResult(preview=True),
+            dry_run=True,
+        )
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 1))
+        self.assertEqual(result.preview['insert'], [{'firm_name': 'Initech', 'rows': [4]}])
+        self.assertEqual(
+            result.preview['update'],
+            [{'firm_name': 'Globex', 'rows': [3], 'changes': {'hq': ['Peru', 'Atlantis']}}],
+        )
+        self.assertEqual(result.preview['noop'], [{'firm_name': 'Acme', 'rows': [2]}])
+        after = list(Partner.objects.order_by('pk').values_list('firm_name', 'focus_area', 'content_hash'))
+        self.assertEqual(after, before)
+        self.assertFalse(Location.objects.filter(name='Atlantis').exists())
+
+    def test_batches_and_resume(self):
+        rows = [(f'Firm {i}', 'Nepal', None, None) for i in range(7)]
+        progress = []
+        result = run_import(*rows, batch_size=3, on_progress=lambda result, row: progress.append(row))
+        self.assertEqual(result.created, 7)
+        self.assertEqual(progress, [4, 7, 8])
+
+        result = run_import(*rows, skip_rows=5)
+        self.assertEqual((result.processed, result.unchanged), (2, 2))
+
+    def test_missing_firm_name_column(self):
+        with self.assertRaises(ImportFormatError):
+            import_rows([('Headquarters',), ('Nepal',)])
@@ -0,0 +1,195 @@
+import io
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_started
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from partners import jobs
+
+from partners.benchmark import HEADERS, build_workbook, generate_rows
+from partners.jobs import (
+    cancel_job,
+    claim_job,
+    claim_next_job,
+    enqueue_import,
+    find_duplicate_job,
+    purge_job_files,
+    resume_job,
+    run_job,
+    run_worker,
+)
+from partners.models import ImportJob, Partner
+
+
+def workbook(count=10, prefix='Job Partner'):
+    return SimpleUploadedFile('partners.xlsx', build_workbook(generate_rows(count, prefix=prefix)))
+
+
+def multi_sheet_workbook(count=5):
+    book = Workbook(write_only=True)
+    for prefix in ('First', 'Second'):
+        sheet = book.create_sheet(prefix)
+        sheet.append(HEADERS)
+        for row in generate_rows(count, prefix=prefix):
+            sheet.append(row)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    return SimpleUploadedFile('partners.xlsx', buffer.getvalue())
+
+
+class JobTestCase(TestCase):
+    def enqueue(self, count=10, prefix='Job Partner'):
+        return enqueue_import(workbook(count, prefix))
+
+
+class ClaimTests(JobTestCase):
+    def test_a_job_is_claimed_once(self):
+        job = self.enqueue()
+        self.assertTrue(claim_job(job.pk))
+        self.assertFalse(claim_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.RUNNING)
+        self.assertIsNotNone(job.heartbeat)
+
+    def test_the_oldest_queued_job_is_claimed_first(self):
+        first = self.enqueue(prefix='First')
+        second = self.enqueue(prefix='Second')
+        cancel_job(first)
+        third = self.enqueue(prefix='Third')
+        self.assertEqual([claim_next_job(), claim_next_job(), claim_next_job()], [second.pk, third.pk, None])
+
+
+@override_settings(PARTNER_IMPORT_BATCH_SIZE=4)
+class ResumeTests(JobTestCase):
+    def test_cancelled_job_resumes_after_its_checkpoint(self):
+        job = self.enqueue()
+        claim_job(job.pk)
+        ImportJob.objects.filter(pk=job.pk).update(cancel_requested=True)
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_read, job.created_count), (ImportJob.CANCELLED, 4, 4))
+        self.assertEqual(Partner.objects.count(), 4)
+
+        job = resume_job(job)
+        self.assertEqual(job.status, ImportJob.QUEUED)
+        self.assertTrue(claim_job(job.pk))
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(
+            (job.status, job.rows_read, job.processed, job.created_count, job.unchanged_count),
+            (ImportJob.SUCCEEDED, 10, 10, 10, 0),
+        )
+        self.assertEqual(Partner.objects.count(), 10)
+
+    @override_settings(PARTNER_IMPORT_PARSE_WORKERS=1)
+    def test_multi_source_job_is_cancelled_after_a_batch(self):
+        job = enqueue_import(multi_sheet_workbook())
+        claim_job(job.pk)
+        save_progress = jobs._save_progress
+
+        def cancel_once_written(job_id, result, *args, **kwargs):
+            save_progress(job_id, result, *args, **kwargs)
+            if result.created and not kwargs:
+                ImportJob.objects.filter(pk=job_id).update(cancel_requested=True)
+
+        with mock.patch.object(jobs, '_save_progress', cancel_once_written):
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.created_count), (ImportJob.CANCELLED, 10, 4))
+        self.assertEqual(Partner.objects.count(), 4)
+
+    def test_stalled_job_is_requeued_by_the_worker(self):
+        job = self.enqueue()
+        claim_job(job.pk)
+        stalled = timezone.now() - timedelta(hours=1)
+        ImportJob.objects.filter(pk=job.pk).update(heartbeat=stalled, rows_read=4)
+        run_worker(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count), (ImportJob.SUCCEEDED, 6))
+
+    def test_running_job_is_not_resumed(self):
+        job = self.enqueue()
+        claim_job(job.pk)
+        self.assertEqual(resume_job(job).status, ImportJob.RUNNING)
+
+
+class InProcessTests(JobTestCase):
+    def test_first_request_starts_the_thread_pool_once(self):
+        request_started.connect(jobs._start_on_first_request, dispatch_uid='partners_start_import_jobs')
+        with mock.patch.object(jobs, '_get_executor') as get_executor, \
+                override_settings(PARTNER_IMPORT_RUN_IN_PROCESS=True):
+            self.client.get('/api/import-jobs/')
+            self.client.get('/api/import-jobs/')
+        get_executor.assert_called_once_with()
+
+
+class JobFileTests(JobTestCase):
+    def test_file_is_deleted_when_the_job_succeeds(self):
+        job = self.enqueue()
+        path = job.file.path
+        claim_job(job.pk)
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.SUCCEEDED)
+        self.assertFalse(job.file)
+        self.assertFalse(os.path.exists(path))
+
+    def test_files_of_old_failed_jobs_are_purged(self):
+        old, recent = self.enqueue(prefix='Old'), self.enqueue(prefix='Recent')
+        ImportJob.objects.filter(pk=old.pk).update(
+            status=ImportJob.FAILED, finished=timezone.now() - timedelta(days=30)
+        )
+        ImportJob.objects.filter(pk=recent.pk).update(status=ImportJob.FAILED, finished=timezone.now())
+        path = old.file.path
+        purge_job_files()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(resume_job(old).status, ImportJob.FAILED)
+        self.assertEqual(resume_job(recent).status, ImportJob.QUEUED)
+        self.assertIsNone(find_duplicate_job(old.file_sha256))
+        response = APIClient().post(f'/api/import-jobs/{old.pk}/resume/')
+        self.assertEqual(response.status_code, 409)
+
+
+class DuplicateJobTests(JobTestCase):
+    def setUp(self):
+        # Built once: openpyxl stamps every workbook it saves with the time
+        self.payload = build_workbook(generate_rows(10, prefix='Job Partner'))
+
+    def upload(self):
+        response = APIClient().post(
+            '/api/upload-excel/?background=1',
+            {'file': SimpleUploadedFile('partners.xlsx', self.payload)},
+            format='multipart',
+        )
+        self.assertLess(response.status_code, 300, response.content)
+        return response.json()
+
+    def test_same_file_reuses_the_job(self):
+        first = self.upload()
+        second = self.upload()
+        self.assertEqual(second['job_id'], first['job_id'])
+        self.assertTrue(second['duplicate'])
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+    def test_failed_job_is_resumed_and_cancelled_job_replaced(self):
+        job = ImportJob.objects.get(pk=self.upload()['job_id'])
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.FAILED, finished=timezone.now())
+        self.assertEqual(find_duplicate_job(job.file_sha256), job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.QUEUED)
+
+        cancel_job(job)
+        self.assertNotEqual(self.upload()['job_id'], job.pk)
+
+    def test_succeeded_job_is_reused_without_its_file(self):
+        job = ImportJob.objects.get(pk=self.upload()['job_id'])
+        claim_job(job.pk)
+        run_job(job.pk)
+        self.assertEqual(find_duplicate_job(job.file_sha256), job)
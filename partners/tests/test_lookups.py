@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from partners.importer import import_rows
+from partners.lookup_tables import LOOKUPS
+from partners.models import Location, Partner, content_hash
+
+
+class LookupRenameTests(TestCase):
+    def test_rename_restamps_partners(self):
+        nepal = Location.objects.create(name='Nepal')
+        partner = Partner.objects.create(firm_name='Acme', hq=nepal, focus_area='water')
+        other = Partner.objects.create(firm_name='Globex')
+        client = APIClient()
+        etag = client.get(f'/api/partners/{partner.pk}/')['ETag']
+
+        nepal.name = 'Federal Democratic Republic of Nepal'
+        nepal.save()
+
+        partner.refresh_from_db()
+        self.assertEqual(
+            partner.content_hash,
+            content_hash({'firm_name': 'Acme', 'hq': nepal.name, 'focus_area': 'water'}),
+        )
+        self.assertEqual(client.get(f'/api/partners/{partner.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(Partner.objects.get(pk=other.pk).updated, other.updated)
+
+
+class LookupNamingTests(TestCase):
+    def test_new_rows_are_named_without_a_query_per_row(self):
+        import_rows([
+            ('Firm Name', 'Headquarters', 'Sector', 'Current Partnership Status'),
+            *[(f'Firm {i}', f'Country {i}', f'Sector {i}', f'Status {i}') for i in range(10)],
+        ])
+        client = APIClient()
+        with self.assertNumQueries(3):  # data version, count, page
+            results = client.get('/api/partners/?page_size=10').json()['results']
+        self.assertEqual([item['hq'] for item in results], [f'Country {i}' for i in range(10)])
+
+    def test_rows_created_by_another_process_are_read_once_per_response(self):
+        for cache in LOOKUPS.values():
+            cache.name(0)  # load the tables before the rows exist
+        locations = Location.objects.bulk_create([Location(name=f'Country {i}') for i in range(10)])
+        Partner.objects.bulk_create([Partner(firm_name=f'Firm {i}', hq=hq) for i, hq in enumerate(locations)])
+
+        with self.assertNumQueries(4):  # data version, count, page, the new hq names
+            results = APIClient().get('/api/partners/?page_size=10').json()['results']
+        self.assertEqual([item['hq'] for item in results], [f'Country {i}' for i in range(10)])
+
+
+class LookupCacheTests(TestCase):
+    def test_rows_of_a_rolled_back_transaction_are_forgotten(self):
+        cache = LOOKUPS['hq']
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            pk = cache.id_for('Atlantis')
+            self.assertEqual(cache.name(pk), 'Atlantis')
+            raise RuntimeError
+        self.assertEqual(cache.resolve(['Atlantis'], create=False), {})
+        self.assertIsNone(cache.name(pk))
+
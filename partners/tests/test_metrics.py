@@ -0,0 +1,53 @@
+import json
+import re
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.metrics import registry
+from partners.cache import CACHE_ALIAS
+from partners.models import Partner
+
+
+@override_settings(PERF_METRICS_ENABLED=True)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        # A new client loads the middleware again, now that the setting is on
+        self.client = APIClient()
+        Partner.objects.create(firm_name='Acme')
+
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = self.client.get('/api/partners/?search=acme')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, ')
+        self.assertIn('serializer;dur=', timing)
+        queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+        self.assertGreater(queries, 0)
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(
+            (record['route'], record['status'], record['db_queries']), ('api/partners/', 200, queries)
+        )
+
+    def test_metrics_endpoint_renders_the_registry(self):
+        self.client.get('/api/partners/')
+        self.client.get('/api/partners/')
+        response = self.client.get('/api/_metrics')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        labels = 'method="GET",route="api/partners/"'
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2\n', text)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2\n', text)
+        self.assertRegex(text, rf'http_request_db_queries_total{{{labels}}} \d+\n')
+        self.assertRegex(text, rf'http_request_stage_seconds_total{{{labels},stage="serializer"}} [\d.]+\n')
+        self.assertRegex(text, rf'http_request_duration_window_seconds{{{labels},quantile="0.95"}} [\d.]+\n')
+
+    @override_settings(PERF_METRICS_ENABLED=False)
+    def test_metrics_endpoint_is_hidden_when_disabled(self):
+        self.assertEqual(APIClient().get('/api/_metrics').status_code, 404)
+        self.assertNotIn('Server-Timing', APIClient().get('/api/partners/'))
@@ -0,0 +1,46 @@
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from partners.cache import CACHE_ALIAS
+from partners.models import Partner
+
+NAMES = ['Delta', 'Alpha', 'Echo', 'Charlie', 'Bravo']
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.partners = [Partner.objects.create(firm_name=name) for name in NAMES]
+
+    def walk(self, url):
+        """Follow the next links from ``url``; returns the pages' firm names and the last page."""
+        pages = []
+        while url:
+            payload = self.client.get(url).json()
+            self.assertNotIn('count', payload)
+            pages.append([item['firm_name'] for item in payload['results']])
+            url, last = payload['next'], payload
+        return pages, last
+
+    def test_pages_follow_the_id_order(self):
+        pages, last = self.walk('/api/partners/?pagination=cursor&page_size=2')
+        self.assertEqual(pages, [['Delta', 'Alpha'], ['Echo', 'Charlie'], ['Bravo']])
+
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([item['firm_name'] for item in previous['results']], ['Echo', 'Charlie'])
+        self.assertIsNotNone(previous['previous'])
+
+    def test_cursor_ordering_by_firm_name(self):
+        pages, _ = self.walk('/api/partners/?pagination=cursor&page_size=2&cursor_ordering=firm_name')
+        self.assertEqual(pages, [['Alpha', 'Bravo'], ['Charlie', 'Delta'], ['Echo']])
+
+    def test_unknown_cursor_ordering_falls_back_to_id(self):
+        pages, _ = self.walk('/api/partners/?pagination=cursor&page_size=5&cursor_ordering=created')
+        self.assertEqual(pages, [NAMES])
+
+    def test_page_numbers_stay_the_default(self):
+        payload = self.client.get('/api/partners/?page_size=2&page=2').json()
+        self.assertEqual(payload['count'], 5)
+        self.assertEqual([item['firm_name'] for item in payload['results']], ['Echo', 'Charlie'])
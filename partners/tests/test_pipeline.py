@@ -0,0 +1,95 @@
+import glob
+import io
+import os
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from openpyxl import Workbook
+
+from partners.models import Partner
+from partners.pipeline import import_sources
+
+HEADER = ('Firm Name', 'Headquarters', 'Focus Area')
+
+
+def workbook(**sheets):
+    book = Workbook()
+    book.remove(book.active)
+    for title, rows in sheets.items():
+        sheet = book.create_sheet(title)
+        for row in (HEADER, *rows):
+            sheet.append(row)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    return buffer.getvalue()
+
+
+def csv_bytes(*rows):
+    return '\n'.join(','.join(row) for row in (HEADER, *rows)).encode()
+
+
+def archive(**members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zipped:
+        for name, payload in members.items():
+            zipped.writestr(name, payload)
+    return buffer.getvalue()
+
+
+def copies():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), 'partner-source-*')))
+
+
+@override_settings(PARTNER_IMPORT_PARSE_WORKERS=1)
+class ImportSourcesTests(TestCase):
+    def test_sheets_and_archive_members_are_imported_per_source(self):
+        before = copies()
+        files = [
+            SimpleUploadedFile('book.xlsx', workbook(
+                First=[('Acme', 'Nepal', 'water')],
+                Second=[('Globex', 'Peru', 'energy'), ('Acme', 'Nepal', 'health')],
+            )),
+            SimpleUploadedFile('more.zip', archive(**{
+                'a.csv': csv_bytes(('Initech', 'Chile', 'finance')),
+                'notes.txt': b'ignored',
+                'broken.xlsx': b'not a workbook',
+            })),
+        ]
+        result = import_sources(files)
+
+        reports = {report['source']: report for report in result.reports}
+        self.assertEqual(
+            {name: (report['created'], report['duplicates']) for name, report in reports.items() if 'error' not in report},
+            {'book.xlsx [First]': (0, 1), 'book.xlsx [Second]': (2, 0), 'more.zip/a.csv': (1, 0)},
+        )
+        self.assertIn('Cannot read workbook', reports['more.zip/broken.xlsx']['error'])
+        self.assertEqual(result.created, 3)
+        self.assertEqual(Partner.objects.get(firm_name='Acme').focus_area, 'health')
+        self.assertEqual(copies(), before)
+
+    def test_source_counts_only_include_written_firms(self):
+        save = Partner.save
+
+        def save_unless_globex(partner, *args, **kwargs):
+            if partner.firm_name == 'Globex':
+                raise ValueError('disk full')
+            return save(partner, *args, **kwargs)
+
+        files = [SimpleUploadedFile('book.xlsx', workbook(
+            First=[('Acme', 'Nepal', 'water'), ('Globex', 'Peru', 'energy')],
+            Second=[('Globex', 'Peru', 'mining')],
+        ))]
+        # The bulk insert fails, so the batch is retried row by row
+        with mock.patch.object(Partner.objects, 'bulk_create', side_effect=ValueError('deadlock')), \
+                mock.patch.object(Partner, 'save', save_unless_globex):
+            result = import_sources(files)
+
+        self.assertEqual(
+            [(report['created'], report['duplicates'], report['skipped']) for report in result.reports],
+            [(1, 0, ['Row 3: Error - disk full']), (0, 0, ['Row 2: Error - disk full'])],
+        )
+        self.assertEqual((result.created, result.processed), (1, 1))
+        self.assertEqual(list(Partner.objects.values_list('firm_name', flat=True)), ['Acme'])
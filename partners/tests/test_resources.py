@@ -0,0 +1,62 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from tablib import Dataset
+
+from partners.lookup_tables import LOOKUPS
+from partners.models import Location, Partner
+from partners.resources import PartnerResource
+
+HEADERS = ['firm_name', 'hq', 'focus_area', 'contact', 'donor_experience', 'current_partnership_status', 'sector']
+
+
+def dataset(*rows):
+    return Dataset(*[row + (None,) * (len(HEADERS) - len(row)) for row in rows], headers=HEADERS)
+
+
+def import_types(result):
+    return [row.import_type for row in result.rows]
+
+
+class PartnerResourceTests(TestCase):
+    def setUp(self):
+        self.acme = Partner.objects.create(firm_name='Acme', hq_id=LOOKUPS['hq'].id_for('Nepal'), focus_area='water')
+        self.globex = Partner.objects.create(firm_name='Globex', focus_area='energy')
+
+    def import_data(self, data):
+        return PartnerResource().import_data(data, dry_run=False, raise_errors=True)
+
+    def test_partners_and_lookup_names_are_loaded_once_per_dataset(self):
+        rows = [(f'Firm {i}', 'peru', 'health') for i in range(20)]
+        with CaptureQueriesContext(connection) as queries:
+            result = self.import_data(dataset(('ACME', 'nepal', 'sanitation'), ('globex', 'Chile'), *rows))
+        self.assertEqual(import_types(result), ['update', 'update'] + ['new'] * 20)
+
+        partner_selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT "partners_partner"')]
+        self.assertEqual(len(partner_selects), 1)
+        location_inserts = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('INSERT') and 'INTO "partners_location"' in query['sql']
+        ]
+        self.assertEqual(len(location_inserts), 1)
+
+        self.acme.refresh_from_db()
+        self.assertEqual((self.acme.firm_name, self.acme.hq.name, self.acme.focus_area), ('ACME', 'Nepal', 'sanitation'))
+        self.assertEqual(sorted(Location.objects.values_list('name', flat=True)), ['Chile', 'Nepal', 'peru'])
+        self.assertEqual(Partner.objects.filter(hq__name='peru').count(), 20)
+
+    def test_unchanged_rows_are_skipped(self):
+        # Empty cells match NULL columns
+        result = self.import_data(dataset(('Acme', 'Nepal', 'water'), ('Globex', '', 'energy')))
+        self.assertEqual(import_types(result), ['skip', 'skip'])
+
+        result = self.import_data(dataset(('Acme', 'Nepal', 'water'), ('Globex', None, 'mining')))
+        self.assertEqual(import_types(result), ['skip', 'update'])
+        self.globex.refresh_from_db()
+        self.assertEqual(self.globex.focus_area, 'mining')
+
+    def test_a_firm_repeated_in_the_file_is_created_once(self):
+        result = self.import_data(dataset(('Initech', 'Peru', 'finance'), ('initech', 'Peru', 'software')))
+        self.assertEqual(import_types(result)[0], 'new')
+        partner = Partner.objects.get(firm_name__iexact='initech')
+        self.assertEqual(partner.focus_area, 'software')
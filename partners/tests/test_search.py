@@ -0,0 +1,50 @@
+from unittest import skipUnless
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from partners.cache import CACHE_ALIAS
+from partners.models import Partner
+from partners.search import build_prefix_query
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client = APIClient()
+        # Created in the reverse of their rank for "water", so id order differs
+        Partner.objects.create(firm_name='Initech', donor_experience='Waterworks grants')
+        Partner.objects.create(firm_name='Globex', focus_area='water supply')
+        Partner.objects.create(firm_name='Water Aid', focus_area='sanitation')
+        Partner.objects.create(firm_name='Umbrella', focus_area='health')
+
+    def search(self, **params):
+        results = self.client.get('/api/partners/', params).json()['results']
+        return [item['firm_name'] for item in results]
+
+
+class SearchTests(SearchTestCase):
+    def test_contains_mode_keeps_the_id_order(self):
+        self.assertEqual(self.search(search='water', search_mode='contains'), ['Initech', 'Globex', 'Water Aid'])
+
+    def test_a_query_without_words_is_none(self):
+        self.assertIsNone(build_prefix_query(['!!', '--']))
+
+
+@skipUnless(connection.vendor == 'postgresql', "full-text search needs PostgreSQL")
+class RankedSearchTests(SearchTestCase):
+    def test_results_are_ordered_by_field_weight(self):
+        # firm_name weighs more than focus_area, which weighs more than donor_experience
+        self.assertEqual(self.search(search='water'), ['Water Aid', 'Globex', 'Initech'])
+
+    def test_every_word_is_a_prefix_and_all_must_match(self):
+        self.assertEqual(self.search(search='WAT'), ['Water Aid', 'Globex', 'Initech'])
+        self.assertEqual(self.search(search='water sup'), ['Globex'])
+        self.assertEqual(self.search(search='water, "health"'), [])
+
+    def test_lookup_names_are_searchable(self):
+        partner = Partner.objects.get(firm_name='Umbrella')
+        self.client.patch(f'/api/partners/{partner.pk}/', {'hq': 'Waterloo'}, format='json')
+        self.assertEqual(self.search(search='waterloo'), ['Umbrella'])
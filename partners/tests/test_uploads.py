@@ -0,0 +1,83 @@
+import hashlib
+import os
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from partners.benchmark import build_workbook, generate_rows
+from partners.models import ImportJob, UploadSession
+
+CHUNK_SIZE = 1024
+
+
+@override_settings(PARTNER_UPLOAD_CHUNK_SIZE=CHUNK_SIZE)
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.data = build_workbook(generate_rows(50, prefix='Upload Partner'))
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+
+    def open(self, sha256=None):
+        return self.client.post('/api/uploads/', {
+            'original_name': 'partners.xlsx', 'size': len(self.data), 'sha256': sha256 or self.sha256,
+        })
+
+    def put(self, pk, offset, data, **headers):
+        return self.client.put(
+            f'/api/uploads/{pk}/chunk/?offset={offset}', data,
+            content_type='application/octet-stream', headers=headers,
+        )
+
+    def send(self, pk, start=0):
+        for offset in range(start, len(self.data), CHUNK_SIZE):
+            response = self.put(pk, offset, self.data[offset:offset + CHUNK_SIZE])
+            self.assertEqual(response.status_code, 200, response.content)
+
+    def complete(self, pk):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/api/uploads/{pk}/complete/')
+
+    def test_upload_resumes_at_the_received_offset(self):
+        pk = self.open().json()['id']
+        self.put(pk, 0, self.data[:CHUNK_SIZE])
+        self.put(pk, CHUNK_SIZE, self.data[CHUNK_SIZE:2 * CHUNK_SIZE])
+
+        reopened = self.open()
+        self.assertEqual(reopened.status_code, 200)
+        self.assertEqual((reopened.json()['id'], reopened.json()['received']), (pk, 2 * CHUNK_SIZE))
+        gap = self.put(pk, 3 * CHUNK_SIZE, self.data[3 * CHUNK_SIZE:4 * CHUNK_SIZE])
+        self.assertEqual((gap.status_code, gap.json()['received']), (409, 2 * CHUNK_SIZE))
+
+        self.send(pk, start=CHUNK_SIZE)  # repeats the second chunk
+        response = self.complete(pk)
+        self.assertEqual(response.status_code, 202, response.content)
+        job = ImportJob.objects.get(pk=response.json()['job_id'])
+        with job.file.open('rb') as file:
+            self.assertEqual(file.read(), self.data)
+        self.assertEqual(job.file_sha256, self.sha256)
+        self.assertFalse(os.path.exists(UploadSession.objects.get(pk=pk).part_path))
+
+        self.assertEqual(self.complete(pk).json()['job_id'], job.pk)
+        duplicate = self.open()
+        self.assertEqual((duplicate.json()['job_id'], duplicate.json()['duplicate']), (job.pk, True))
+
+    def test_corrupted_chunk_is_rejected(self):
+        pk = self.open().json()['id']
+        response = self.put(pk, 0, self.data[:CHUNK_SIZE], X_Chunk_SHA256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/uploads/{pk}/').json()['received'], 0)
+
+    def test_file_checksum_mismatch_restarts_the_upload(self):
+        pk = self.open(sha256='0' * 64).json()['id']
+        self.send(pk)
+        response = self.complete(pk)
+        self.assertEqual((response.status_code, response.json()['received']), (400, 0))
+        session = self.client.get(f'/api/uploads/{pk}/').json()
+        self.assertEqual((session['received'], session['status']), (0, UploadSession.OPEN))
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_incomplete_upload_cannot_complete(self):
+        pk = self.open().json()['id']
+        self.put(pk, 0, self.data[:CHUNK_SIZE])
+        response = self.complete(pk)
+        self.assertEqual((response.status_code, response.json()['received']), (409, CHUNK_SIZE))
@@ -0,0 +1,164 @@
+# uploads.py
+"""
+Chunked, resumable uploads of large spreadsheets.
+
+A client opens an ``UploadSession`` with the file name, size and sha256,
+PUTs the bytes in chunks at increasing offsets and then completes the
+session. Completing checks the whole file against the declared sha256 and
+queues it as an ImportJob. Chunks are written straight into a part file in
+``PARTNER_UPLOAD_DIR``, so a client that lost its connection asks for the
+session's offset and continues from there. Sending a chunk again is
+harmless, and completing twice returns the same job.
+
+A file whose sha256 matches an earlier import job is neither uploaded nor
+imported again: opening the session returns that job instead.
+"""
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import enqueue_import, find_duplicate_job
+from .models import UploadSession
+from .pipeline import ARCHIVE_EXTENSIONS, SPREADSHEET_EXTENSIONS
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(ValueError):
+    """A chunk or completion that does not fit the session; ``status`` is the HTTP status."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def get_chunk_size():
+    return getattr(settings, 'PARTNER_UPLOAD_CHUNK_SIZE', 2 * 1024 * 1024)
+
+
+def _remove_part(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired():
+    """Delete open sessions untouched for PARTNER_UPLOAD_EXPIRY seconds, and their parts."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'PARTNER_UPLOAD_EXPIRY', 24 * 60 * 60))
+    expired = list(UploadSession.objects.filter(status=UploadSession.OPEN, updated__lt=cutoff))
+    for session in expired:
+        _remove_part(session.part_path)
+    UploadSession.objects.filter(pk__in=[session.pk for session in expired]).delete()
+
+
+def open_session(original_name, size, sha256):
+    """
+    Start an upload, or pick up the open one for the same file. Returns
+    ``(session, None)``, or ``(None, job)`` when the file was imported before.
+    """
+    sha256 = sha256.lower()
+    if not original_name.lower().endswith(SPREADSHEET_EXTENSIONS + ARCHIVE_EXTENSIONS):
+        raise UploadError("Invalid file type. Only Excel, CSV or zip files allowed.")
+    if not SHA256_RE.match(sha256):
+        raise UploadError("sha256 must be 64 hexadecimal characters")
+    max_bytes = settings.PARTNER_UPLOAD_MAX_BYTES
+    if not 0 < size <= max_bytes:
+        raise UploadError(f"size must be between 1 and {max_bytes} bytes", status=413 if size > 0 else 400)
+
+    purge_expired()
+    job = find_duplicate_job(sha256)
+    if job is not None:
+        return None, job
+
+    session = UploadSession.objects.filter(status=UploadSession.OPEN, sha256=sha256, size=size).first()
+    if session is None:
+        session = UploadSession.objects.create(original_name=original_name, size=size, sha256=sha256)
+    if not os.path.exists(session.part_path):
+        os.makedirs(os.path.dirname(session.part_path), exist_ok=True)
+        open(session.part_path, 'wb').close()
+        if session.received:
+            UploadSession.objects.filter(pk=session.pk).update(received=0)
+            session.received = 0
+    return session, None
+
+
+def _locked(session_id):
+    try:
+        return UploadSession.objects.select_for_update().get(pk=session_id)
+    except UploadSession.DoesNotExist:
+        raise UploadError("Upload not found", status=404)
+
+
+def write_chunk(session_id, offset, data, chunk_sha256=None):
+    """
+    Store ``data`` at ``offset`` of the part file. The offset may repeat
+    bytes already received but not leave a gap. Returns the session.
+    """
+    if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+        raise UploadError("Chunk checksum mismatch")
+    with transaction.atomic():
+        session = _locked(session_id)
+        if session.status != UploadSession.OPEN:
+            raise UploadError("Upload is already complete", status=409, offset=session.received)
+        if offset > session.received:
+            raise UploadError(f"Expected offset {session.received}", status=409, offset=session.received)
+        if offset + len(data) > session.size:
+            raise UploadError("Chunk goes past the declared size")
+        with open(session.part_path, 'r+b') as part:
+            part.seek(offset)
+            part.write(data)
+            part.flush()
+            os.fsync(part.fileno())
+        if offset + len(data) > session.received:
+            session.received = offset + len(data)
+            session.save(update_fields=['received', 'updated'])
+    return session
+
+
+def _part_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for chunk in iter(lambda: part.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def complete_upload(session_id):
+    """Verify the uploaded file and queue its import. Returns the session (with ``job``)."""
+    with transaction.atomic():
+        session = _locked(session_id)
+        if session.status == UploadSession.COMPLETE:
+            return session
+        if session.received != session.size:
+            raise UploadError(
+                f"Upload incomplete: {session.received} of {session.size} bytes received",
+                status=409, offset=session.received,
+            )
+        if _part_sha256(session.part_path) == session.sha256:
+            return _queue_import(session)
+        # Some chunk was corrupted; the client has to send the file again.
+        # Raised after the block so that the reset is committed.
+        session.received = 0
+        session.save(update_fields=['received', 'updated'])
+    raise UploadError("File checksum mismatch, upload the file again", offset=0)
+
+
+def _queue_import(session):
+    job = find_duplicate_job(session.sha256)
+    if job is None:
+        with open(session.part_path, 'rb') as part:
+            job = enqueue_import(File(part, name=session.original_name), sha256=session.sha256)
+    session.status = UploadSession.COMPLETE
+    session.job = job
+    session.save(update_fields=['status', 'job', 'updated'])
+    path = session.part_path
+    transaction.on_commit(lambda: _remove_part(path))
+    return session
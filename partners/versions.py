@@ -0,0 +1,87 @@
+# versions.py
+"""
+The partner data version shared by every process.
+
+``PartnerDataVersion`` is a single row. Each ``partners_changed`` bumps its
+``version`` (and ``changed``) inside the writing transaction, and renaming
+or deleting a lookup row bumps ``lookup_version``. Whatever a process
+derives from the partners table is keyed on it: the list response cache
+(cache.py), list ETags (conditional.py), the facets (facets.py) and the
+partner snapshot (snapshot.py). Because the row lives in the database, a
+write made by any worker is seen by all of them on their next request,
+whatever cache backend is configured.
+
+Readers take the version before the rows, so the rows are at least as new
+as the version they are cached under.
+"""
+import threading
+from typing import NamedTuple
+
+from django.db.models import F
+from django.db.models.functions import Now
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .lookup_tables import LOOKUPS
+from .models import PartnerDataVersion
+from .signals import partners_changed
+
+VERSION_PK = 1
+
+_lookups_lock = threading.Lock()
+_lookup_version = None  # lookup_version the in-memory lookup caches were filled at
+
+
+class DataVersion(NamedTuple):
+    version: int
+    lookup_version: int
+    changed: object  # datetime of the last bump, None before the first
+
+    @property
+    def key(self):
+        """
+        Token for cache keys and ETags. It includes the bump time so that a
+        version number reused after a rolled-back write never matches
+        entries computed inside that transaction.
+        """
+        stamp = int(self.changed.timestamp() * 1_000_000) if self.changed else 0
+        return f"{self.version}.{stamp}"
+
+
+def _check_lookups(lookup_version):
+    """Drop the lookup caches when lookup rows changed since they were filled."""
+    global _lookup_version
+    with _lookups_lock:
+        stale = _lookup_version is not None and _lookup_version != lookup_version
+        _lookup_version = lookup_version
+    if stale:
+        for cache in LOOKUPS.values():
+            cache.clear()
+
+
+def read_version():
+    """The current ``DataVersion``, with one query."""
+    row = (
+        PartnerDataVersion.objects.filter(pk=VERSION_PK)
+        .values_list('version', 'lookup_version', 'changed').first()
+    )
+    version = DataVersion(*row) if row else DataVersion(0, 0, None)
+    _check_lookups(version.lookup_version)
+    return version
+
+
+def _bump(**changes):
+    changes['changed'] = Now()
+    if not PartnerDataVersion.objects.filter(pk=VERSION_PK).update(**changes):
+        PartnerDataVersion.objects.get_or_create(
+            pk=VERSION_PK, defaults={'version': 1, 'lookup_version': 1, 'changed': timezone.now()}
+        )
+
+
+def bump_lookup_version():
+    _bump(lookup_version=F('lookup_version') + 1)
+
+
+@receiver(partners_changed)
+def bump_version(**kwargs):
+    _bump(version=F('version') + 1)
@@ -1,125 +1,408 @@
+import io
+import zipfile
+
+from django.core.files.base import ContentFile
 from django.shortcuts import render
 from rest_framework import viewsets, filters
 from rest_framework.permissions import AllowAny
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.reverse import reverse
+from rest_framework.decorators import action, api_view, permission_classes
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Partner
+from .models import ImportJob, Partner, UploadSession
+from .pagination import PartnerPagination
 from .resources import PartnerResource
+from .importer import ImportFormatError, ImportResult, import_rows, iter_rows
+from .jobs import cancel_job, enqueue_import, file_sha256, find_duplicate_job, resume_job
+from .pipeline import ARCHIVE_EXTENSIONS, SPREADSHEET_EXTENSIONS, import_sources, is_multi_source
+from django.conf import settings
 from django.contrib import messages
-from .serializers import PartnerSerializer
-import pandas as pd
+from django.db import transaction
+from .serializers import (
+    ImportJobSerializer,
+    PartnerBulkDeleteSerializer,
+    PartnerBulkSerializer,
+    PartnerSerializer,
+    UploadSessionSerializer,
+)
+from .search import PartnerSearchFilter
+from .signals import notify_once
+from .filters import PartnerFilter
+from .fuzzy import fuzzy_search
+from .facets import get_facets
+from .conditional import ConditionalGetMixin
+from .cache import CachedListMixin, get_stats
+from .export import CONTENT_TYPES, STREAMERS
+from .listing import ValuesListMixin
+from core.metrics import query_budget
+from .renderers import ORJSONRenderer
+from .uploads import UploadError, complete_upload, get_chunk_size, open_session, write_chunk
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework import status
 from tablib import Dataset
-from django.http import HttpResponse
-
-# Custom Pagination Class
-class PartnerPagination(PageNumberPagination):
-    page_size = 5                
-    page_size_query_param = "page_size"  
-    max_page_size = 100
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import condition
 
-class PartnerViewSet(viewsets.ModelViewSet):
+# Worst cases: cold caches, new hq/sector/status names, a snapshot reload (SQLite also counts BEGIN/COMMIT)
+@query_budget(
+    list=6, retrieve=5, create=18, update=19, partial_update=19, destroy=4, export=2, bulk=15, fuzzy=5,
+)
+class PartnerViewSet(ConditionalGetMixin, CachedListMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Partner.objects.all().order_by("id")
     serializer_class = PartnerSerializer
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ["hq"]
+    filter_backends = [DjangoFilterBackend, PartnerSearchFilter]
+    filterset_class = PartnerFilter
     search_fields = [
-        "firm_name", "hq", "focus_area",
-        "contact", "donor_experience", "current_partnership_status"
+        "firm_name", "hq__name", "focus_area",
+        "contact", "donor_experience", "current_partnership_status__name"
     ]
     pagination_class = PartnerPagination   # pagination add
 
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream every partner matching the list filters and search:
+        /api/partners/export/?file_format=csv|ndjson|xlsx&hq=...&search=...
+        """
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in STREAMERS:
+            return Response(
+                {"error": f"Unsupported file_format. Use one of: {', '.join(STREAMERS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(STREAMERS[file_format](queryset), content_type=CONTENT_TYPES[file_format])
+        response["Content-Disposition"] = f'attachment; filename="partners.{file_format}"'
+        return response
+
+    @action(detail=False, methods=["post", "patch", "delete"])
+    def bulk(self, request):
+        """
+        Many partners in one request and one transaction: /api/partners/bulk/
+        POST a list of partners, PATCH a list of {"id": ..., <changed fields>},
+        DELETE {"ids": [...]}. An invalid item rejects the whole list with
+        per-item errors; otherwise every item gets a result.
+        """
+        if request.method == "DELETE":
+            serializer = PartnerBulkDeleteSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+            with transaction.atomic(), notify_once():
+                existing = set(Partner.objects.filter(id__in=ids).values_list("id", flat=True))
+                Partner.objects.filter(id__in=existing).delete()
+            results = [
+                {"index": index, "id": pk, "status": "deleted" if pk in existing else "not_found"}
+                for index, pk in enumerate(ids)
+            ]
+            return Response({"deleted": len(existing), "results": results})
+
+        if request.method == "POST":
+            serializer = PartnerBulkSerializer(
+                data=request.data, many=True, allow_empty=False, max_length=settings.PARTNER_BULK_MAX_ITEMS,
+            )
+            outcome, response_status = "created", status.HTTP_201_CREATED
+        else:
+            serializer = PartnerBulkSerializer(
+                self.get_queryset(), data=request.data, many=True, partial=True,
+                allow_empty=False, max_length=settings.PARTNER_BULK_MAX_ITEMS,
+            )
+            outcome, response_status = "updated", status.HTTP_200_OK
+        serializer.is_valid(raise_exception=True)
+        partners = serializer.save()
+
+        results = []
+        for index, partner in enumerate(partners):
+            if partner is None:  # deleted by someone else since validation
+                results.append({"index": index, "status": "not_found"})
+            else:
+                results.append({
+                    "index": index,
+                    "id": partner.pk,
+                    "status": outcome,
+                    "partner": serializer.child.to_representation(partner),
+                })
+        count = sum(result["status"] == outcome for result in results)
+        return Response({outcome: count, "results": results}, status=response_status)
+
+    @action(detail=False, methods=["get"])
+    def fuzzy(self, request):
+        """Typo-tolerant firm name lookup: /api/partners/fuzzy/?q=acmee&limit=10"""
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "Missing query parameter: q"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 50)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = DjangoFilterBackend().filter_queryset(request, self.get_queryset(), self)
+        partners = fuzzy_search(query, queryset, limit=limit)
+        data = self.get_serializer(partners, many=True).data
+        for item, partner in zip(data, partners):
+            item["similarity"] = round(partner.similarity, 4)
+        return Response(data)
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
+def cache_stats(request):
+    """Hit/miss counters of this process's partner list cache."""
+    return Response(get_stats())
+
+
+def _facets_etag(request):
+    return get_facets(request)["etag"]
+
+
+def _facets_last_modified(request):
+    return get_facets(request)["last_modified"]
+
+
+@query_budget(7)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+@condition(etag_func=_facets_etag, last_modified_func=_facets_last_modified)
+def facets(request):
+    """Distinct hq, sector and partnership status values with row counts."""
+    response = Response(get_facets(request)["data"])
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@query_budget(7)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+@condition(etag_func=_facets_etag, last_modified_func=_facets_last_modified)
 def hq_list(request):
-    hqs = Partner.objects.exclude(hq__isnull=True).exclude(hq__exact="").values_list("hq", flat=True).distinct()
-    return Response(sorted(hqs))
+    hqs = [item["value"] for item in get_facets(request)["data"]["hq"]]
+    response = Response(hqs)
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def _wants_background(request):
+    """Run the import as a job if asked to, or if that is the configured default."""
+    value = request.query_params.get('background', request.data.get('background'))
+    if value is None:
+        return getattr(settings, 'PARTNER_IMPORT_BACKGROUND', False)
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def _wants_dry_run(request):
+    value = request.query_params.get('dry_run', request.data.get('dry_run'))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def _wants_force(request):
+    """Import a file again even if an earlier job already imported the same bytes."""
+    value = request.query_params.get('force', request.data.get('force'))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def _queued_response(request, job, duplicate=False):
+    data = {
+        "message": "File already imported by this job." if duplicate else "Import queued.",
+        "job_id": job.pk,
+        "status": job.status,
+        "status_url": reverse("importjob-detail", args=[job.pk], request=request),
+    }
+    if duplicate:
+        data["duplicate"] = True
+        return Response(data, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+@query_budget(list=2, retrieve=1, cancel=3, resume=3)
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of background imports started through upload_excel or the admin."""
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    permission_classes = [AllowAny]
+    pagination_class = PartnerPagination
+
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, pk=None):
+        job = cancel_job(self.get_object())
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=True, methods=["post"])
+    def resume(self, request, pk=None):
+        """Queue a failed, cancelled or stalled job again; it continues after its last checkpoint."""
+        job = self.get_object()
+        if job.status not in (ImportJob.FAILED, ImportJob.CANCELLED, ImportJob.RUNNING):
+            return Response({"error": f"Job is {job.status}"}, status=status.HTTP_409_CONFLICT)
+        if not job.file:
+            return Response({"error": "The job's file was deleted; upload it again"}, status=status.HTTP_409_CONFLICT)
+        job = resume_job(job)
+        if job.status != ImportJob.QUEUED:
+            return Response({"error": "Job is still running"}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@query_budget(create=6, retrieve=1, chunk=5, complete=7)
+class UploadSessionViewSet(viewsets.GenericViewSet):
+    """
+    Chunked, resumable upload of a large spreadsheet (see uploads.py):
+
+    - ``POST /api/uploads/`` with ``original_name``, ``size`` and ``sha256``
+      opens a session, or returns the open one for the same file.
+    - ``PUT /api/uploads/<id>/chunk/?offset=N`` with the raw bytes as body
+      and optionally ``X-Chunk-SHA256``.
+    - ``GET /api/uploads/<id>/`` tells how many bytes arrived.
+    - ``POST /api/uploads/<id>/complete/`` verifies the file and queues the import.
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [AllowAny]
+
+    def _session_response(self, session, status_code=status.HTTP_200_OK):
+        data = self.get_serializer(session).data
+        data["chunk_size"] = get_chunk_size()
+        if session.job_id is not None:
+            data["status_url"] = reverse("importjob-detail", args=[session.job_id], request=self.request)
+        return Response(data, status=status_code)
+
+    def _error_response(self, error):
+        data = {"error": str(error)}
+        if error.offset is not None:
+            data["received"] = error.offset
+        return Response(data, status=error.status)
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session, job = open_session(**serializer.validated_data)
+        except UploadError as e:
+            return self._error_response(e)
+        if job is not None:
+            return _queued_response(request, job, duplicate=True)
+        # 200 when picking up an upload that already received bytes
+        return self._session_response(session, status.HTTP_200_OK if session.received else status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return self._session_response(self.get_object())
+
+    @action(detail=True, methods=["put"])
+    def chunk(self, request, pk=None):
+        try:
+            offset = int(request.query_params.get("offset", ""))
+        except ValueError:
+            return Response({"error": "offset must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if offset < 0:
+            return Response({"error": "offset must not be negative"}, status=status.HTTP_400_BAD_REQUEST)
+        # Read the raw body; DRF's parsers are not involved
+        stream = request.stream
+        data = stream.read(get_chunk_size() + 1) if stream is not None else b""
+        if len(data) > get_chunk_size():
+            return Response({"error": f"Chunks are at most {get_chunk_size()} bytes"},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if not data:
+            return Response({"error": "Empty chunk"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            session = write_chunk(pk, offset, data, request.headers.get("X-Chunk-SHA256"))
+        except UploadError as e:
+            return self._error_response(e)
+        return self._session_response(session)
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        try:
+            session = complete_upload(pk)
+        except UploadError as e:
+            return self._error_response(e)
+        if session.job is None:
+            return Response({"error": "The import job of this upload was deleted"}, status=status.HTTP_410_GONE)
+        return _queued_response(request, session.job)
 
 
 #Fuctionalities of excel read, scrape and added in database
 
+@query_budget(4)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def upload_excel(request):
     if 'file' not in request.FILES:
         return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-    file = request.FILES['file']
-    if not file.name.endswith(('.xlsx', '.xls')):
-        return Response({"error": "Invalid file type. Only Excel files allowed."}, status=status.HTTP_400_BAD_REQUEST)
+    files = request.FILES.getlist('file')
+    if any(not f.name.lower().endswith(SPREADSHEET_EXTENSIONS + ARCHIVE_EXTENSIONS) for f in files):
+        return Response({"error": "Invalid file type. Only Excel, CSV or zip files allowed."}, status=status.HTTP_400_BAD_REQUEST)
+
+    file = files[0]
+    if len(files) > 1 or is_multi_source(file):
+        return _upload_sources(request, files)
+
+    if _wants_dry_run(request):
+        # Classify every row as insert/update/noop without writing anything
+        try:
+            result = import_rows(iter_rows(file), ImportResult(preview=True), dry_run=True)
+        except ImportFormatError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "message": f"Dry run: {result.processed} rows checked, nothing was saved.",
+            **result.as_dict()
+        }, status=status.HTTP_200_OK)
+
+    if _wants_background(request):
+        sha256 = file_sha256(file)
+        job = None if _wants_force(request) else find_duplicate_job(sha256)
+        if job is not None:
+            return _queued_response(request, job, duplicate=True)
+        return _queued_response(request, enqueue_import(file, sha256=sha256))
 
     try:
-        df = pd.read_excel(file, engine='openpyxl')
-        df.columns = df.columns.str.strip().str.lower()
-
-        column_mapping = {
-            'firm name': 'firm_name',
-            'headquarters': 'hq',
-            'origin': 'hq',
-            'focus area': 'focus_area',
-            'donor experience': 'donor_experience',
-            'contact': 'contact',
-            'sector': 'sector',
-            'current partnership status': 'current_partnership_status'
+        result = import_rows(iter_rows(file))
+
+        counts = {
+            "created": result.created,
+            "updated": result.updated,
+            "unchanged": result.unchanged,
         }
 
-        df = df.rename(columns=column_mapping, errors='ignore')
-
-        if 'firm_name' not in df.columns:
-            return Response({"error": "Missing required column: firm_name"}, status=status.HTTP_400_BAD_REQUEST)
-
-        processed_count = 0
-        skipped_rows = []
-
-        for index, row in df.iterrows():
-            try:
-                firm_name = row.get('firm_name', None)
-                if pd.isna(firm_name) or str(firm_name).strip() == '':
-                    skipped_rows.append(f"Row {index + 2}: firm_name is missing")
-                    continue
-
-                firm_name = str(firm_name).strip()
-
-                hq = row.get('hq', None)
-                focus_area = row.get('focus_area', None)
-                contact = row.get('contact', None)
-                donor_experience = row.get('donor_experience', None)
-                current_partnership_status = row.get('current_partnership_status', None)
-                sector = row.get('sector', None)
-
-                defaults = {}
-                if hq is not None and not pd.isna(hq):
-                    defaults['hq'] = str(hq).strip().capitalize()
-                if focus_area is not None and not pd.isna(focus_area):
-                    defaults['focus_area'] = str(focus_area).strip()
-                if contact is not None and not pd.isna(contact):
-                    defaults['contact'] = str(contact).strip()
-                if donor_experience is not None and not pd.isna(donor_experience):
-                    defaults['donor_experience'] = str(donor_experience).strip()
-                if current_partnership_status is not None and not pd.isna(current_partnership_status):
-                    defaults['current_partnership_status'] = str(current_partnership_status).strip()
-                if sector is not None and not pd.isna(sector):
-                    defaults['sector'] = str(sector).strip()
-
-                Partner.objects.update_or_create(
-                    firm_name__iexact=firm_name.lower(),
-                    defaults={'firm_name': firm_name, **defaults}
-                )
-                processed_count += 1
-
-            except Exception as e:
-                skipped_rows.append(f"Row {index + 2}: Error - {str(e)}")
-
-        if skipped_rows:
+        if result.skipped:
             return Response({
-                "message": f"Processed {processed_count} rows. Some rows were skipped.",
-                "skipped": skipped_rows
+                "message": f"Processed {result.processed} rows. Some rows were skipped.",
+                "skipped": result.skipped,
+                **counts
             }, status=status.HTTP_200_OK)
 
-        return Response({"message": f"Processed {processed_count} rows successfully."}, status=status.HTTP_201_CREATED)
+        return Response({"message": f"Processed {result.processed} rows successfully.", **counts}, status=status.HTTP_201_CREATED)
 
+    except ImportFormatError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _upload_sources(request, files):
+    """upload_excel for several files, a multi-sheet workbook or zip archives."""
+    if _wants_background(request) and not _wants_dry_run(request):
+        if len(files) > 1:
+            # Jobs store one file: bundle the uploads into an archive
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for f in files:
+                    archive.writestr(f.name, f.read())
+            files = [ContentFile(buffer.getvalue(), name='upload.zip')]
+        return _queued_response(request, enqueue_import(files[0]))
+
+    dry_run = _wants_dry_run(request)
+    try:
+        result = import_sources(files, dry_run=dry_run)
+    except ImportFormatError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    data = result.as_dict()
+    if dry_run:
+        message = f"Dry run: {result.processed} rows checked, nothing was saved."
+        return Response({"message": message, **data}, status=status.HTTP_200_OK)
+    sources = len(result.reports)
+    if result.skipped or any("error" in report for report in result.reports):
+        message = f"Processed {result.processed} rows from {sources} sources. Some rows or sources were skipped."
+        return Response({"message": message, **data}, status=status.HTTP_200_OK)
+    message = f"Processed {result.processed} rows from {sources} sources successfully."
+    return Response({"message": message, **data}, status=status.HTTP_201_CREATED)